@@ -1,6 +1,19 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
-from app.services.rag_service import get_rag_answer
+import json
+import asyncio
+import secrets
+from fastapi import APIRouter, Header, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from pydantic import BaseModel, Field
+from app.core.config import generate_thread_id, batch_max_questions, admin_token
+from app.services.rag_service import (
+    get_rag_answer,
+    get_rag_answers,
+    stream_rag_answer,
+    answer_cache,
+)
+from app.core.vector_index import get_vector_index
+from app.core.rag_graph import query_embeddings, local_router
 
 # Create a new APIRouter instance
 router = APIRouter()
@@ -9,10 +22,87 @@ router = APIRouter()
 # Create a Pydantic model for the question
 class Question(BaseModel):
     question: str
+    # Identifies the conversation; a new one is started when omitted
+    session_id: Optional[str] = Field(default=None, max_length=64)
 
 
 # Create a POST route for the /ask endpoint
 @router.post("/ask")
-def ask_question(question: Question):
-    result = get_rag_answer(question.question)
-    return {"answer": result["answer"], "sources": result["sources"]}
+async def ask_question(question: Question):
+    session_id = question.session_id or generate_thread_id()
+    result = await get_rag_answer(question.question, session_id)
+    return {
+        "answer": result["answer"],
+        "sources": result["sources"],
+        "session_id": session_id,
+    }
+
+
+# Create a Pydantic model for a batch of independent questions
+class QuestionBatch(BaseModel):
+    questions: List[str] = Field(min_length=1, max_length=batch_max_questions)
+
+
+# Create a POST route answering a batch of questions in one request
+@router.post("/ask_batch")
+async def ask_question_batch(batch: QuestionBatch):
+    results = await get_rag_answers(batch.questions)
+    return {"results": results}
+
+
+# Create a POST route streaming the answer as Server-Sent Events
+@router.post("/ask/stream")
+async def ask_question_stream(question: Question):
+    session_id = question.session_id or generate_thread_id()
+
+    async def events():
+        async for event, data in stream_rag_answer(
+            question.question, session_id
+        ):
+            if event == "token":
+                data = {"token": data}
+            else:
+                data = {**data, "session_id": session_id}
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Disable proxy buffering so tokens reach the browser immediately
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Report whether the vector index is loaded and ready to serve questions
+@router.get("/ready")
+def readiness(response: Response):
+    vector_index = get_vector_index()
+    if not vector_index.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return vector_index.status()
+
+
+# Load newly deployed index files and swap them in without a restart
+@router.post("/admin/reload")
+async def reload_index(x_admin_token: Optional[str] = Header(default=None)):
+    if admin_token is None or x_admin_token is None \
+            or not secrets.compare_digest(x_admin_token, admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+    vector_index = get_vector_index()
+    try:
+        await asyncio.to_thread(vector_index.reload)
+    except Exception as e:
+        # The previous version, if any, keeps serving
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail=str(e))
+    return vector_index.status()
+
+
+# Report cache statistics
+@router.get("/metrics")
+def metrics():
+    return {
+        "query_embedding_cache": query_embeddings.stats(),
+        "answer_cache": answer_cache.stats(),
+        "local_router": local_router.stats(),
+    }
@@ -0,0 +1,103 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticAnswerCache:
+    """
+    Cache of answers keyed by question embedding.
+
+    Question embeddings are L2-normalized and stored in a small inner-product
+    FAISS index, so a lookup finds the most similar earlier question by
+    cosine similarity. Entries expire after `ttl` seconds, the least recently
+    used entry is evicted beyond `max_entries`, and the whole cache is
+    dropped when the vector index it was built against changes version.
+    """
+
+    def __init__(self, threshold: float, max_entries: int, ttl: float):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._index = None
+        self._entries = OrderedDict()
+        self._next_id = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype="float32").reshape(1, -1).copy()
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _check_version(self, version):
+        if version is not None and version != self._version:
+            if self._entries:
+                logger.info("Vector index changed; clearing answer cache.")
+            self._clear()
+            self._version = version
+
+    def _clear(self):
+        self._index = None
+        self._entries.clear()
+
+    def _remove(self, entry_ids):
+        self._index.remove_ids(np.array(entry_ids, dtype="int64"))
+        for entry_id in entry_ids:
+            del self._entries[entry_id]
+
+    def lookup(self, vector, version=None):
+        """Return the cached answer for a similar question, or None."""
+        with self._lock:
+            self._check_version(version)
+            if not self._entries:
+                self.misses += 1
+                return None
+            similarities, ids = self._index.search(self._normalize(vector), 1)
+            entry_id = int(ids[0][0])
+            if entry_id == -1 or similarities[0][0] < self.threshold:
+                self.misses += 1
+                return None
+            expires_at, result = self._entries[entry_id]
+            if expires_at < time.time():
+                self._remove([entry_id])
+                self.misses += 1
+                return None
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            return result
+
+    def store(self, vector, result: dict, version=None):
+        """Cache an answer for the question embedding `vector`."""
+        with self._lock:
+            self._check_version(version)
+            vector = self._normalize(vector)
+            if self._index is None:
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+            entry_id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(vector, np.array([entry_id], dtype="int64"))
+            self._entries[entry_id] = (time.time() + self.ttl, result)
+            overflow = len(self._entries) - self.max_entries
+            if overflow > 0:
+                self._remove(list(self._entries)[:overflow])
+
+    def invalidate(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
@@ -0,0 +1,104 @@
+import time
+import logging
+import threading
+from collections import Counter, OrderedDict
+from langgraph.checkpoint.memory import MemorySaver
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    In-memory checkpointer with bounded memory use.
+
+    At most `max_threads` conversation threads are kept; the least recently
+    used thread is evicted beyond that, and threads idle for longer than
+    `thread_ttl` seconds are dropped. Within a thread only the newest
+    `max_checkpoints` checkpoints per namespace are kept, together with the
+    channel blobs and pending writes they reference.
+    """
+
+    def __init__(self, max_threads: int, thread_ttl: float,
+                 max_checkpoints: int):
+        super().__init__()
+        self.max_threads = max_threads
+        self.thread_ttl = thread_ttl
+        self.max_checkpoints = max_checkpoints
+        self._last_access = OrderedDict()
+        # Per thread and namespace: the (channel, version) blobs each kept
+        # checkpoint references, in write order, and how many kept
+        # checkpoints reference each blob
+        self._blob_index = {}
+        self._lock = threading.RLock()
+
+    def _touch(self, thread_id: str):
+        with self._lock:
+            now = time.time()
+            self._last_access[thread_id] = now
+            self._last_access.move_to_end(thread_id)
+            self._evict_threads(now)
+
+    def _evict_threads(self, now: float):
+        # Threads are ordered by last access, so only the front can be stale
+        while self._last_access:
+            thread_id, last_access = next(iter(self._last_access.items()))
+            if len(self._last_access) <= self.max_threads \
+                    and now - last_access <= self.thread_ttl:
+                break
+            del self._last_access[thread_id]
+            self.delete_thread(thread_id)
+            logger.debug(f"Evicted conversation thread {thread_id}")
+
+    def _index_blobs(self, thread_id: str, checkpoint_ns: str, checkpoint):
+        kept, refs = self._blob_index.setdefault(thread_id, {}).setdefault(
+            checkpoint_ns, (OrderedDict(), Counter())
+        )
+        blobs = tuple(checkpoint["channel_versions"].items())
+        # A checkpoint written again replaces its earlier references
+        refs.subtract(kept.pop(checkpoint["id"], ()))
+        kept[checkpoint["id"]] = blobs
+        refs.update(blobs)
+
+    def _prune_checkpoints(self, thread_id: str, checkpoint_ns: str):
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        kept, refs = self._blob_index[thread_id][checkpoint_ns]
+        # Checkpoints are indexed in the order they were written
+        while len(kept) > self.max_checkpoints:
+            checkpoint_id, blobs = kept.popitem(last=False)
+            checkpoints.pop(checkpoint_id, None)
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+            # Blobs still referenced by a kept checkpoint stay
+            for channel, version in blobs:
+                refs[channel, version] -= 1
+                if refs[channel, version] <= 0:
+                    del refs[channel, version]
+                    self.blobs.pop(
+                        (thread_id, checkpoint_ns, channel, version), None
+                    )
+
+    def get_tuple(self, config):
+        self._touch(config["configurable"]["thread_id"])
+        return super().get_tuple(config)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            checkpoint_ns = config["configurable"]["checkpoint_ns"]
+            self._index_blobs(thread_id, checkpoint_ns, checkpoint)
+            self._prune_checkpoints(thread_id, checkpoint_ns)
+            self._touch(thread_id)
+        return next_config
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str):
+        with self._lock:
+            self._last_access.pop(thread_id, None)
+            self._blob_index.pop(thread_id, None)
+            super().delete_thread(thread_id)
+
+    def thread_count(self) -> int:
+        return len(self._last_access)
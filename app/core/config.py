@@ -1,6 +1,9 @@
 from langchain_openai import ChatOpenAI
+import os
 import uuid
 from dotenv import load_dotenv, find_dotenv
+from src.config import config as pipeline_config
+from src.utils.embedding_backends import known_dimension
 
 load_dotenv(find_dotenv())
 
@@ -21,11 +24,94 @@ def get_prompt(docs_context):
     return prompt_template
 
 
+# Prompt used to fold older conversation turns into a running summary
+def get_summary_prompt():
+    return (
+        "Du opsummerer en samtale mellem en bruger og en hundeekspert. "
+        "Opdater det nuværende resumé med de nye beskeder. Bevar navne, "
+        "hunderacer og fakta som brugeren har nævnt, og hold resuméet "
+        "kortfattet."
+    )
+
+
 # Generate a unique thread ID for each session
 def generate_thread_id():
     return str(uuid.uuid4())
 
 
-memory_config = {"configurable": {"thread_id": generate_thread_id()}}
+# Build the graph config for a conversation thread
+def get_memory_config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+# Bounds on the conversation memory kept by the checkpointer
+max_threads = int(os.getenv("MAX_THREADS", "1000"))
+thread_ttl = float(os.getenv("THREAD_TTL", str(2 * 3600)))
+max_checkpoints_per_thread = int(os.getenv("MAX_CHECKPOINTS_PER_THREAD", "10"))
+
+# Token budget for the conversation history sent with each LLM call
+history_token_budget = int(os.getenv("HISTORY_TOKEN_BUDGET", "2000"))
+# Replace turns that fall outside the budget with a running summary
+history_summary_enabled = (
+    os.getenv("HISTORY_SUMMARY_ENABLED", "false").lower() == "true"
+)
 
 similarity_threshold = 1.0
+
+# Merge vector search with BM25 search over the chunks (reciprocal rank
+# fusion), taking `retrieval_candidates` from each ranking
+hybrid_search_enabled = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+retrieval_candidates = int(os.getenv("RETRIEVAL_CANDIDATES", "10"))
+rrf_k = int(os.getenv("RRF_K", "60"))
+# Seconds to wait for a query embedding before retrieving lexically only
+embedding_timeout = float(os.getenv("EMBEDDING_TIMEOUT", "2.0"))
+
+# Route clearly dog-related questions straight to retrieval without asking
+# the LLM; the distance is the squared L2 distance to the nearest chunk
+local_router_enabled = os.getenv("LOCAL_ROUTER_ENABLED", "true").lower() == "true"
+router_distance_threshold = float(os.getenv("ROUTER_DISTANCE_THRESHOLD", "0.9"))
+
+# Location of the FAISS index and chunk store served by the API
+vector_storage_dir = os.getenv("VECTOR_STORAGE_DIR", "app/vector_storage")
+# Memory-map the index instead of copying it into every worker process
+index_mmap = os.getenv("INDEX_MMAP", "true").lower() == "true"
+# Load the index on startup rather than on the first question
+preload_index = os.getenv("PRELOAD_INDEX", "true").lower() == "true"
+# Embedding backend and model for queries (openai, local or hashing; see
+# src/utils/embedding_backends.py). An index built with another backend,
+# model or dimension is refused. Setting EMBEDDING_DIMENSION below the
+# model's dimension truncates query embeddings to match a truncated index.
+embedding_backend = os.getenv("EMBEDDING_BACKEND", pipeline_config.EMBEDDING_BACKEND)
+embedding_model = os.getenv(
+    "EMBEDDING_MODEL", pipeline_config.DEFAULT_EMBEDDING_MODELS[embedding_backend]
+)
+embedding_dimension = (
+    int(os.environ["EMBEDDING_DIMENSION"]) if "EMBEDDING_DIMENSION" in os.environ
+    else known_dimension(embedding_backend, embedding_model)
+)
+# Seconds between checks for new index files to hot reload (0 disables)
+index_watch_interval = float(os.getenv("INDEX_WATCH_INTERVAL", "0"))
+# Token required by the admin endpoints; they are disabled when unset
+admin_token = os.getenv("ADMIN_TOKEN")
+# Overrides of the search parameters recorded in the index metadata
+index_search_params = {
+    name: int(os.environ[env])
+    for name, env in (("nprobe", "INDEX_NPROBE"), ("efSearch", "INDEX_EF_SEARCH"))
+    if env in os.environ
+}
+
+# Query embedding cache: "memory" or "sqlite" (persists across restarts)
+query_cache_backend = os.getenv("QUERY_CACHE_BACKEND", "memory")
+query_cache_path = os.getenv("QUERY_CACHE_PATH", "query_embeddings.sqlite")
+query_cache_size = int(os.getenv("QUERY_CACHE_SIZE", "10000"))
+query_cache_ttl = float(os.getenv("QUERY_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Batch questions: maximum batch size and concurrent LLM calls per batch
+batch_max_questions = int(os.getenv("BATCH_MAX_QUESTIONS", "500"))
+batch_concurrency = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+# Semantic answer cache: reuse answers to near-identical earlier questions
+answer_cache_enabled = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+answer_cache_threshold = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+answer_cache_size = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+answer_cache_ttl = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
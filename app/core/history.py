@@ -0,0 +1,96 @@
+import logging
+from functools import lru_cache
+from langchain_core.messages import SystemMessage, HumanMessage
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# Tokens added by the chat format around every message and the reply
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+
+@lru_cache(maxsize=None)
+def get_encoder(model_name: str):
+    """Return a function mapping text to tokens for the given model."""
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+        return encoding.encode
+    except Exception as e:
+        # tiktoken downloads its vocabulary on first use; without it, fall
+        # back to the common estimate of four characters per token.
+        logger.warning(f"Tokenizer unavailable, estimating tokens: {e}")
+        return lambda text: range((len(text) + 3) // 4)
+
+
+def _message_text(message) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(
+        part.get("text", "") if isinstance(part, dict) else str(part)
+        for part in message.content
+    )
+
+
+def count_tokens(messages, model_name: str) -> int:
+    """Count the prompt tokens of a list of chat messages."""
+    encode = get_encoder(model_name)
+    return TOKENS_PER_REPLY + sum(
+        TOKENS_PER_MESSAGE + len(encode(_message_text(message)))
+        for message in messages
+    )
+
+
+def conversation_messages(messages) -> list:
+    """Human and system messages and final AI answers, without tool calls."""
+    return [
+        message
+        for message in messages
+        if message.type in ("human", "system")
+        or (message.type == "ai" and not message.tool_calls)
+    ]
+
+
+def split_history(messages, budget: int, model_name: str):
+    """
+    Split messages into (dropped, kept), where kept is the newest suffix
+    that fits within `budget` tokens. The newest message is always kept,
+    and kept history starts at a human turn.
+    """
+    encode = get_encoder(model_name)
+    used = TOKENS_PER_REPLY
+    cut = len(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        used += TOKENS_PER_MESSAGE + len(encode(_message_text(messages[i])))
+        if used > budget and i < len(messages) - 1:
+            break
+        cut = i
+    while cut < len(messages) - 1 and messages[cut].type != "human":
+        cut += 1
+    return messages[:cut], messages[cut:]
+
+
+def summary_messages(summary: str) -> list:
+    """The running summary as a system message, if there is one."""
+    if not summary:
+        return []
+    return [SystemMessage(f"Resumé af den tidligere samtale:\n{summary}")]
+
+
+async def update_summary(llm, summary: str, messages, prompt: str) -> str:
+    """Fold `messages` into the running conversation summary."""
+    transcript = "\n".join(
+        f"{message.type}: {_message_text(message)}" for message in messages
+    )
+    request = [
+        SystemMessage(prompt),
+        HumanMessage(
+            f"Nuværende resumé:\n{summary or '(intet)'}\n\n"
+            f"Nye beskeder:\n{transcript}"
+        ),
+    ]
+    response = await llm.ainvoke(request)
+    return _message_text(response)
@@ -0,0 +1,194 @@
+import re
+import time
+import sqlite3
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize query text so trivially different questions share a key."""
+    query = unicodedata.normalize("NFKC", query).casefold()
+    query = re.sub(r"\s+", " ", query).strip()
+    return query.rstrip("?!. ")
+
+
+class MemoryBackend:
+    """In-process LRU store with per-entry expiry."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """LRU store in a local SQLite file, so entries survive restarts."""
+
+    def __init__(self, path: str, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB, "
+            "expires_at REAL, last_used REAL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS cache_last_used ON cache (last_used)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE cache SET last_used = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: bytes, ttl: float):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl, now),
+            )
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache "
+                "ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+def make_backend(backend: str, max_entries: int, path: str = None):
+    """Create a cache backend by name: "memory" or "sqlite"."""
+    if backend == "memory":
+        return MemoryBackend(max_entries)
+    if backend == "sqlite":
+        return SQLiteBackend(path, max_entries)
+    raise ValueError(f"Unknown query cache backend: {backend}")
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded, expiring cache of query embeddings in front of an embeddings
+    client. Keys are the model name plus the normalized query text.
+    """
+
+    def __init__(self, embeddings, backend, ttl: float, model_name: str = ""):
+        self.embeddings = embeddings
+        self.backend = backend
+        self.ttl = ttl
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, query: str) -> str:
+        return f"{self.model_name}:{normalize_query(query)}"
+
+    def embed_query(self, query: str) -> np.ndarray:
+        key = self._key(query)
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return np.frombuffer(value, dtype="float32")
+        self.misses += 1
+        vector = np.asarray(self.embeddings.embed_query(query), dtype="float32")
+        self.backend.set(key, vector.tobytes(), self.ttl)
+        return vector
+
+    async def aembed_query(self, query: str) -> np.ndarray:
+        key = self._key(query)
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return np.frombuffer(value, dtype="float32")
+        self.misses += 1
+        vector = np.asarray(
+            await self.embeddings.aembed_query(query), dtype="float32"
+        )
+        self.backend.set(key, vector.tobytes(), self.ttl)
+        return vector
+
+    async def aembed_queries(self, queries: list) -> list:
+        """Embed several queries, sending all cache misses in one batch."""
+        keys = [self._key(query) for query in queries]
+        vectors = {}
+        misses = {}
+        for key, query in zip(keys, queries):
+            if key in vectors or key in misses:
+                continue
+            value = self.backend.get(key)
+            if value is not None:
+                vectors[key] = np.frombuffer(value, dtype="float32")
+            else:
+                misses[key] = query
+        self.hits += len(keys) - len(misses)
+        self.misses += len(misses)
+        if misses:
+            embedded = await self.embeddings.aembed_documents(list(misses.values()))
+            for key, vector in zip(misses, embedded):
+                vector = np.asarray(vector, dtype="float32")
+                self.backend.set(key, vector.tobytes(), self.ttl)
+                vectors[key] = vector
+        return [vectors[key] for key in keys]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.backend),
+        }
@@ -1,62 +1,279 @@
-import pickle
-import faiss
+import uuid
+import asyncio
+import logging
 import numpy as np
-from langchain_openai import OpenAIEmbeddings
 from langgraph.prebuilt import ToolNode, tools_condition
-from app.core.config import llm, get_prompt, similarity_threshold
+from app.core.config import (
+    llm,
+    get_prompt,
+    get_summary_prompt,
+    similarity_threshold,
+    query_cache_backend,
+    query_cache_path,
+    query_cache_size,
+    query_cache_ttl,
+    max_threads,
+    thread_ttl,
+    max_checkpoints_per_thread,
+    history_token_budget,
+    history_summary_enabled,
+    local_router_enabled,
+    router_distance_threshold,
+    hybrid_search_enabled,
+    retrieval_candidates,
+    rrf_k,
+    embedding_timeout,
+    embedding_backend,
+    embedding_model,
+    embedding_dimension,
+)
+from langgraph.constants import TAG_NOSTREAM
 from langgraph.graph import MessagesState, StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_core.messages import SystemMessage
+from app.core.checkpointer import BoundedMemorySaver
+from langchain_core.messages import SystemMessage, AIMessage, HumanMessage
 from langchain_core.tools import tool
+from app.core.vector_index import get_vector_index
+from app.core.query_cache import QueryEmbeddingCache, make_backend
+from app.core.router import LocalRouter
+from src.utils.lexical_index import reciprocal_rank_fusion
+from src.utils.embedding_backends import make_embeddings
+from app.core.history import (
+    count_tokens,
+    conversation_messages,
+    split_history,
+    summary_messages,
+    update_summary,
+)
 
 from dotenv import load_dotenv, find_dotenv
 
 load_dotenv(find_dotenv())
 
-# Load the FAISS index and documents
-index = faiss.read_index("app/vector_storage/faiss_index.index")
-with open("app/vector_storage/chunked_documents.pkl", "rb") as f:
-    documents = pickle.load(f)
+logger = logging.getLogger(__name__)
+
+# Initialize embeddings with the backend the index was built with
+embeddings = make_embeddings(
+    embedding_backend, embedding_model, dimension=embedding_dimension
+)
+
+# Cache query embeddings so repeated questions skip the embedding call
+query_embeddings = QueryEmbeddingCache(
+    embeddings,
+    make_backend(query_cache_backend, query_cache_size, query_cache_path),
+    ttl=query_cache_ttl,
+    model_name=f"{embedding_model}@{embedding_dimension or 'full'}",
+)
+
+
+
+class ConversationState(MessagesState):
+    # Running summary of the conversation turns outside the token budget
+    summary: str
+    # Number of conversation messages already folded into the summary
+    summarized: int
 
-# Initialize embeddings
-embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
 
 # Initialize the graph builder
-graph_builder = StateGraph(MessagesState)
+graph_builder = StateGraph(ConversationState)
+
+# Initialize the memory saver, bounded so memory use stays flat
+memory = BoundedMemorySaver(
+    max_threads=max_threads,
+    thread_ttl=thread_ttl,
+    max_checkpoints=max_checkpoints_per_thread,
+)
+
+
+def materialize(documents, ids) -> list:
+    """Look up chunks by id as dicts."""
+    retrieved_docs = []
+    for idx in ids:
+        # Only the rows returned by the search are materialized
+        doc = documents[idx]
+        # Convert to a dictionary format similar to LangChain's Document class
+        retrieved_docs.append({
+            "metadata": doc.metadata,
+            "page_content": doc.page_content
+        })
+    return retrieved_docs
 
-# Initialize the memory saver
-memory = MemorySaver()
+
+def search_documents_batch(query_embeddings, queries: list = None) -> list:
+    """
+    Search the vector index for several queries in one call and return the
+    matching chunks of each query as dicts. When the query texts are given
+    and the build has a lexical index, vector and BM25 rankings are merged
+    with reciprocal rank fusion. BM25 scores have no absolute scale, so the
+    lexical ranking is only fused into queries with at least one vector hit
+    within the distance threshold; an off-topic question still finds no
+    chunks.
+    """
+    query_embeddings = np.array(query_embeddings, dtype="float32")
+
+    # The index and chunk store are loaded on first use
+    snapshot = get_vector_index().snapshot()
+    hybrid = hybrid_search_enabled and queries is not None \
+        and snapshot.lexical is not None
+    # Fusion picks from a longer candidate list of each ranking
+    k = retrieval_candidates if hybrid else 3
+    # FAISS searches a batch of queries in parallel
+    distances, indices = snapshot.index.search(query_embeddings, k=k)
+    results = []
+    for i, (query_distances, query_indices) in enumerate(zip(distances, indices)):
+        ids = [
+            int(idx) for distance, idx in zip(query_distances, query_indices)
+            if idx != -1 and distance < 1.0
+        ]
+        if hybrid and ids:
+            lexical_ids, _ = snapshot.lexical.search(queries[i], k)
+            ids = reciprocal_rank_fusion([ids, lexical_ids.tolist()], k=rrf_k)
+        results.append(materialize(snapshot.documents, ids[:3]))
+    return results
+
+
+def search_documents(query_embedding, query: str = None) -> list:
+    """Search the vector index and return the matching chunks as dicts."""
+    return search_documents_batch(
+        [query_embedding], None if query is None else [query]
+    )[0]
+
+
+def search_lexical(query: str) -> list:
+    """Search the lexical index only, for when no embedding is available."""
+    snapshot = get_vector_index().snapshot()
+    if snapshot.lexical is None:
+        return []
+    ids, _ = snapshot.lexical.search(query, 3)
+    return materialize(snapshot.documents, ids)
+
+
+def serialize_documents(retrieved_docs: list) -> str:
+    return "\n\n".join(
+        (f"Source: {doc['metadata']['source']}\n" f"Content: {doc['page_content']}")
+        for doc in retrieved_docs
+    )
+
+
+def nearest_distance(query_embedding) -> float:
+    """Distance from the query to the nearest chunk in the vector index."""
+    index, _ = get_vector_index().get()
+    distances, indices = index.search(
+        np.array([query_embedding], dtype="float32"), k=1
+    )
+    return float(distances[0][0]) if indices[0][0] != -1 else float("inf")
+
+
+async def embed_query_within_budget(query: str):
+    """
+    Embed a query, raising asyncio.TimeoutError if the embedding call takes
+    longer than the latency budget. The call is left to finish in the
+    background, so its result still lands in the query embedding cache.
+    """
+    return await asyncio.wait_for(
+        asyncio.shield(query_embeddings.aembed_query(query)),
+        timeout=embedding_timeout,
+    )
 
 
 @tool(response_format="content_and_artifact")
-def retrieve(query: str):
+async def retrieve(query: str):
     """Retrieve information related to a query."""
     # Create embeddings for the query
-    query_embedding = embeddings.embed_query(query)
-    query_embedding = np.array([query_embedding])
+    try:
+        query_embedding = await embed_query_within_budget(query)
+    except asyncio.TimeoutError:
+        logger.warning("Query embedding exceeded its budget; "
+                       "using lexical search only.")
+        query_embedding = None
 
-    distances, indices = index.search(query_embedding, k=3)
-    retrieved_docs = []
-    for distance, idx in zip(distances[0], indices[0]):
-        if distance < 1.0:
-            doc = documents[idx]
-            # Convert to a dictionary format similar to LangChain's Document class
-            retrieved_docs.append({
-                "metadata": doc.metadata,
-                "page_content": doc.page_content
-            })
-    serialized = "\n\n".join(
-        (f"Source: {doc['metadata']['source']}\n" f"Content: {doc['page_content']}")
-        for doc in retrieved_docs
+    # Index loading and search are CPU/disk bound; keep them off the loop
+    if query_embedding is None:
+        retrieved_docs = await asyncio.to_thread(search_lexical, query)
+    else:
+        retrieved_docs = await asyncio.to_thread(
+            search_documents, query_embedding, query
+        )
+    return serialize_documents(retrieved_docs), retrieved_docs
+
+
+# Bind the retrieval tool once so the router can request it
+llm_with_tools = llm.bind_tools([retrieve])
+# Decide on retrieval without the LLM when the question clearly needs it
+local_router = LocalRouter(
+    embed_query_within_budget,
+    nearest_distance,
+    distance_threshold=router_distance_threshold,
+)
+# Summary calls are not part of the answer streamed to the user
+summary_llm = llm.with_config(tags=[TAG_NOSTREAM])
+
+
+def trim_history(state: ConversationState):
+    """
+    Split the conversation into the turns dropped from the prompt and the
+    messages to send: the running summary followed by the newest turns that
+    fit within the history token budget.
+    """
+    summary = summary_messages(state.get("summary", ""))
+    # The summary itself is paid for out of the history budget
+    budget = history_token_budget - count_tokens(summary, llm.model_name)
+    dropped, kept = split_history(
+        conversation_messages(state["messages"]), budget, llm.model_name
     )
-    return serialized, retrieved_docs
+    return dropped, summary + kept
+
+
+async def summarize_dropped(state: ConversationState, dropped: list) -> dict:
+    """Fold turns dropped since the last summary into the running summary."""
+    summarized = state.get("summarized", 0)
+    if not history_summary_enabled or len(dropped) <= summarized:
+        return {}
+    try:
+        summary = await update_summary(
+            summary_llm,
+            state.get("summary", ""),
+            dropped[summarized:],
+            get_summary_prompt(),
+        )
+    except Exception as e:
+        logger.warning(f"Conversation summary update failed: {e}")
+        return {}
+    return {"summary": summary, "summarized": len(dropped)}
+
+
+# Request retrieval directly when the local router is confident.
+async def route(state: ConversationState):
+    """Route the question to retrieval without an LLM call if possible."""
+    # A follow-up question may refer to earlier turns, so only the LLM can
+    # rewrite it into a standalone search query
+    if not local_router_enabled \
+            or len(conversation_messages(state["messages"])) > 1:
+        return {}
+    question = state["messages"][-1].content
+    if not await local_router.needs_retrieval(question):
+        return {}
+    # The same tool call the LLM router would have made
+    tool_call = {
+        "name": "retrieve",
+        "args": {"query": question},
+        "id": f"route-{uuid.uuid4().hex}",
+    }
+    return {"messages": [AIMessage(content="", tool_calls=[tool_call])]}
+
+
+def route_condition(state: ConversationState) -> str:
+    last_message = state["messages"][-1]
+    if last_message.type == "ai" and last_message.tool_calls:
+        return "tools"
+    return "query_or_respond"
 
 
 # Generate an AIMessage that may include a tool-call to be sent.
-def query_or_respond(state: MessagesState):
+async def query_or_respond(state: ConversationState):
     """Generate tool call for retrieval or respond."""
-    llm_with_tools = llm.bind_tools([retrieve])
-    response = llm_with_tools.invoke(state["messages"])
+    # Tool exchanges of earlier turns are not needed to route this one
+    _, history = trim_history(state)
+    response = await llm_with_tools.ainvoke(history)
     # MessagesState appends messages to state instead of overwriting
     return {"messages": [response]}
 
@@ -66,7 +283,7 @@ tools = ToolNode([retrieve])
 
 
 # Generate a response using the retrieved content.
-def generate(state: MessagesState):
+async def generate(state: ConversationState):
     """Generate answer."""
 
     # collect the last tool message (contains sources)
@@ -81,27 +298,40 @@ def generate(state: MessagesState):
     # Format into prompt
     docs_content = "\n\n".join(doc.content for doc in tool_messages)
     system_message_cont = get_prompt(docs_content)
-    conversation_messages = [
-        message
-        for message in state["messages"]
-        if message.type in ("human", "system")
-        or (message.type == "ai" and not message.tool_calls)
-    ]
-    prompt = [SystemMessage(system_message_cont)] + conversation_messages
+    dropped, history = trim_history(state)
+    prompt = [SystemMessage(system_message_cont)] + history
 
-    # Run
-    response = llm.invoke(prompt)
-    return {"messages": [response]}
+    # Run, updating the summary alongside the answer rather than before it
+    response, summary_update = await asyncio.gather(
+        llm.ainvoke(prompt), summarize_dropped(state, dropped)
+    )
+    return {"messages": [response], **summary_update}
+
+
+async def answer_from_documents(question: str, retrieved_docs: list):
+    """Answer a single question from already retrieved chunks, outside the
+    graph and without conversation history."""
+    prompt = [
+        SystemMessage(get_prompt(serialize_documents(retrieved_docs))),
+        HumanMessage(question),
+    ]
+    return await llm.ainvoke(prompt)
 
 
 # build the graph
+graph_builder.add_node(route)
 graph_builder.add_node(query_or_respond)
 graph_builder.add_node(tools)
 graph_builder.add_node(generate)
 
 # set the entry point
-graph_builder.set_entry_point("query_or_respond")
+graph_builder.set_entry_point("route")
 # add conditions for passing from one node to another
+graph_builder.add_conditional_edges(
+    "route",
+    route_condition,
+    {"tools": "tools", "query_or_respond": "query_or_respond"},
+)
 graph_builder.add_conditional_edges(
     "query_or_respond",
     tools_condition,
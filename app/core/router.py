@@ -0,0 +1,61 @@
+import re
+import asyncio
+import logging
+from app.core.query_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# Word stems that only show up in questions about dogs. They are matched
+# anywhere in a word so Danish compounds ("gravhund", "hvalpekursus") count.
+DOG_KEYWORDS = re.compile(
+    r"hund(?!red)|hvalp|tæve|foder|fodr|pels"
+    r"|vaccin|dyrlæge|ormekur|loppe|flåt|kennel|opdræt|halsbånd|luftning"
+    r"|gøen|snude|labrador|retriever|terrier|puddel|schæfer|spaniel"
+)
+
+
+class LocalRouter:
+    """
+    Decides locally whether a question needs retrieval, so the LLM router
+    is only asked about ambiguous input.
+
+    A question is routed straight to retrieval if it contains a dog-related
+    keyword, or if its embedding lies within `distance_threshold` of the
+    nearest chunk in the vector index. Anything else falls back to the LLM.
+    """
+
+    def __init__(self, embed_query, nearest_distance, distance_threshold: float):
+        self.embed_query = embed_query
+        self.nearest_distance = nearest_distance
+        self.distance_threshold = distance_threshold
+        self.keyword_routes = 0
+        self.similarity_routes = 0
+        self.fallbacks = 0
+
+    async def needs_retrieval(self, question: str) -> bool:
+        if DOG_KEYWORDS.search(normalize_query(question)):
+            self.keyword_routes += 1
+            return True
+        try:
+            # The embedding is cached, so the retrieve tool reuses it
+            vector = await self.embed_query(question)
+            distance = await asyncio.to_thread(self.nearest_distance, vector)
+        except Exception as e:
+            logger.warning(f"Local routing failed, using the LLM router: {e}")
+            self.fallbacks += 1
+            return False
+        if distance < self.distance_threshold:
+            self.similarity_routes += 1
+            return True
+        self.fallbacks += 1
+        return False
+
+    def stats(self) -> dict:
+        routed = self.keyword_routes + self.similarity_routes
+        total = routed + self.fallbacks
+        return {
+            "keyword_routes": self.keyword_routes,
+            "similarity_routes": self.similarity_routes,
+            "llm_fallbacks": self.fallbacks,
+            "local_rate": routed / total if total else 0.0,
+        }
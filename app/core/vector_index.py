@@ -0,0 +1,275 @@
+import os
+import logging
+import threading
+from typing import NamedTuple
+import faiss
+from src.config import config as pipeline_config
+from src.utils.chunk_store import ChunkStore
+from src.utils.ann_index import apply_search_params, read_index_meta
+from src.utils.lexical_index import BM25Index
+from src.utils.embedding_backends import embedding_identity
+from app.core.config import (
+    vector_storage_dir,
+    index_mmap,
+    index_search_params,
+    embedding_dimension,
+    embedding_backend,
+    embedding_model,
+)
+
+logger = logging.getLogger(__name__)
+
+NOT_LOADED = "not_loaded"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+def read_index(index_path: str, mmap: bool = True):
+    """Read a FAISS index, memory-mapping its vectors when supported."""
+    if not mmap:
+        return faiss.read_index(index_path)
+    # IO_FLAG_MMAP_IFC maps flat vector storage in place, so worker
+    # processes share pages instead of each holding a private copy.
+    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+    return faiss.read_index(index_path, flags | faiss.IO_FLAG_READ_ONLY)
+
+
+class IndexSnapshot(NamedTuple):
+    index: object
+    documents: object
+    # BM25 index over the same chunks; None for builds without one
+    lexical: object
+    version: object
+    search_params: dict
+
+
+class VectorIndexError(Exception):
+    """A vector index build that cannot be served."""
+
+
+class VectorIndex:
+    """
+    FAISS index, chunk store and optional lexical index, loaded on first use.
+
+    The loaded indexes, chunk store and version are held together in one
+    snapshot. A reload reads and validates the new files in full before the
+    snapshot is swapped, so the old version keeps serving until then, and
+    queries that already hold the old objects finish against them.
+    """
+
+    def __init__(self, index_path: str, chunks_path: str, mmap: bool = True,
+                 meta_path: str = None, search_params: dict = None,
+                 dimension: int = None, lexical_path: str = None,
+                 embedding: tuple = None):
+        self.index_path = index_path
+        self.chunks_path = chunks_path
+        self.lexical_path = lexical_path
+        self.mmap = mmap
+        self.meta_path = meta_path
+        self.search_params = dict(search_params or {})
+        # Dimension and (backend, model) of the query embeddings, which the
+        # index must have been built with
+        self.dimension = dimension
+        self.embedding = embedding
+        self.state = NOT_LOADED
+        self.error = None
+        self.reloads = 0
+        self._snapshot = None
+        self._signature = None
+        self._pending_signature = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_objects(cls, index, documents, lexical=None):
+        """Wrap an index and documents that are already in memory."""
+        vector_index = cls(index_path=None, chunks_path=None)
+        vector_index._snapshot = IndexSnapshot(
+            index, documents, lexical, id(index), {}
+        )
+        vector_index.state = READY
+        return vector_index
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    @property
+    def version(self):
+        """Identifies the index build, so caches derived from an older
+        build can be dropped."""
+        return self._snapshot.version if self._snapshot else None
+
+    @property
+    def applied_search_params(self) -> dict:
+        return self._snapshot.search_params if self._snapshot else {}
+
+    def load(self):
+        """Load the index and chunk store unless already loaded."""
+        with self._lock:
+            if self.state == READY:
+                return
+            self.state = LOADING
+            try:
+                self._swap(self._read())
+            except Exception as e:
+                self.state = FAILED
+                self.error = str(e)
+                logger.error(f"Failed to load vector index: {e}")
+                raise
+
+    def reload(self):
+        """
+        Load the current files as a new version and swap it in. If the new
+        files fail to load or validate, the loaded version keeps serving
+        and the error is raised.
+        """
+        with self._lock:
+            try:
+                snapshot = self._read()
+            except Exception as e:
+                self.error = str(e)
+                if self.state != READY:
+                    self.state = FAILED
+                logger.error(f"Failed to reload vector index: {e}")
+                raise
+            if self.state == READY:
+                self.reloads += 1
+            self._swap(snapshot)
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reload if the index files changed since they were loaded and have
+        not changed since the previous call, so files that are still being
+        written are not picked up. Returns whether a new version was loaded.
+        """
+        try:
+            signature = self._file_signature()
+        except OSError:
+            return False
+        if signature == self._signature:
+            self._pending_signature = None
+            return False
+        if signature != self._pending_signature:
+            self._pending_signature = signature
+            return False
+        self._pending_signature = None
+        try:
+            self.reload()
+        except Exception:
+            # Not retried until the files change again
+            self._signature = signature
+            return False
+        return True
+
+    def _file_signature(self) -> tuple:
+        paths = [self.index_path, self.chunks_path]
+        # The lexical index is optional
+        if self.lexical_path and os.path.exists(self.lexical_path):
+            paths.append(self.lexical_path)
+        signature = ()
+        for path in paths:
+            stat = os.stat(path)
+            signature += (stat.st_mtime_ns, stat.st_size)
+        return signature
+
+    def _read(self) -> tuple:
+        """Read and validate the index files as a new snapshot."""
+        signature = self._file_signature()
+        index = read_index(self.index_path, self.mmap)
+        documents = ChunkStore(self.chunks_path)
+        if index.ntotal != len(documents):
+            raise VectorIndexError(
+                f"Index has {index.ntotal} vectors but the chunk store "
+                f"has {len(documents)} chunks"
+            )
+        if self.dimension is not None and index.d != self.dimension:
+            raise VectorIndexError(
+                f"Index dimension {index.d} does not match the embedding "
+                f"dimension {self.dimension}"
+            )
+        lexical = None
+        if self.lexical_path and os.path.exists(self.lexical_path):
+            lexical = BM25Index.load(self.lexical_path)
+            if len(lexical) != len(documents):
+                raise VectorIndexError(
+                    f"Lexical index has {len(lexical)} chunks but the chunk "
+                    f"store has {len(documents)} chunks"
+                )
+        meta = {}
+        if self.meta_path and os.path.exists(self.meta_path):
+            meta = read_index_meta(self.meta_path)
+        if self.embedding is not None \
+                and embedding_identity(meta) != tuple(self.embedding):
+            raise VectorIndexError(
+                f"Index was built with {'/'.join(embedding_identity(meta))} "
+                f"embeddings but queries use {'/'.join(self.embedding)}"
+            )
+        applied_search_params = self._apply_search_params(index, meta)
+        version = f"{signature[0]}-{signature[1]}"
+        snapshot = IndexSnapshot(
+            index, documents, lexical, version, applied_search_params
+        )
+        return snapshot, signature
+
+    def _swap(self, loaded: tuple):
+        snapshot, signature = loaded
+        # A single assignment, so readers see either the old or new version
+        self._snapshot = snapshot
+        self._signature = signature
+        self.state = READY
+        self.error = None
+        logger.info(
+            f"Loaded vector index version {snapshot.version} with "
+            f"{snapshot.index.ntotal} vectors from {self.index_path}"
+            + ("" if snapshot.lexical is None else " with a lexical index")
+        )
+
+    def _apply_search_params(self, index, meta: dict) -> dict:
+        """Apply the search parameters recorded when the index was built,
+        with any configured overrides taking precedence."""
+        params = dict(meta.get("search_params", {}))
+        params.update(self.search_params)
+        return apply_search_params(index, params)
+
+    def snapshot(self) -> IndexSnapshot:
+        """Return the loaded version, loading it on first use."""
+        if self.state != READY:
+            self.load()
+        return self._snapshot
+
+    def get(self):
+        """Return (index, documents), loading them on first use."""
+        snapshot = self.snapshot()
+        return snapshot.index, snapshot.documents
+
+    def status(self) -> dict:
+        status = {"status": self.state}
+        if self.ready:
+            status["vectors"] = int(self._snapshot.index.ntotal)
+            status["lexical"] = self._snapshot.lexical is not None
+            status["version"] = self.version
+            if self.applied_search_params:
+                status["search_params"] = self.applied_search_params
+            if self.reloads:
+                status["reloads"] = self.reloads
+        if self.error:
+            status["error"] = self.error
+        return status
+
+
+_vector_index = VectorIndex(
+    os.path.join(vector_storage_dir, pipeline_config.INDEX_FILE),
+    os.path.join(vector_storage_dir, pipeline_config.CHUNKS_FILE),
+    mmap=index_mmap,
+    meta_path=os.path.join(vector_storage_dir, pipeline_config.INDEX_META_FILE),
+    search_params=index_search_params,
+    dimension=embedding_dimension,
+    embedding=(embedding_backend, embedding_model),
+    lexical_path=os.path.join(vector_storage_dir,
+                              pipeline_config.LEXICAL_INDEX_FILE),
+)
+
+
+def get_vector_index() -> VectorIndex:
+    return _vector_index
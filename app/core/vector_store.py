@@ -3,7 +3,6 @@ import requests
 import bs4
 import os
 import numpy as np
-import pickle
 import faiss
 import logging
 import shutil
@@ -13,6 +12,9 @@ from langchain.embeddings import OpenAIEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import WebBaseLoader
 from dotenv import load_dotenv, find_dotenv
+from src.config import config
+from src.utils.embedding import embed_texts
+from src.utils.chunk_store import write_chunk_store
 
 load_dotenv(find_dotenv())
 
@@ -70,9 +72,23 @@ def _init_parser():
     parser.add_argument(
         "--document_name",
         type=str,
-        default="documents.pkl",
+        default="documents.arrow",
         required=False,
-        help="The name of the document pickle file.",
+        help="The name of the chunk store file.",
+    )
+    parser.add_argument(
+        "--embed_batch_size",
+        type=int,
+        default=config.EMBED_BATCH_SIZE,
+        required=False,
+        help="The number of chunks sent per embedding request.",
+    )
+    parser.add_argument(
+        "--embed_concurrency",
+        type=int,
+        default=config.EMBED_CONCURRENCY,
+        required=False,
+        help="The number of embedding requests kept in flight at once.",
     )
     parser.add_argument(
         "--dry_run",
@@ -119,6 +135,8 @@ def load_and_chunk_documents(
     index_name: str,
     document_name: str,
     dry_run: bool = False,
+    embed_batch_size: int = config.EMBED_BATCH_SIZE,
+    embed_concurrency: int = config.EMBED_CONCURRENCY,
 ) -> List:
     try:
         loader = WebBaseLoader(
@@ -150,10 +168,13 @@ def load_and_chunk_documents(
             return all_splits
 
         # Create embeddings for each chunk
-        embeddings_list = [
-            embeddings.embed_query(doc.page_content) for doc in all_splits
-        ]
-        embeddings_array = np.array(embeddings_list)
+        embeddings_list = embed_texts(
+            embeddings,
+            [doc.page_content for doc in all_splits],
+            batch_size=embed_batch_size,
+            concurrency=embed_concurrency,
+        )
+        embeddings_array = np.array(embeddings_list, dtype="float32")
 
         # Create a FAISS index
         dimension = embeddings_array.shape[1]
@@ -174,8 +195,7 @@ def load_and_chunk_documents(
 
         # Save the FAISS index and documents
         faiss.write_index(index, f"{storage_dir}/{index_name}")
-        with open(f"{storage_dir}/{document_name}", "wb") as f:
-            pickle.dump(all_splits, f)
+        write_chunk_store(all_splits, f"{storage_dir}/{document_name}")
 
         logging.info(f"Added {len(all_splits)} docs to the vector store...")
         return all_splits
@@ -202,6 +222,8 @@ def main():
             args.index_name,
             args.document_name,
             args.dry_run,
+            args.embed_batch_size,
+            args.embed_concurrency,
         )
         logging.info(
             f"Finished loading and chunking documents. \
@@ -1,17 +1,64 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from app.api.endpoints import rag
+from app.core.config import preload_index, index_watch_interval
+from app.core.vector_index import get_vector_index
 
-# create a FastAPI instance
-app = FastAPI()
+logger = logging.getLogger(__name__)
 
-# include the router from the endpoints
-app.include_router(rag.router, prefix="/rag", tags=["rag"])
 
-# serve the static HTML file
-app.mount("/", StaticFiles(directory="app/frontend", html=True), name="static")
+def create_app(preload: bool = preload_index,
+               watch_interval: float = index_watch_interval) -> FastAPI:
+    """Create the FastAPI application."""
 
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Load the vector index in the background so the server accepts
+        # requests immediately and reports readiness on /rag/ready.
+        task = None
+        if preload:
+            task = asyncio.create_task(
+                asyncio.to_thread(get_vector_index().load)
+            )
+            task.add_done_callback(_log_preload_error)
+        watcher = None
+        if watch_interval > 0:
+            watcher = asyncio.create_task(watch_index(watch_interval))
+        yield
+        if watcher is not None:
+            watcher.cancel()
+        if task is not None and not task.done():
+            await asyncio.wait([task])
 
-@app.get("/")
-def read_root():
-    return {"message": "Welcome to the RAG FastAPI application!"}
+    # create a FastAPI instance
+    app = FastAPI(lifespan=lifespan)
+
+    # include the router from the endpoints
+    app.include_router(rag.router, prefix="/rag", tags=["rag"])
+
+    # serve the static HTML file
+    app.mount(
+        "/", StaticFiles(directory="app/frontend", html=True), name="static"
+    )
+    return app
+
+
+async def watch_index(interval: float):
+    """Hot reload the vector index whenever new index files are deployed."""
+    vector_index = get_vector_index()
+    while True:
+        await asyncio.sleep(interval)
+        # Until the first load has finished there is nothing to replace
+        if vector_index.ready:
+            await asyncio.to_thread(vector_index.reload_if_changed)
+
+
+def _log_preload_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Preloading the vector index failed: {task.exception()}")
+
+
+app = create_app()
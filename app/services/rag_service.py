@@ -1,27 +1,100 @@
-from app.core.rag_graph import graph
-from app.core.config import memory_config
+import asyncio
+from app.core.rag_graph import (
+    graph,
+    query_embeddings,
+    search_documents_batch,
+    serialize_documents,
+    answer_from_documents,
+)
+from app.core.config import (
+    get_memory_config,
+    generate_thread_id,
+    batch_concurrency,
+    answer_cache_enabled,
+    answer_cache_threshold,
+    answer_cache_size,
+    answer_cache_ttl,
+)
+from app.core.answer_cache import SemanticAnswerCache
+from app.core.vector_index import get_vector_index
 from langchain_core.messages import ToolMessage
-from langchain_core.messages import AIMessage
+from langchain_core.messages import AIMessage, HumanMessage
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Answers to earlier questions, looked up by question similarity
+answer_cache = SemanticAnswerCache(
+    threshold=answer_cache_threshold,
+    max_entries=answer_cache_size,
+    ttl=answer_cache_ttl,
+)
 
-def get_rag_answer(question: str) -> dict:
 
-    logger.info(f"Received question: {question}")
-    # try:
+async def is_first_turn(memory_config: dict) -> bool:
+    """Whether the conversation thread has no earlier messages."""
+    state = await graph.aget_state(memory_config)
+    return not state.values.get("messages")
 
-    # define query
-    query = {"messages": [{"role": "user", "content": question}]}
-    # send query to graph
-    output = graph.stream(query, stream_mode="values", config=memory_config)
 
-    # Collect the response stream from the graph
-    result = [step["messages"] for step in output][-1]
+async def lookup_cached_answer(question: str, memory_config: dict):
+    """
+    Embed the question and look it up in the answer cache. Returns the
+    question embedding (None if caching is disabled or failed) and the
+    cached result, if any.
 
-    # logging.info(f"Response stream: {result}")
-    logging.info(f"Config: {memory_config}")
+    Follow-up questions depend on the conversation before them, so only the
+    first question of a thread is looked up, and later answered or cached.
+    """
+    if not answer_cache_enabled or not await is_first_turn(memory_config):
+        return None, None
+    try:
+        question_embedding = await query_embeddings.aembed_query(question)
+    except Exception as e:
+        logger.warning(f"Answer cache lookup failed: {e}")
+        return None, None
+    return question_embedding, cached_answer(question_embedding)
+
+
+def cached_answer(question_embedding):
+    """Return a copy of the cached answer to a similar question, or None."""
+    if not answer_cache_enabled:
+        return None
+    try:
+        cached = answer_cache.lookup(
+            question_embedding, version=get_vector_index().version
+        )
+    except Exception as e:
+        logger.warning(f"Answer cache lookup failed: {e}")
+        return None
+    if cached is not None:
+        logger.info("Answer served from semantic cache.")
+        cached = {"answer": cached["answer"], "sources": list(cached["sources"])}
+    return cached
+
+
+async def record_cached_turn(memory_config: dict, question: str,
+                             cached: dict):
+    """Add a turn answered from the cache to the thread's history, so later
+    questions in the thread see it like a turn answered by the graph."""
+    await graph.aupdate_state(
+        memory_config,
+        {"messages": [HumanMessage(question), AIMessage(cached["answer"])]},
+        as_node="generate",
+    )
+
+
+def store_answer(question_embedding, result: dict):
+    """Cache an answer that is backed by sources."""
+    if result["sources"] and question_embedding is not None:
+        answer_cache.store(
+            question_embedding, result, version=get_vector_index().version
+        )
+
+
+def build_answer(result: list) -> dict:
+    """Extract the final answer and its deduplicated sources from the
+    messages of a finished graph run."""
     # Extract the final response
     final_response = next(
         (res for res in reversed(result) if isinstance(res, AIMessage)), None
@@ -72,3 +145,127 @@ def get_rag_answer(question: str) -> dict:
         source_list = []
 
     return {"answer": answer, "sources": source_list}
+
+
+async def get_rag_answer(question: str, thread_id: str = None) -> dict:
+
+    logger.info(f"Received question: {question}")
+    # Each conversation gets its own thread in the checkpointer
+    memory_config = get_memory_config(thread_id or generate_thread_id())
+
+    # Return a cached answer if a near-identical question was answered
+    # against the current vector index
+    question_embedding, cached = await lookup_cached_answer(
+        question, memory_config
+    )
+    if cached is not None:
+        await record_cached_turn(memory_config, question, cached)
+        return cached
+
+    # define query
+    query = {"messages": [{"role": "user", "content": question}]}
+    # send query to graph
+    output = graph.astream(query, stream_mode="values", config=memory_config)
+
+    # Collect the response stream from the graph
+    result = [step["messages"] async for step in output][-1]
+
+    # logging.info(f"Response stream: {result}")
+    logging.info(f"Config: {memory_config}")
+    answer = build_answer(result)
+    store_answer(question_embedding, answer)
+    return answer
+
+
+async def stream_rag_answer(question: str, thread_id: str = None):
+    """
+    Answer a question as a stream of events. Yields ("token", text) for
+    each token produced by the generate node, then a final
+    ("sources", {"answer": ..., "sources": [...]}) event. The final answer
+    replaces the streamed text, e.g. when no sources were found.
+    """
+    logger.info(f"Received streaming question: {question}")
+    memory_config = get_memory_config(thread_id or generate_thread_id())
+
+    question_embedding, cached = await lookup_cached_answer(
+        question, memory_config
+    )
+    if cached is not None:
+        await record_cached_turn(memory_config, question, cached)
+        yield "token", cached["answer"]
+        yield "sources", cached
+        return
+
+    query = {"messages": [{"role": "user", "content": question}]}
+    messages = []
+    try:
+        async for mode, chunk in graph.astream(
+            query, stream_mode=["messages", "values"], config=memory_config
+        ):
+            if mode == "messages":
+                message, metadata = chunk
+                # Only the answer-generating node is shown to the user
+                if metadata.get("langgraph_node") == "generate" \
+                        and message.content:
+                    yield "token", message.content
+            else:
+                messages = chunk["messages"]
+        answer = build_answer(messages)
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        answer = {"answer": "Noget gik galt, prøv venligst igen.",
+                  "sources": []}
+    store_answer(question_embedding, answer)
+    yield "sources", answer
+
+
+async def answer_with_documents(question: str, retrieved_docs: list) -> dict:
+    """Generate the answer to one question of a batch."""
+    try:
+        # Without sources the answer is replaced anyway, so skip the LLM
+        if retrieved_docs:
+            response = await answer_from_documents(question, retrieved_docs)
+        else:
+            response = AIMessage(content="")
+        tool_message = ToolMessage(
+            content=serialize_documents(retrieved_docs),
+            artifact=retrieved_docs,
+            tool_call_id="batch",
+        )
+        return build_answer([HumanMessage(question), tool_message, response])
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        return {"answer": "Noget gik galt, prøv venligst igen.", "sources": []}
+
+
+async def get_rag_answers(questions: list) -> list:
+    """
+    Answer a batch of independent questions. All questions are embedded in
+    one call and searched with one multi-query index search; answers are
+    then generated concurrently, at most `batch_concurrency` at a time.
+    Results are returned in the order of the questions.
+    """
+    logger.info(f"Received batch of {len(questions)} questions")
+    question_embeddings = await query_embeddings.aembed_queries(questions)
+    results = [cached_answer(embedding) for embedding in question_embeddings]
+
+    pending = [i for i, result in enumerate(results) if result is None]
+    if not pending:
+        return results
+    retrieved = await asyncio.to_thread(
+        search_documents_batch,
+        [question_embeddings[i] for i in pending],
+        [questions[i] for i in pending],
+    )
+
+    semaphore = asyncio.Semaphore(batch_concurrency)
+
+    async def answer(i: int, retrieved_docs: list):
+        async with semaphore:
+            results[i] = await answer_with_documents(questions[i], retrieved_docs)
+        store_answer(question_embeddings[i], results[i])
+
+    await asyncio.gather(
+        *(answer(i, docs) for i, docs in zip(pending, retrieved))
+    )
+    return results
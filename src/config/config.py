@@ -3,7 +3,69 @@ OUTPUT_PATH = "output"
 SCRAPE_OUTPUT_FILE = "scraped_breeds.parquet"
 DOCUMENT_OUTPUT_FILE = "breed_documents.parquet"
 INDEX_FILE = "faiss_index.index"
-CHUNKS_FILE = "chunked_documents.pkl"
+CHUNKS_FILE = "chunked_documents.arrow"
+INDEX_META_FILE = "faiss_index.json"
+LEXICAL_INDEX_FILE = "bm25_index.npz"
+INDEX_REPORT_FILE = "index_report.json"
+
+# Rows per row group of the documents file, and per batch when reading it.
+DOCUMENT_BATCH_SIZE = 1000
+
+# Documents are split into chunks of this many characters before embedding.
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+# Index type and search parameters; see src/utils/ann_index.py.
+INDEX_SPEC = "flat"
+INDEX_TRAIN_SAMPLE = 50000
+INDEX_NPROBE = 16
+INDEX_EF_SEARCH = 64
+INDEX_REPORT_K = 3
+INDEX_REPORT_QUERIES = 200
+
+# Embedding requests are sent in batches, several batches at a time.
+EMBED_BATCH_SIZE = 64
+EMBED_CONCURRENCY = 4
+
+# Embedding backend and the default model of each backend; see
+# src/utils/embedding_backends.py. Local models are SentenceTransformer
+# models loaded from a path or the local model cache.
+EMBEDDING_BACKEND = "openai"
+EMBEDDING_MODEL = "text-embedding-3-large"
+LOCAL_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+HASHING_EMBEDDING_MODEL = "hashing-256"
+DEFAULT_EMBEDDING_MODELS = {
+    "openai": EMBEDDING_MODEL,
+    "local": LOCAL_EMBEDDING_MODEL,
+    "hashing": HASHING_EMBEDDING_MODEL,
+}
+
+# Embeddings are cached on disk, keyed by model name and chunk text.
+EMBED_CACHE_DIR = ".cache/embeddings"
+EMBED_CACHE_MAX_MB = 512
+
+# Breed pages are fetched concurrently, rate limited per host, and
+# failed requests are retried with jittered exponential backoff.
+SCRAPE_CONCURRENCY = 8
+SCRAPE_RATE_LIMIT = 4.0
+SCRAPE_MAX_RETRIES = 3
+SCRAPE_BACKOFF = 1.0
+# Processes parsing the fetched breed pages.
+SCRAPE_PARSE_WORKERS = 4
+# Race links found must be at least this fraction of the breeds of the
+# previous scrape; fewer means the page did not render completely.
+SCRAPE_MIN_LINK_RATIO = 0.8
+
+# Validators and content hashes of scraped pages, used for conditional
+# requests so unchanged pages are not downloaded again. Like the stage
+# cache below, it lives in the output directory, the only directory the
+# scheduled pipeline keeps between runs.
+FETCH_CACHE_FILE = f"{OUTPUT_PATH}/.cache/fetch_cache.json"
+
+# Input keys of the pipeline stages' artifacts; a stage whose inputs,
+# parameters and code are unchanged reuses its artifacts until they expire.
+STAGE_CACHE_FILE = f"{OUTPUT_PATH}/.cache/stage_cache.json"
+STAGE_CACHE_MAX_AGE_HOURS = 24 * 7
 
 # A version string that can be used for naming release artifacts.
 RELEASE_VERSION = "v1.0.0"
@@ -3,13 +3,19 @@ import sys
 import argparse
 import logging
 from typing import List, Dict, Any
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 from pydantic import BaseModel
-from langchain.schema import Document
-import pickle
+from langchain_core.documents import Document
 
 # Import configuration defaults.
 from src.config import config
+from src.utils.document_store import (
+    SCHEMA as DOCUMENT_SCHEMA,
+    to_documents,
+    write_document_store,
+)
 
 class BreedDocument(BaseModel):
     page_content: str
@@ -55,44 +61,70 @@ def load_scraped_data(filename: str) -> pd.DataFrame:
         logging.error(f"Failed to load data from {filename}: {e}")
         raise
 
-def format_specs(specs: Dict) -> str:
-    return "\n".join([f"- {k}: {v}" for k, v in specs.items()])
+def spec_table(specs: pd.Series) -> pd.DataFrame:
+    """
+    One column per spec key and one row per breed. Specs read back from
+    Parquet hold every breed's keys, with None where a breed lacks one.
+    """
+    return pd.DataFrame(specs.tolist(), index=specs.index)
 
-def format_content(row: pd.Series) -> str:
-    breed_name = row["url"].rstrip("/").split("/")[-1].capitalize()
-    content = [
-        f"Breed Profile: {breed_name}",
-        "## Key Characteristics:",
-        format_specs(row["specs"]),
-        "## Detailed Description:",
-        row["lexicon"]
-    ]
-    return "\n".join(content)
+def format_specs(specs: pd.DataFrame) -> pd.Series:
+    """Format each row's specs as "- key: value" lines, skipping missing keys."""
+    lines = pd.Series("", index=specs.index, dtype="string")
+    # One vectorized pass per spec key rather than per breed
+    for key in specs.columns:
+        lines += ("- " + str(key) + ": " + specs[key].astype("string") + "\n").fillna("")
+    return lines.str.removesuffix("\n")
+
+def specs_map(specs: pd.DataFrame) -> pa.MapArray:
+    """Build a map<string, string> column from the spec table, without
+    missing keys."""
+    values = specs.to_numpy(dtype=object)
+    present = pd.notna(values)
+    keys = np.broadcast_to(specs.columns.to_numpy(dtype=object), values.shape)
+    offsets = np.zeros(len(values) + 1, dtype="int32")
+    np.cumsum(present.sum(axis=1), out=offsets[1:])
+    return pa.MapArray.from_arrays(
+        pa.array(offsets),
+        pa.array(keys[present], type=pa.string()),
+        pa.array(values[present], type=pa.string()),
+    )
+
+def format_documents(df: pd.DataFrame,
+                     content_type: str = "dog_breed_profile") -> pa.Table:
+    """Format scraped breed rows as a document table in the document store
+    schema, using column-wise string operations."""
+    breed_name = df["url"].str.rstrip("/").str.rsplit("/", n=1).str[-1]
+    specs = spec_table(df["specs"])
+    content = (
+        "Breed Profile: " + breed_name.str.capitalize()
+        + "\n## Key Characteristics:\n" + format_specs(specs)
+        + "\n## Detailed Description:\n" + df["lexicon"]
+    )
+    table = pa.Table.from_arrays(
+        [
+            pa.array(df["url"], type=pa.string()),
+            pa.array(breed_name, type=pa.string()),
+            pa.array(content, type=pa.string()),
+            specs_map(specs),
+            pa.array(df["documents"], type=pa.list_(pa.string())),
+            pa.array([content_type] * len(df), type=pa.string()),
+            pa.Array.from_pandas(df["scrape_timestamp"]).cast(
+                pa.timestamp("us"), safe=False
+            ),
+        ],
+        schema=DOCUMENT_SCHEMA,
+    )
+    logging.info(f"Formatted {table.num_rows} documents.")
+    return table
 
 def create_documents(df: pd.DataFrame) -> List[Document]:
-    documents = []
-    for _, row in df.iterrows():
-        breed_name = row["url"].rstrip("/").split("/")[-1]
-        doc = Document(
-            page_content=format_content(row),
-            metadata={
-                "source": row["url"],
-                "specs": row["specs"],
-                "documents": row["documents"],
-                "breed_name": breed_name,
-                "scrape_timestamp": row["scrape_timestamp"],
-                "content_type": "dog_breed_profile"
-            }
-        )
-        documents.append(doc)
-    logging.info(f"Created {len(documents)} documents.")
-    return documents
+    return to_documents(format_documents(df))
 
-def save_documents(documents: list[Document], filename: str):
+def save_documents(table: pa.Table, filename: str):
     try:
-        with open(filename, "wb") as f:
-            pickle.dump(documents, f)
-        logging.info(f"Saved {len(documents)} documents to {filename}")
+        write_document_store(table, filename)
+        logging.info(f"Saved {table.num_rows} documents to {filename}")
     except Exception as e:
         logging.error(f"Failed to save documents to {filename}: {e}")
         raise
@@ -113,15 +145,15 @@ def main():
         sys.exit(1)
     
     logging.info("Creating documents from scraped data.")
-    documents = create_documents(df)
-    if not documents:
+    table = format_documents(df)
+    if table.num_rows == 0:
         logging.error("No documents were created. Exiting pipeline.")
         sys.exit(1)
     
     os.makedirs(args.output_path, exist_ok=True)
     output_filepath = os.path.join(args.output_path, args.output_file)
     logging.info(f"Saving documents to {output_filepath}")
-    save_documents(documents, output_filepath)
+    save_documents(table, output_filepath)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,19 +1,38 @@
 #!/usr/bin/env python3
 import os
 import argparse
+import hashlib
+import json
 import logging
 import pandas as pd
 import numpy as np
-import pickle
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_text_splitters import RecursiveCharacterTextSplitter
 import faiss
-from langchain_openai import OpenAIEmbeddings
-from langchain.schema import Document
+from langchain_core.documents import Document
 from dotenv import load_dotenv, find_dotenv
 load_dotenv(find_dotenv())
 
 # Import configuration defaults.
 from src.config import config
+from src.utils.embedding import embed_texts_cached
+from src.utils.embedding_backends import (
+    BACKENDS,
+    embedding_identity,
+    make_embeddings,
+    truncate_vectors,
+)
+from src.utils.embedding_cache import EmbeddingCache
+from src.utils.chunk_store import ChunkStore, write_chunk_store
+from src.utils.document_store import read_documents
+from src.utils.lexical_index import BM25Index
+from src.utils.ann_index import (
+    apply_search_params,
+    build_index,
+    evaluate_index,
+    read_index_meta,
+    supports_removal,
+    write_index_meta,
+)
 
 
 def parse_args():
@@ -37,34 +56,103 @@ def parse_args():
         help="Directory where the FAISS index and chunk metadata will be stored."
     )
     parser.add_argument(
-        "--chunk-size", type=int, default=1000,
+        "--chunk-size", type=int, default=config.CHUNK_SIZE,
         help="Chunk size in characters for splitting documents."
     )
     parser.add_argument(
-        "--chunk-overlap", type=int, default=200,
+        "--chunk-overlap", type=int, default=config.CHUNK_OVERLAP,
         help="Overlap (in characters) between chunks."
     )
     parser.add_argument(
-        "--model-name", type=str, default="all-MiniLM-L6-v2",
-        help="SentenceTransformer model name for embedding generation."
+        "--embedding-backend", type=str, choices=BACKENDS,
+        default=config.EMBEDDING_BACKEND,
+        help="Embedding backend: OpenAI API, local CPU model, or a "
+             "deterministic hashing embedder for tests."
+    )
+    parser.add_argument(
+        "--model-name", type=str, default=None,
+        help="Embedding model: an OpenAI model name, a SentenceTransformer "
+             "model path for the local backend, or hashing-<dimension>. "
+             "Defaults to the backend's default model."
+    )
+    parser.add_argument(
+        "--embedding-dimension", type=int, default=None,
+        help="Truncate embeddings to this many dimensions (text-embedding-3 "
+             "models support shortened embeddings). Defaults to full size."
     )
     parser.add_argument(
         "--openai-api-key", type=str, default=os.getenv("OPENAI_API_KEY"),
         help="OpenAI API key for text embeddings."
     )
+    parser.add_argument(
+        "--embed-batch-size", type=int, default=config.EMBED_BATCH_SIZE,
+        help="Number of chunks sent per embedding request."
+    )
+    parser.add_argument(
+        "--embed-concurrency", type=int, default=config.EMBED_CONCURRENCY,
+        help="Number of embedding requests kept in flight at once."
+    )
+    parser.add_argument(
+        "--embed-cache-dir", type=str, default=config.EMBED_CACHE_DIR,
+        help="Directory of the on-disk embedding cache."
+    )
+    parser.add_argument(
+        "--embed-cache-max-mb", type=float, default=config.EMBED_CACHE_MAX_MB,
+        help="Maximum size of the embedding cache before eviction (MB)."
+    )
+    parser.add_argument(
+        "--no-embed-cache", action="store_true",
+        help="Embed every chunk without reading or writing the cache."
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Update the existing index in the output path with only the "
+             "new or changed chunks instead of rebuilding it."
+    )
+    parser.add_argument(
+        "--index-spec", type=str, default=config.INDEX_SPEC,
+        help="Index type: flat, hnsw, ivf-flat, ivf-pq, the scalar-quantized "
+             "flat-fp16, flat-int8, hnsw-int8, ivf-int8, or a FAISS factory "
+             "string such as 'IVF256,PQ32'."
+    )
+    parser.add_argument(
+        "--train-sample", type=int, default=config.INDEX_TRAIN_SAMPLE,
+        help="Maximum number of vectors used to train IVF/PQ indexes."
+    )
+    parser.add_argument(
+        "--nprobe", type=int, default=config.INDEX_NPROBE,
+        help="Number of IVF lists probed per query."
+    )
+    parser.add_argument(
+        "--ef-search", type=int, default=config.INDEX_EF_SEARCH,
+        help="HNSW search depth (efSearch)."
+    )
+    parser.add_argument(
+        "--benchmark-specs", type=str, nargs="*", default=[],
+        help="Additional index specs to build and compare in the index "
+             "report without saving them."
+    )
+    parser.add_argument(
+        "--report-k", type=int, default=config.INDEX_REPORT_K,
+        help="Number of neighbours used for recall@k in the index report."
+    )
+    parser.add_argument(
+        "--report-queries", type=int, default=config.INDEX_REPORT_QUERIES,
+        help="Number of sampled queries used for the index report."
+    )
     return parser.parse_args()
 
 def load_documents(filename: str) -> list[Document]:
     try:
-        with open(filename, "rb") as f:
-            documents = pickle.load(f)
+        documents = read_documents(filename)
         logging.info(f"Loaded {len(documents)} documents from {filename}")
         return documents
     except Exception as e:
         logging.error(f"Error loading documents from {filename}: {e}")
         raise
 
-def chunk_documents(documents, chunk_size=1000, chunk_overlap=200):
+def chunk_documents(documents, chunk_size=config.CHUNK_SIZE,
+                    chunk_overlap=config.CHUNK_OVERLAP):
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
@@ -74,28 +162,230 @@ def chunk_documents(documents, chunk_size=1000, chunk_overlap=200):
     logging.info(f"Created {len(all_chunks)} chunks from documents.")
     return all_chunks
 
-def create_index(chunks, openai_api_key=None):
-    openai_embeddings = OpenAIEmbeddings(model="text-embedding-3-large", 
-    openai_api_key=openai_api_key)
+def chunk_id(chunk) -> int:
+    """Stable 63-bit ID of a chunk, derived from its source URL and offset."""
+    key = f"{chunk.metadata['source']}#{chunk.metadata.get('start_index', 0)}"
+    digest = hashlib.sha256(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") & (2**63 - 1)
 
-    # Create a list of embeddings from the document content
-    doc_embeddings = [
-        openai_embeddings.embed_query(doc.page_content) for doc in chunks
-    ]
+def assign_chunk_ids(chunks) -> dict:
+    """Map each chunk to its stable ID, keeping the first of any duplicates."""
+    chunk_store = {}
+    for chunk in chunks:
+        cid = chunk_id(chunk)
+        if cid in chunk_store:
+            logging.warning(
+                f"Duplicate chunk ID for {chunk.metadata['source']} at "
+                f"{chunk.metadata.get('start_index')}; skipping."
+            )
+            continue
+        chunk_store[cid] = chunk
+    return chunk_store
+
+def source_fingerprints(chunk_store: dict) -> dict:
+    """Hash the chunk texts of every source page, in chunk order."""
+    by_source = {}
+    for chunk in chunk_store.values():
+        by_source.setdefault(chunk.metadata["source"], []).append(chunk)
+    fingerprints = {}
+    for source, source_chunks in by_source.items():
+        digest = hashlib.sha256()
+        for chunk in sorted(
+            source_chunks, key=lambda c: c.metadata.get("start_index", 0)
+        ):
+            digest.update(chunk.page_content.encode("utf-8"))
+            digest.update(b"\0")
+        fingerprints[source] = digest.hexdigest()
+    return fingerprints
 
-    # Convert the list to a numpy array with type float32
+def embed_chunks(chunks, embeddings, model_name=config.EMBEDDING_MODEL,
+                 batch_size=config.EMBED_BATCH_SIZE,
+                 concurrency=config.EMBED_CONCURRENCY,
+                 cache=None, dimension=None) -> np.ndarray:
+    # Create a list of embeddings from the document content, reusing
+    # cached vectors for chunks that were embedded in an earlier run
+    doc_embeddings = embed_texts_cached(
+        embeddings,
+        [doc.page_content for doc in chunks],
+        model_name=model_name,
+        cache=cache,
+        batch_size=batch_size,
+        concurrency=concurrency,
+    )
+
+    # Convert the list to a numpy array with type float32. Full-size
+    # vectors are cached, so other truncations can reuse them.
     embeddings_array = np.array(doc_embeddings, dtype="float32")
+    if dimension is not None:
+        embeddings_array = truncate_vectors(embeddings_array, dimension)
+    return embeddings_array
 
-    # Get the embedding dimension and create the FAISS index
-    dimension = embeddings_array.shape[1]
-    index = faiss.IndexFlatL2(dimension)
-    index.add(embeddings_array)
+def create_index(chunks, embeddings, model_name=config.EMBEDDING_MODEL,
+                 batch_size=config.EMBED_BATCH_SIZE,
+                 concurrency=config.EMBED_CONCURRENCY,
+                 cache=None,
+                 dimension=None,
+                 index_spec=config.INDEX_SPEC,
+                 train_sample=config.INDEX_TRAIN_SAMPLE,
+                 search_params=None,
+                 report_filepath=None,
+                 benchmark_specs=(),
+                 report_k=config.INDEX_REPORT_K,
+                 report_queries=config.INDEX_REPORT_QUERIES):
+    full_embeddings = embed_chunks(
+        chunks, embeddings, model_name, batch_size, concurrency, cache
+    )
+    embeddings_array = full_embeddings
+    if dimension is not None:
+        embeddings_array = truncate_vectors(full_embeddings, dimension)
+
+    # Build an ID-mapped FAISS index of the requested type so chunks can
+    # later be added and removed by their stable IDs
+    ids = np.array([chunk_id(chunk) for chunk in chunks], dtype="int64")
+    index, factory = build_index(
+        index_spec, embeddings_array, ids, train_sample=train_sample
+    )
+    apply_search_params(index, search_params or {})
     
     logging.info(
-        f"FAISS index created with {index.ntotal} vectors (dimension {dimension})."
+        f"FAISS index {factory} created with {index.ntotal} vectors "
+        f"(dimension {index.d})."
+        )
+    if report_filepath:
+        write_index_report(
+            embeddings_array, ids, {index_spec: (index, factory)},
+            benchmark_specs, train_sample, search_params or {}, report_k,
+            report_queries, report_filepath, full_embeddings=full_embeddings,
         )
     return index
 
+def write_index_report(embeddings_array, ids, built_indexes, benchmark_specs,
+                       train_sample, search_params, k, n_queries,
+                       report_filepath, full_embeddings=None):
+    """
+    Compare each index against exact search and write a JSON report of
+    recall@k, query latency percentiles and index size. Chunk embeddings
+    sampled from the corpus serve as queries, so no extra API calls are made.
+    Exact search runs on the full-size float32 embeddings, so the recall
+    includes the loss from truncation as well as from quantization.
+    """
+    if full_embeddings is None:
+        full_embeddings = embeddings_array
+    exact_index = faiss.IndexIDMap2(
+        faiss.IndexFlatL2(full_embeddings.shape[1])
+    )
+    exact_index.add_with_ids(full_embeddings, ids)
+
+    rng = np.random.default_rng(0)
+    n_queries = min(n_queries, len(embeddings_array))
+    sample = rng.choice(len(embeddings_array), size=n_queries, replace=False)
+    queries = full_embeddings[sample]
+    index_queries = embeddings_array[sample]
+
+    for spec in benchmark_specs:
+        if spec not in built_indexes:
+            built_indexes[spec] = build_index(
+                spec, embeddings_array, ids, train_sample=train_sample
+            )
+    report = {}
+    for spec, (index, factory) in built_indexes.items():
+        applied = apply_search_params(index, search_params)
+        result = evaluate_index(
+            index, exact_index, queries, k, index_queries=index_queries
+        )
+        result["factory"] = factory
+        result["search_params"] = applied
+        report[spec] = result
+        logging.info(
+            f"Index {spec}: recall@{k}={result[f'recall@{k}']:.3f}, "
+            f"p50={result['latency_ms']['p50']:.3f} ms, "
+            f"p99={result['latency_ms']['p99']:.3f} ms, "
+            f"size={result['size_bytes'] / 1e6:.1f} MB "
+            f"(dimension {result['dimension']})"
+        )
+    with open(report_filepath, "w") as f:
+        json.dump(report, f, indent=2)
+    logging.info(f"Index report saved to {report_filepath}.")
+    return report
+
+def update_index(index, stored_chunks: dict, chunk_store: dict,
+                 embeddings, model_name=config.EMBEDDING_MODEL,
+                 batch_size=config.EMBED_BATCH_SIZE,
+                 concurrency=config.EMBED_CONCURRENCY,
+                 cache=None, dimension=None):
+    """
+    Bring an ID-mapped index built from `stored_chunks` up to date with
+    `chunk_store`. Chunks of sources that disappeared or whose content
+    changed are removed; chunks of new or changed sources are embedded and
+    added. Returns the updated index and chunk store.
+    """
+    old_prints = source_fingerprints(stored_chunks)
+    new_prints = source_fingerprints(chunk_store)
+    stale_sources = {
+        source for source, fingerprint in old_prints.items()
+        if new_prints.get(source) != fingerprint
+    }
+    fresh_sources = {
+        source for source, fingerprint in new_prints.items()
+        if old_prints.get(source) != fingerprint
+    }
+
+    remove_ids = [
+        cid for cid, chunk in stored_chunks.items()
+        if chunk.metadata["source"] in stale_sources
+    ]
+    if remove_ids:
+        index.remove_ids(np.array(remove_ids, dtype="int64"))
+
+    added = [
+        (cid, chunk) for cid, chunk in chunk_store.items()
+        if chunk.metadata["source"] in fresh_sources
+    ]
+    if added:
+        embeddings_array = embed_chunks(
+            [chunk for _, chunk in added],
+            embeddings, model_name, batch_size, concurrency, cache,
+            dimension=dimension,
+        )
+        if embeddings_array.shape[1] != index.d:
+            raise ValueError(
+                f"Embedding dimension {embeddings_array.shape[1]} does not "
+                f"match index dimension {index.d}."
+            )
+        ids = np.array([cid for cid, _ in added], dtype="int64")
+        index.add_with_ids(embeddings_array, ids)
+
+    updated_store = {
+        cid: chunk for cid, chunk in stored_chunks.items()
+        if chunk.metadata["source"] not in stale_sources
+    }
+    updated_store.update(added)
+    logging.info(
+        f"Incremental update: {len(stale_sources)} sources removed or changed, "
+        f"{len(fresh_sources)} sources added or changed; removed "
+        f"{len(remove_ids)} and added {len(added)} chunks "
+        f"({index.ntotal} vectors in index)."
+    )
+    return index, updated_store
+
+def load_index(index_filepath):
+    try:
+        index = faiss.read_index(index_filepath)
+        logging.info(f"Loaded index with {index.ntotal} vectors from {index_filepath}.")
+        return index
+    except Exception as e:
+        logging.error(f"Error loading index from {index_filepath}: {e}")
+        raise
+
+def load_chunks(chunks_filepath):
+    try:
+        chunk_store = ChunkStore(chunks_filepath).to_dict()
+        logging.info(f"Loaded {len(chunk_store)} chunks from {chunks_filepath}.")
+        return chunk_store
+    except Exception as e:
+        logging.error(f"Error loading chunks from {chunks_filepath}: {e}")
+        raise
+
 def save_index(index, output_index_filepath):
     try:
         faiss.write_index(index, output_index_filepath)
@@ -104,36 +394,181 @@ def save_index(index, output_index_filepath):
         logging.error(f"Error saving index: {e}")
         raise
 
+def save_index_meta(meta, output_meta_filepath):
+    try:
+        write_index_meta(meta, output_meta_filepath)
+        logging.info(f"Index metadata saved to {output_meta_filepath}.")
+    except Exception as e:
+        logging.error(f"Error saving index metadata: {e}")
+        raise
+
 def save_chunks(chunks, output_chunks_filepath):
     try:
-        with open(output_chunks_filepath, "wb") as f:
-            pickle.dump(chunks, f)
+        write_chunk_store(chunks, output_chunks_filepath)
         logging.info(f"Chunk metadata saved to {output_chunks_filepath}.")
     except Exception as e:
         logging.error(f"Error saving chunk metadata: {e}")
         raise
 
+def save_lexical_index(chunks, output_lexical_filepath):
+    """Build the BM25 index over all chunks, keyed by chunk id."""
+    try:
+        lexical_index = BM25Index.build(
+            chunks.keys(), (chunk.page_content for chunk in chunks.values())
+        )
+        lexical_index.save(output_lexical_filepath)
+        logging.info(
+            f"Lexical index over {len(lexical_index)} chunks with "
+            f"{len(lexical_index.vocab)} terms saved to "
+            f"{output_lexical_filepath}."
+        )
+    except Exception as e:
+        logging.error(f"Error saving lexical index: {e}")
+        raise
+
+def index_documents(documents, output_path: str,
+                    chunk_size: int = config.CHUNK_SIZE,
+                    chunk_overlap: int = config.CHUNK_OVERLAP,
+                    embedding_backend: str = config.EMBEDDING_BACKEND,
+                    model_name: str = None,
+                    embedding_dimension: int = None,
+                    openai_api_key: str = None,
+                    embed_batch_size: int = config.EMBED_BATCH_SIZE,
+                    embed_concurrency: int = config.EMBED_CONCURRENCY,
+                    embed_cache_dir: str = config.EMBED_CACHE_DIR,
+                    embed_cache_max_mb: float = config.EMBED_CACHE_MAX_MB,
+                    incremental: bool = False,
+                    index_spec: str = config.INDEX_SPEC,
+                    train_sample: int = config.INDEX_TRAIN_SAMPLE,
+                    nprobe: int = config.INDEX_NPROBE,
+                    ef_search: int = config.INDEX_EF_SEARCH,
+                    benchmark_specs=(),
+                    report_k: int = config.INDEX_REPORT_K,
+                    report_queries: int = config.INDEX_REPORT_QUERIES) -> dict:
+    """
+    Chunk and embed documents and save the index, chunk store, lexical
+    index and metadata to `output_path`. Without an `embed_cache_dir` no
+    embedding cache is used. Returns the saved index metadata.
+    """
+    os.makedirs(output_path, exist_ok=True)
+    chunks = chunk_documents(
+        documents,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
+    )
+    cache = None
+    if embed_cache_dir:
+        cache = EmbeddingCache(embed_cache_dir, max_size_mb=embed_cache_max_mb)
+    model_name = model_name \
+        or config.DEFAULT_EMBEDDING_MODELS[embedding_backend]
+    embed_kwargs = dict(
+        embeddings=make_embeddings(
+            embedding_backend,
+            model_name,
+            openai_api_key=openai_api_key,
+            batch_size=embed_batch_size,
+        ),
+        model_name=model_name,
+        dimension=embedding_dimension,
+        batch_size=embed_batch_size,
+        concurrency=embed_concurrency,
+        cache=cache,
+    )
+    index_filepath = os.path.join(output_path, config.INDEX_FILE)
+    meta_filepath = os.path.join(output_path, config.INDEX_META_FILE)
+    chunks_filepath = os.path.join(output_path, config.CHUNKS_FILE)
+    report_filepath = os.path.join(output_path, config.INDEX_REPORT_FILE)
+    lexical_filepath = os.path.join(output_path, config.LEXICAL_INDEX_FILE)
+    search_params = {"nprobe": nprobe, "efSearch": ef_search}
+    chunk_store = assign_chunk_ids(chunks)
+
+    index = None
+    if incremental and os.path.exists(index_filepath) \
+            and os.path.exists(chunks_filepath):
+        stored_index = load_index(index_filepath)
+        stored_chunks = load_chunks(chunks_filepath)
+        stored_meta = {}
+        if os.path.exists(meta_filepath):
+            stored_meta = read_index_meta(meta_filepath)
+        stored_spec = stored_meta.get("index_spec")
+        # Vectors from another embedding model cannot be mixed in
+        same_embeddings = embedding_identity(stored_meta) == (
+            embedding_backend, model_name
+        ) and stored_meta.get("embedding_dimension") == embedding_dimension
+        if stored_spec == index_spec and same_embeddings \
+                and supports_removal(stored_index):
+            index, chunk_store = update_index(
+                stored_index, stored_chunks, chunk_store, **embed_kwargs
+            )
+        else:
+            logging.warning(
+                f"Existing index ({stored_spec}, "
+                f"{'/'.join(embedding_identity(stored_meta))}) cannot be "
+                f"updated in place as {index_spec}, "
+                f"{embedding_backend}/{model_name}; rebuilding from "
+                f"scratch."
+            )
+    if index is None:
+        index = create_index(
+            list(chunk_store.values()),
+            index_spec=index_spec,
+            train_sample=train_sample,
+            search_params=search_params,
+            report_filepath=report_filepath,
+            benchmark_specs=list(benchmark_specs),
+            report_k=report_k,
+            report_queries=report_queries,
+            **embed_kwargs,
+        )
+    meta = {
+        "index_spec": index_spec,
+        "search_params": apply_search_params(index, search_params),
+        "dimension": index.d,
+        "ntotal": index.ntotal,
+        "embedding_backend": embedding_backend,
+        "embedding_model": model_name,
+        "embedding_dimension": embedding_dimension,
+    }
+    save_index(index, index_filepath)
+    save_index_meta(meta, meta_filepath)
+    save_chunks(chunk_store, chunks_filepath)
+    save_lexical_index(chunk_store, lexical_filepath)
+    if cache is not None:
+        cache.log_report()
+    logging.info("Indexing process completed successfully.")
+    return meta
+
 def main():
     args = parse_args()
     input_filepath = os.path.join(args.input_path, args.input_file)
-    os.makedirs(args.output_path, exist_ok=True)
     logging.basicConfig(
         level=logging.INFO, 
         format="%(asctime)s - %(levelname)s - %(message)s"
     )
     logging.getLogger("openai").setLevel(logging.WARNING)
     documents = load_documents(input_filepath)
-    chunks = chunk_documents(
-        documents, 
-        chunk_size=args.chunk_size, 
-        chunk_overlap=args.chunk_overlap
+    index_documents(
+        documents,
+        args.output_path,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        embedding_backend=args.embedding_backend,
+        model_name=args.model_name,
+        embedding_dimension=args.embedding_dimension,
+        openai_api_key=args.openai_api_key,
+        embed_batch_size=args.embed_batch_size,
+        embed_concurrency=args.embed_concurrency,
+        embed_cache_dir=None if args.no_embed_cache else args.embed_cache_dir,
+        embed_cache_max_mb=args.embed_cache_max_mb,
+        incremental=args.incremental,
+        index_spec=args.index_spec,
+        train_sample=args.train_sample,
+        nprobe=args.nprobe,
+        ef_search=args.ef_search,
+        benchmark_specs=args.benchmark_specs,
+        report_k=args.report_k,
+        report_queries=args.report_queries,
     )
-    index = create_index(chunks, openai_api_key=args.openai_api_key)
-    index_filepath = os.path.join(args.output_path, config.INDEX_FILE)
-    chunks_filepath = os.path.join(args.output_path, config.CHUNKS_FILE)
-    save_index(index, index_filepath)
-    save_chunks(chunks, chunks_filepath)
-    logging.info("Indexing process completed successfully.")
 
 if __name__ == "__main__":
     main()
@@ -1,62 +1,184 @@
 import os
+import sys
+import time
+import logging
 import argparse
-import subprocess
+import resource
+from contextlib import contextmanager
+from typing import Optional
 import yaml
 from prefect import flow, task, get_run_logger
+from prefect.cache_policies import NO_CACHE
 from dotenv import load_dotenv, find_dotenv
 load_dotenv(find_dotenv())
 # Import configuration defaults.
 from src.config import config
+from src.pipeline import format_to_documents, generate_index
+from src.pipeline.website_scrapers.dkk_scraper import save_as_parquet, scrape_breeds
+from src.pipeline.format_to_documents import format_documents, save_documents
+from src.pipeline.generate_index import index_documents, load_documents
+from src.utils import (
+    ann_index,
+    chunk_store,
+    document_store,
+    embedding,
+    embedding_backends,
+    lexical_index,
+)
+from src.utils.ann_index import read_index_meta
+from src.utils.document_store import to_documents
+from src.utils.fetch_cache import FetchCache
+from src.utils.stage_cache import (
+    StageCache,
+    code_version,
+    hash_dataframe,
+    hash_documents,
+    stage_key,
+)
+
+# Modules whose code determines each stage's output
+DOCUMENT_CODE = (format_to_documents, document_store)
+INDEX_CODE = (generate_index, embedding, embedding_backends, chunk_store,
+              lexical_index, ann_index)
 
 def load_config(config_path: str) -> dict:
     """Load configuration from a YAML file."""
     with open(config_path, "r") as f:
         return yaml.safe_load(f)
 
-@task
-def run_scraping(scrape_output_path: str, scrape_output_file: str):
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process so far, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+@contextmanager
+def stage_metrics(stage: str):
+    """
+    Log the wall time, output row count and peak memory of a stage. The
+    stage sets stats["rows"]. The peak is the process's peak resident
+    memory, which includes native buffers of pandas, pyarrow and FAISS;
+    the increase shows how far the stage raised it.
+    """
     logger = get_run_logger()
-    cmd = [
-        "python",
-        "src/pipeline/website_scrapers/dkk_scraper.py",
-        "--output-path", scrape_output_path,
-        "--output-file", scrape_output_file
-    ]
-    logger.info(f"Running scraping script: {' '.join(cmd)}")
-    subprocess.run(cmd, check=True)
+    peak_before = peak_rss_mb()
+    stats = {"rows": None}
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        elapsed = time.perf_counter() - start
+        peak = peak_rss_mb()
+        logger.info(
+            f"Stage {stage}: {elapsed:.1f}s, {stats['rows']} rows, "
+            f"peak memory {peak:.1f} MB (+{peak - peak_before:.1f} MB)"
+        )
+
+# Stages pass DataFrames and documents in memory; Prefect should neither
+# hash nor persist them.
+@task(cache_policy=NO_CACHE)
+def run_scraping(scrape_output_path: str, scrape_output_file: str,
+                 persist: bool = True,
+                 fetch_cache_file: str = config.FETCH_CACHE_FILE):
+    """Scrape the breed pages. The previous Parquet output lets unchanged
+    pages be reused; with `persist` the new output replaces it."""
+    logger = get_run_logger()
+    output_filepath = os.path.join(scrape_output_path, scrape_output_file)
+    fetch_cache = FetchCache(fetch_cache_file)
+    with stage_metrics("scraping") as stats:
+        df = scrape_breeds(output_filepath, fetch_cache)
+        stats["rows"] = len(df)
+        if df.empty:
+            raise ValueError("No dog profiles scraped.")
+        if persist:
+            save_as_parquet(df, output_filepath)
+            fetch_cache.save()
     logger.info("Scraping step completed.")
+    return df
 
-@task
-def run_document_creation(scrape_output_path: str, scrape_output_file: str,
-                          document_output_path: str, document_output_file: str):
+@task(cache_policy=NO_CACHE)
+def run_document_creation(df, document_output_path: str,
+                          document_output_file: str, persist: bool = True,
+                          stage_cache: Optional[StageCache] = None,
+                          force: bool = False):
+    """Create documents, or load the persisted ones if they were created
+    from the same scraped data by the same code."""
     logger = get_run_logger()
-    cmd = [
-        "python",
-        "src/pipeline/format_to_documents.py",
-        "--input-path", scrape_output_path,
-        "--input-file", scrape_output_file,
-        "--output-path", document_output_path,
-        "--output-file", document_output_file
-    ]
-    logger.info(f"Running document creation script: {' '.join(cmd)}")
-    subprocess.run(cmd, check=True)
+    documents_filepath = os.path.join(document_output_path, document_output_file)
+    cache_key = stage_key(hash_dataframe(df), code_version(*DOCUMENT_CODE))
+    with stage_metrics("document creation") as stats:
+        if persist and stage_cache is not None and not force \
+                and stage_cache.lookup("documents", cache_key):
+            logger.info("Scraped data unchanged; loading cached documents.")
+            documents = load_documents(documents_filepath)
+        else:
+            table = format_documents(df)
+            if table.num_rows == 0:
+                raise ValueError("No documents were created.")
+            if persist:
+                save_documents(table, documents_filepath)
+                if stage_cache is not None:
+                    stage_cache.store("documents", cache_key,
+                                      [documents_filepath])
+            documents = to_documents(table)
+        stats["rows"] = len(documents)
     logger.info("Document creation step completed.")
+    return documents
 
-@task
-def run_index_creation(document_output_path: str, document_output_file: str,
-                       index_output_path: str, openai_api_key: str):
+@task(cache_policy=NO_CACHE)
+def run_index_creation(documents, index_output_path: str,
+                       openai_api_key: Optional[str],
+                       incremental: bool = True,
+                       embedding_backend: str = "openai",
+                       embedding_model: Optional[str] = None,
+                       stage_cache: Optional[StageCache] = None,
+                       force: bool = False):
+    """Build or update the index, unless the saved index was built from the
+    same documents with the same settings and code."""
     logger = get_run_logger()
-    cmd = [
-        "python",
-        "src/pipeline/generate_index.py",
-        "--input-path", document_output_path,
-        "--input-file", document_output_file,
-        "--output-path", index_output_path,
-        "--openai-api-key", openai_api_key
+    embedding_model = embedding_model \
+        or config.DEFAULT_EMBEDDING_MODELS[embedding_backend]
+    cache_key = stage_key(
+        hash_documents(documents),
+        config.CHUNK_SIZE,
+        config.CHUNK_OVERLAP,
+        embedding_backend,
+        embedding_model,
+        config.INDEX_SPEC,
+        config.INDEX_NPROBE,
+        config.INDEX_EF_SEARCH,
+        code_version(*INDEX_CODE),
+    )
+    meta_filepath = os.path.join(index_output_path, config.INDEX_META_FILE)
+    artifacts = [
+        os.path.join(index_output_path, filename)
+        for filename in (config.INDEX_FILE, config.INDEX_META_FILE,
+                         config.CHUNKS_FILE, config.LEXICAL_INDEX_FILE)
     ]
-    logger.info(f"Running index creation script: {' '.join(cmd)}")
-    subprocess.run(cmd, check=True)
+    with stage_metrics("index creation") as stats:
+        if stage_cache is not None and not force \
+                and stage_cache.lookup("index", cache_key):
+            logger.info("Documents and settings unchanged; keeping the index.")
+            meta = read_index_meta(meta_filepath)
+        else:
+            meta = index_documents(
+                documents,
+                index_output_path,
+                chunk_size=config.CHUNK_SIZE,
+                chunk_overlap=config.CHUNK_OVERLAP,
+                embedding_backend=embedding_backend,
+                model_name=embedding_model,
+                openai_api_key=openai_api_key,
+                incremental=incremental,
+                index_spec=config.INDEX_SPEC,
+                nprobe=config.INDEX_NPROBE,
+                ef_search=config.INDEX_EF_SEARCH,
+            )
+            if stage_cache is not None:
+                stage_cache.store("index", cache_key, artifacts)
+        stats["rows"] = meta["ntotal"]
     logger.info("Index creation step completed.")
+    return meta
 
 @flow(name="Dog Breed Pipeline")
 def dog_breed_pipeline(scrape_output_path: str,
@@ -64,18 +186,50 @@ def dog_breed_pipeline(scrape_output_path: str,
                        document_output_path: str,
                        document_output_file: str,
                        index_output_path: str,
-                       open_ai_key: str):
+                       open_ai_key: Optional[str],
+                       incremental_index: bool = True,
+                       embedding_backend: str = "openai",
+                       embedding_model: Optional[str] = None,
+                       persist_scrape: bool = True,
+                       persist_documents: bool = True,
+                       force: bool = False,
+                       stage_cache_max_age_hours: Optional[float] =
+                           config.STAGE_CACHE_MAX_AGE_HOURS,
+                       fetch_cache_file: str = config.FETCH_CACHE_FILE,
+                       stage_cache_file: str = config.STAGE_CACHE_FILE):
+    """
+    Scrape, create documents and index in this process, handing the
+    DataFrame and documents from stage to stage in memory. Persisting the
+    scraped data and documents is optional; they serve as checkpoints,
+    for incremental scraping and in release artifacts. The index is
+    always saved.
+
+    Document creation and indexing are skipped when their inputs,
+    parameters and code match those of their saved artifacts, unless
+    `force` is set or the artifacts are older than
+    `stage_cache_max_age_hours`.
+    """
     os.makedirs(scrape_output_path, exist_ok=True)
     os.makedirs(document_output_path, exist_ok=True)
     os.makedirs(index_output_path, exist_ok=True)
-    run_scraping(scrape_output_path, scrape_output_file)
-    run_document_creation(scrape_output_path, scrape_output_file,
-                          document_output_path, document_output_file)
+    df = run_scraping(scrape_output_path, scrape_output_file,
+                      persist=persist_scrape, fetch_cache_file=fetch_cache_file)
+    stage_cache = StageCache(stage_cache_file,
+                             max_age_hours=stage_cache_max_age_hours)
+    documents = run_document_creation(df, document_output_path,
+                                      document_output_file,
+                                      persist=persist_documents,
+                                      stage_cache=stage_cache,
+                                      force=force)
     run_index_creation(
-        document_output_path, 
-        document_output_file, 
+        documents,
         index_output_path,
-        open_ai_key
+        open_ai_key,
+        incremental_index,
+        embedding_backend,
+        embedding_model,
+        stage_cache=stage_cache,
+        force=force,
         )
 
 def parse_args():
@@ -88,9 +242,20 @@ def parse_args():
         default="src/config/production_config.yaml",
         help="Path to the production configuration YAML file."
     )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rerun every stage even if its inputs are unchanged."
+    )
     return parser.parse_args()
 
 def main():
+    # Stage modules log through the root logger
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    logging.getLogger("openai").setLevel(logging.WARNING)
     args = parse_args()
     config = load_config(args.config)
     # Extract values from the configuration file.
@@ -100,8 +265,23 @@ def main():
     document_output_path = config.get("document_output_path", config.get("output_path", "output"))
     document_output_file = config.get("document_output_file", "breed_documents.parquet")
     index_output_path = config.get("index_output_path", config.get("output_path", "output"))
+    incremental_index = config.get("incremental_index", True)
+    embedding_backend = config.get("embedding_backend", "openai")
+    embedding_model = config.get("embedding_model")
+    persist_scrape = config.get("persist_scrape", True)
+    persist_documents = config.get("persist_documents", True)
+    force = args.force or config.get("force_rebuild", False)
+    stage_cache_max_age_hours = config.get("stage_cache_max_age_hours", 168)
+    # Caches are kept with the outputs, so the next run can use them
+    cache_path = os.path.join(config.get("output_path", "output"), ".cache")
+    fetch_cache_file = config.get(
+        "fetch_cache_file", os.path.join(cache_path, "fetch_cache.json")
+    )
+    stage_cache_file = config.get(
+        "stage_cache_file", os.path.join(cache_path, "stage_cache.json")
+    )
     openai_api_key = os.getenv("OPENAI_API_KEY")
-    if not openai_api_key:
+    if not openai_api_key and embedding_backend == "openai":
         raise ValueError("OPENAI_API_KEY environment variable must be set.")
 
     print("Using configuration:")
@@ -110,6 +290,15 @@ def main():
     print(f"  Document output path: {document_output_path}")
     print(f"  Document output file: {document_output_file}")
     print(f"  Index output path:    {index_output_path}")
+    print(f"  Incremental index:    {incremental_index}")
+    print(f"  Embedding backend:    {embedding_backend}")
+    print(f"  Embedding model:      {embedding_model or 'default'}")
+    print(f"  Persist scrape:       {persist_scrape}")
+    print(f"  Persist documents:    {persist_documents}")
+    print(f"  Force rebuild:        {force}")
+    print(f"  Stage cache max age:  {stage_cache_max_age_hours} hours")
+    print(f"  Fetch cache file:     {fetch_cache_file}")
+    print(f"  Stage cache file:     {stage_cache_file}")
 
     dog_breed_pipeline(
         scrape_output_path,
@@ -117,7 +306,16 @@ def main():
         document_output_path,
         document_output_file,
         index_output_path,
-        openai_api_key
+        openai_api_key,
+        incremental_index,
+        embedding_backend,
+        embedding_model,
+        persist_scrape,
+        persist_documents,
+        force,
+        stage_cache_max_age_hours,
+        fetch_cache_file,
+        stage_cache_file,
         )
 
 if __name__ == "__main__":
@@ -1,44 +1,57 @@
 #!/usr/bin/env python3
 import os
+import re
 import time
+import queue
 import argparse
-import requests
 import logging
 from datetime import datetime
-from typing import List, Dict, Optional
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Tuple
 import pandas as pd
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.firefox.options import Options
-from selenium.webdriver.firefox.service import Service
-from webdriver_manager.firefox import GeckoDriverManager
+from bs4 import BeautifulSoup, SoupStrainer
 
 # Import configuration defaults.
 from src.config import config
+from src.utils.fetcher import Fetcher, make_session
+from src.utils.fetch_cache import FetchCache
 from dotenv import load_dotenv, find_dotenv
 load_dotenv(find_dotenv())
 
-print(os.getenv('OPENAI_API_KEY'))
 # Constants for the DKK website
 BASE_URL = "https://www.dkk.dk/race"
+SITEMAP_URL = "https://www.dkk.dk/sitemap.xml"
+# A breed page, possibly with JSON-escaped slashes inside a script
+RACE_LINK_PATTERN = re.compile(r"https?:\\?/\\?/www\.dkk\.dk\\?/race\\?/[\w%-]+")
 RACE_SELECT_CLASS = "lex-custom-select font-semibold pl-2 md: p-1"
 RACE_SPEC_CLASS = "race-spec"
 LEXICON_CLASS = "md:grid grid-cols-2 gap-x-5"
 LEXICON_TEXT_CLASS = "lex-text"
 DOCUMENTS_CONTAINER_CLASS = "mx-auto lg:max-w-screen-lg px-10 py-10 lg:py-20"
 REQUEST_TIMEOUT = 10
+# Breed pages are parsed with lxml, building only the containers the
+# parsers read; navigation, scripts and the rest of the page are skipped.
+HTML_PARSER = "lxml"
+PAGE_CONTAINER_CLASSES = [RACE_SPEC_CLASS, LEXICON_CLASS, DOCUMENTS_CONTAINER_CLASS]
+
+def is_page_container(class_value: Optional[str]) -> bool:
+    """Whether a class attribute holds all classes of a container the
+    parsers read, in any order and possibly with extra classes."""
+    if not class_value:
+        return False
+    tokens = set(class_value.split())
+    return any(set(classes.split()) <= tokens for classes in PAGE_CONTAINER_CLASSES)
+
+# The strainer sees the raw class attribute, so classes are compared as
+# tokens rather than as the whole string.
+PAGE_STRAINER = SoupStrainer("div", attrs={"class": is_page_container})
 USER_AGENT = (
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
     "AppleWebKit/537.36 (KHTML, like Gecko) "
     "Chrome/91.0.4472.124 Safari/537.36"
 )
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[logging.StreamHandler()]
-)
-
 # Use local cache for webdriver.
 os.environ["WDM_LOCAL"] = "1"
 
@@ -58,40 +71,213 @@ def parse_args():
         default=config.SCRAPE_OUTPUT_FILE,
         help="Output file name for scraped data"
     )
+    parser.add_argument(
+        "--concurrency", type=int, default=config.SCRAPE_CONCURRENCY,
+        help="Maximum number of breed pages fetched at the same time."
+    )
+    parser.add_argument(
+        "--rate-limit", type=float, default=config.SCRAPE_RATE_LIMIT,
+        help="Maximum requests per second to one host (0 disables)."
+    )
+    parser.add_argument(
+        "--max-retries", type=int, default=config.SCRAPE_MAX_RETRIES,
+        help="Retries per page on timeouts and 429/5xx responses."
+    )
+    parser.add_argument(
+        "--backoff", type=float, default=config.SCRAPE_BACKOFF,
+        help="Base delay in seconds of the jittered exponential backoff."
+    )
+    parser.add_argument(
+        "--fetch-cache", type=str, default=config.FETCH_CACHE_FILE,
+        help="File with the ETag, Last-Modified and content hash of each page."
+    )
+    parser.add_argument(
+        "--full-refresh", action="store_true",
+        help="Download and parse every page, ignoring the fetch cache."
+    )
+    parser.add_argument(
+        "--link-discovery", choices=["auto", "http", "browser"], default="auto",
+        help="Find race links over plain HTTP, with a headless browser, or "
+             "over HTTP with the browser as fallback (auto)."
+    )
+    parser.add_argument(
+        "--parse-workers", type=int, default=config.SCRAPE_PARSE_WORKERS,
+        help="Processes parsing breed pages (1 parses in this process)."
+    )
+    parser.add_argument(
+        "--min-link-ratio", type=float, default=config.SCRAPE_MIN_LINK_RATIO,
+        help="Minimum number of race links, as a fraction of the breeds in "
+             "the previous scrape, before the scrape is trusted (0 disables)."
+    )
     return parser.parse_args()
 
-class WebDriverContext:
-    """Context manager for handling WebDriver resources."""
-    def __enter__(self):
-        os.environ["WDM_LOCAL"] = "1"  # Use local driver cache
+class BrowserPool:
+    """
+    Long-lived headless Firefox browsers, started on first use and reused
+    across retries and pages. The driver binary is resolved once per pool;
+    a browser that raised an error is replaced by a fresh one.
+    """
+    def __init__(self, size: int = 1):
+        self.size = size
+        self._idle = queue.Queue()
+        self._started = 0
+        self._driver_path = None
+
+    def _start(self):
+        # Imported here so runs that never need a browser skip selenium
+        from selenium import webdriver
+        from selenium.webdriver.firefox.options import Options
+        from selenium.webdriver.firefox.service import Service
+        from webdriver_manager.firefox import GeckoDriverManager
+
+        if self._driver_path is None:
+            self._driver_path = GeckoDriverManager().install()
         options = Options()
         options.add_argument("--headless")
-        self.driver = webdriver.Firefox(
-            service=Service(GeckoDriverManager().install()),
-            options=options
-        )
-        return self.driver
+        start = time.perf_counter()
+        driver = webdriver.Firefox(service=Service(self._driver_path),
+                                   options=options)
+        logging.info(f"Started headless browser in {time.perf_counter() - start:.1f}s")
+        return driver
+
+    @contextmanager
+    def browser(self):
+        if self._idle.empty() and self._started < self.size:
+            self._started += 1
+            try:
+                driver = self._start()
+            except Exception:
+                self._started -= 1
+                raise
+        else:
+            driver = self._idle.get()
+        try:
+            yield driver
+        except Exception:
+            driver.quit()
+            self._started -= 1
+            raise
+        self._idle.put(driver)
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get().quit()
+        self._started = 0
+
+    def __enter__(self):
+        return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.driver.quit()
+        self.close()
+
+def normalize_race_links(links) -> List[str]:
+    """
+    Race links without trailing slash and duplicates. The URL is the key of
+    a breed's row, fetch cache entry and chunk IDs, so every discovery
+    source must give the same URL for the same breed.
+    """
+    return list(dict.fromkeys(link.rstrip("/") for link in links))
 
-def get_race_links(driver: webdriver.Firefox, url: str) -> List[str]:
-    """Extract race links from the main breed page."""
+def extract_race_links(html: str) -> List[str]:
+    """Extract race links from the breed select of the main breed page."""
+    soup = BeautifulSoup(html, "html.parser")
+    select_element = soup.find("select", class_=RACE_SELECT_CLASS)
+    if not select_element:
+        return []
+    return [
+        option["value"] for option in select_element.find_all("option")
+        if option.get("value") and "www.dkk.dk/race" in option["value"]
+    ]
+
+def extract_script_race_links(html: str) -> List[str]:
+    """Extract race links from JSON and scripts embedded in a page."""
+    soup = BeautifulSoup(html, "html.parser")
+    links = []
+    for script in soup.find_all("script"):
+        links.extend(
+            match.replace("\\/", "/")
+            for match in RACE_LINK_PATTERN.findall(script.get_text())
+        )
+    return list(dict.fromkeys(links))
+
+def get_sitemap_race_links(fetcher: Fetcher, url: str = SITEMAP_URL,
+                           depth: int = 0) -> List[str]:
+    """Collect race links from the sitemap, following one level of
+    nested sitemaps."""
+    response = fetcher.fetch(url)
+    if response is None:
+        return []
+    soup = BeautifulSoup(response.content, "xml")
+    locations = [loc.get_text(strip=True) for loc in soup.find_all("loc")]
+    links = [loc.rstrip("/") for loc in locations
+             if RACE_LINK_PATTERN.fullmatch(loc.rstrip("/"))]
+    if depth == 0:
+        for loc in locations:
+            if loc.endswith(".xml"):
+                links.extend(get_sitemap_race_links(fetcher, loc, depth + 1))
+    return list(dict.fromkeys(links))
+
+def discover_race_links(fetcher: Fetcher, min_links: int = 1) -> List[str]:
+    """
+    Find race links over plain HTTP: the breed select in the static HTML
+    of the breed page, links in its embedded scripts, or the sitemap. The
+    first source with at least `min_links` links is used. Returns an empty
+    list if the links are only rendered by JavaScript.
+    """
+    response = fetcher.fetch(BASE_URL)
+    strategies = []
+    if response is not None:
+        strategies.append(("static HTML", lambda: extract_race_links(response.text)))
+        strategies.append(("embedded scripts",
+                           lambda: extract_script_race_links(response.text)))
+    strategies.append(("sitemap", lambda: get_sitemap_race_links(fetcher)))
+    for name, strategy in strategies:
+        race_links = normalize_race_links(strategy())
+        if race_links and len(race_links) >= min_links:
+            logging.info(f"Found {len(race_links)} race links in the {name}.")
+            return race_links
+        if race_links:
+            logging.warning(
+                f"Only {len(race_links)} race links in the {name}; "
+                f"expected at least {min_links}."
+            )
+    logging.warning("No complete list of race links found over plain HTTP.")
+    return []
+
+def get_race_links(driver, url: str) -> List[str]:
+    """Extract race links from the main breed page rendered by a browser."""
     try:
         driver.get(url)
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-        select_element = soup.find("select", class_=RACE_SELECT_CLASS)
-        if not select_element:
+        race_links = extract_race_links(driver.page_source)
+        if not race_links:
             logging.warning("No race select element found on page")
-            return []
-        return [
-            option["value"] for option in select_element.find_all("option")
-            if option.get("value") and "www.dkk.dk/race" in option["value"]
-        ]
+        return race_links
     except Exception as e:
         logging.error(f"Error fetching race links: {str(e)}")
         return []
 
+def get_race_links_with_browser(pool: BrowserPool, url: str,
+                                max_retries: int = 3,
+                                delay_between_retries: float = 10) -> List[str]:
+    """Render the breed page in a pooled browser, retrying if it has no
+    race links."""
+    for attempt in range(max_retries):
+        try:
+            with pool.browser() as driver:
+                race_links = get_race_links(driver, url)
+        except Exception as e:
+            logging.error(f"Browser failed on attempt {attempt+1}: {str(e)}")
+            race_links = []
+        if race_links:
+            logging.info(f"Found {len(race_links)} race links on attempt {attempt+1}.")
+            return race_links
+        if attempt + 1 < max_retries:
+            logging.warning(
+                f"No race links found on attempt {attempt+1}/{max_retries}. "
+                f"Retrying in {delay_between_retries} seconds...")
+            time.sleep(delay_between_retries)
+    return []
+
 def parse_race_spec(soup: BeautifulSoup) -> Dict[str, str]:
     """Parse race specifications from the detail page."""
     specs = {}
@@ -121,16 +307,17 @@ def parse_documents(soup: BeautifulSoup) -> List[str]:
     doc_container = soup.find("div", class_=DOCUMENTS_CONTAINER_CLASS)
     return [a["href"] for a in doc_container.find_all("a")] if doc_container else []
 
-def get_dog_info(url: str, session: requests.Session) -> Optional[Dict]:
+def get_dog_info(url: str, fetcher: Fetcher) -> Optional[Dict]:
     """Fetch and parse detailed dog information from an individual race page."""
-    try:
-        response = session.get(url, timeout=REQUEST_TIMEOUT)
-        response.raise_for_status()
-    except requests.RequestException as e:
-        logging.error(f"Request failed for {url}: {str(e)}")
+    response = fetcher.fetch(url)
+    if response is None:
         return None
+    return parse_dog_info(url, response.text)
+
+def parse_dog_info(url: str, html: str) -> Optional[Dict]:
+    """Parse detailed dog information from the HTML of a race page."""
     try:
-        soup = BeautifulSoup(response.text, "html.parser")
+        soup = BeautifulSoup(html, HTML_PARSER, parse_only=PAGE_STRAINER)
         return {
             "url": url,
             "specs": parse_race_spec(soup),
@@ -141,54 +328,179 @@ def get_dog_info(url: str, session: requests.Session) -> Optional[Dict]:
         logging.error(f"Parsing failed for {url}: {str(e)}")
         return None
 
-def save_as_parquet(data: List[Dict], filename: str):
+def parse_pages(pages: List[Tuple[str, str]], workers: int) -> List[Optional[Dict]]:
+    """
+    Parse (url, html) pairs in a pool of `workers` processes, so parsing is
+    not limited to one core. Results are in the order of `pages`.
+    """
+    start = time.perf_counter()
+    if workers <= 1 or len(pages) <= 1:
+        results = [parse_dog_info(url, html) for url, html in pages]
+    else:
+        urls, htmls = zip(*pages)
+        chunksize = max(1, len(pages) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(parse_dog_info, urls, htmls,
+                                        chunksize=chunksize))
+    logging.info(
+        f"Parsed {len(pages)} pages in {time.perf_counter() - start:.1f}s "
+        f"with {max(1, min(workers, len(pages)))} workers."
+    )
+    return results
+
+def load_previous_records(filename: str) -> Dict[str, Dict]:
+    """Load the rows of the previous scrape, keyed by URL."""
+    if not os.path.exists(filename):
+        return {}
+    try:
+        df = pd.read_parquet(filename)
+    except Exception as e:
+        logging.warning(f"Could not read previous scrape {filename}: {e}")
+        return {}
+    records = {}
+    for record in df.to_dict("records"):
+        # Parquet stores specs as a struct with the keys of every breed
+        record["specs"] = {
+            k: v for k, v in record["specs"].items() if v is not None
+        }
+        record["documents"] = list(record["documents"])
+        # Scrapes saved by earlier versions flagged changed rows
+        record.pop("changed", None)
+        records[record["url"]] = record
+    return records
+
+def save_as_parquet(df: pd.DataFrame, filename: str):
     """Save scraped data as a Parquet file."""
-    df = pd.DataFrame(data)
-    df['scrape_timestamp'] = datetime.now()
     df.to_parquet(filename, engine='pyarrow')
     logging.info(f"Saved scraped data to {filename}")
 
-def main():
-    args = parse_args()
-    os.makedirs(args.output_path, exist_ok=True)
-    output_filepath = os.path.join(args.output_path, args.output_file)
-    logging.info(f"Output will be saved to: {output_filepath}")
+def scrape_breeds(previous_filepath: str, fetch_cache: FetchCache,
+                  concurrency: int = config.SCRAPE_CONCURRENCY,
+                  rate_limit: float = config.SCRAPE_RATE_LIMIT,
+                  max_retries: int = config.SCRAPE_MAX_RETRIES,
+                  backoff: float = config.SCRAPE_BACKOFF,
+                  full_refresh: bool = False,
+                  link_discovery: str = "auto",
+                  parse_workers: int = config.SCRAPE_PARSE_WORKERS,
+                  min_link_ratio: float = config.SCRAPE_MIN_LINK_RATIO) -> pd.DataFrame:
+    """
+    Scrape every breed page into a DataFrame with one row per breed.
+
+    Rows of pages unchanged since the scrape saved at `previous_filepath`
+    are reused from it. `fetch_cache` is updated but not saved: save it
+    only once the returned rows are saved to `previous_filepath`, so the
+    cache never describes rows that were not written.
+
+    If fewer race links are found than `min_link_ratio` times the breeds of
+    the previous scrape, an empty DataFrame is returned, so a partly
+    rendered breed page does not replace the previous scrape.
+    """
+    fetcher = Fetcher(
+        make_session(USER_AGENT, pool_size=concurrency),
+        max_workers=concurrency,
+        rate_limit=rate_limit,
+        max_retries=max_retries,
+        backoff=backoff,
+        timeout=REQUEST_TIMEOUT,
+    )
 
-    session = requests.Session()
-    session.headers.update({"User-Agent": USER_AGENT})
+    # The previous scrape tells how many links a complete breed list has.
+    previous = load_previous_records(previous_filepath)
+    min_links = max(1, int(len(previous) * min_link_ratio))
 
-    # Retry logic for web scraping in case no race links are found.
-    max_retries = 3
-    delay_between_retries = 10  # seconds
+    # A headless browser is only started if plain HTTP finds too few links.
     race_links = []
-    for attempt in range(max_retries):
-        with WebDriverContext() as driver:
-            race_links = get_race_links(driver, BASE_URL)
-        if race_links:
-            logging.info(f"Found {len(race_links)} race links on attempt {attempt+1}.")
-            break
-        else:
-            logging.warning(
-                f"No race links found on attempt {attempt+1}/{max_retries}. n\
-                - Retrying in {delay_between_retries} seconds...")
-            time.sleep(delay_between_retries)
+    if link_discovery != "browser":
+        race_links = discover_race_links(fetcher, min_links)
+    if not race_links and link_discovery != "http":
+        with BrowserPool() as pool:
+            race_links = normalize_race_links(
+                get_race_links_with_browser(pool, BASE_URL)
+            )
     if not race_links:
-        logging.error("No race links found after retries. Exiting pipeline.")
-        return
+        logging.error("No race links found after retries.")
+        return pd.DataFrame()
+    if len(race_links) < min_links:
+        logging.error(
+            f"Found only {len(race_links)} race links, but the previous "
+            f"scrape had {len(previous)} breeds; keeping the previous scrape."
+        )
+        return pd.DataFrame()
+
+    # Pages whose previous row can be reused are requested conditionally,
+    # so unchanged pages cost a 304 response without a body.
+    if full_refresh:
+        previous = {}
+    headers = [
+        fetch_cache.conditional_headers(link) if link in previous else None
+        for link in race_links
+    ]
+    responses = fetcher.fetch_all(race_links, headers)
 
+    # Changed pages are parsed in a separate process pool once fetched;
+    # rows are saved in link order.
+    fetched = []
+    for link, response in zip(race_links, responses):
+        if response is None:
+            continue
+        changed = fetch_cache.update(link, response) or link not in previous
+        fetched.append((link, response, changed))
+    pages = [(link, response.text) for link, response, changed in fetched if changed]
+    parsed = dict(zip([url for url, _ in pages],
+                      parse_pages(pages, parse_workers)))
+
+    scrape_timestamp = datetime.now()
     scraped_data = []
-    for link in race_links:
-        data = get_dog_info(link, session)
+    n_changed = 0
+    for link, _, changed in fetched:
+        if changed:
+            data = parsed[link]
+            if data:
+                data["scrape_timestamp"] = scrape_timestamp
+        else:
+            data = previous[link]
         if data:
+            n_changed += changed
             scraped_data.append(data)
-            logging.info(f"Processed: {link}")
+            logging.info(f"Processed: {link} ({'changed' if changed else 'unchanged'})")
 
-    if not scraped_data:
+    if scraped_data:
+        logging.info(
+            f"Successfully collected {len(scraped_data)} dog profiles "
+            f"({n_changed} changed, {len(scraped_data) - n_changed} unchanged)"
+        )
+    return pd.DataFrame(scraped_data)
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[logging.StreamHandler()]
+    )
+    args = parse_args()
+    os.makedirs(args.output_path, exist_ok=True)
+    output_filepath = os.path.join(args.output_path, args.output_file)
+    logging.info(f"Output will be saved to: {output_filepath}")
+
+    fetch_cache = FetchCache(args.fetch_cache)
+    df = scrape_breeds(
+        output_filepath,
+        fetch_cache,
+        concurrency=args.concurrency,
+        rate_limit=args.rate_limit,
+        max_retries=args.max_retries,
+        backoff=args.backoff,
+        full_refresh=args.full_refresh,
+        link_discovery=args.link_discovery,
+        parse_workers=args.parse_workers,
+        min_link_ratio=args.min_link_ratio,
+    )
+    if df.empty:
         logging.error("No dog profiles scraped. Exiting pipeline.")
         return
 
-    logging.info(f"Successfully collected {len(scraped_data)} dog profiles")
-    save_as_parquet(scraped_data, output_filepath)
+    save_as_parquet(df, output_filepath)
+    fetch_cache.save()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,170 @@
+import re
+import json
+import math
+import time
+import logging
+from typing import Dict, Optional
+
+import faiss
+import numpy as np
+
+# Named index specs and the FAISS factory strings they expand to. Index
+# types that cannot store arbitrary IDs themselves are wrapped in IDMap2 so
+# search results are always stable chunk IDs. The fp16/int8 variants store
+# scalar-quantized vectors at 1/2 and 1/4 of the float32 size. "np" skips
+# the polysemous training FAISS otherwise runs for PQ, which search never
+# uses and which dominates the build time.
+INDEX_PRESETS = {
+    "flat": "IDMap2,Flat",
+    "flat-fp16": "IDMap2,SQfp16",
+    "flat-int8": "IDMap2,SQ8",
+    "hnsw": "IDMap2,HNSW32",
+    "hnsw-int8": "IDMap2,HNSW32,SQ8",
+    "ivf-flat": "IVF{nlist},Flat",
+    "ivf-int8": "IVF{nlist},SQ8",
+    "ivf-pq": "IVF{nlist},PQ{pq_m}np",
+}
+# PQ sub-quantizers in a factory string, e.g. "PQ64", "PQ32x4" or "PQ64np"
+PQ_PATTERN = re.compile(r"PQ\d+(?:x(\d+))?")
+
+
+def default_nlist(ntotal: int) -> int:
+    """Number of IVF lists: about 4*sqrt(n), with ~39 points per list."""
+    return max(1, min(int(4 * math.sqrt(ntotal)), ntotal // 39))
+
+
+def default_pq_m(dimension: int) -> int:
+    """Largest number of PQ sub-quantizers <= 64 that divides dimension."""
+    for m in range(min(64, dimension), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def resolve_factory_string(spec: str, dimension: int, ntotal: int) -> str:
+    """Expand a named index spec, or pass a FAISS factory string through."""
+    factory = INDEX_PRESETS.get(spec.lower(), spec)
+    factory = factory.format(
+        nlist=default_nlist(ntotal), pq_m=default_pq_m(dimension)
+    )
+    if "IVF" not in factory and not factory.startswith("IDMap"):
+        factory = f"IDMap2,{factory}"
+    return factory
+
+
+def min_training_points(factory: str) -> int:
+    """Training points the factory string needs: each PQ sub-quantizer
+    learns 2**nbits centroids from the same sample (256 for 8-bit codes)."""
+    match = PQ_PATTERN.search(factory)
+    if match is None:
+        return 0
+    return 2 ** int(match.group(1) or 8)
+
+
+def build_index(spec: str, vectors: np.ndarray, ids: np.ndarray,
+                train_sample: Optional[int] = None, seed: int = 0):
+    """
+    Build an ID-mapped FAISS index from a spec such as "flat", "flat-int8",
+    "hnsw", "ivf-flat", "ivf-pq" or a factory string like "IVF256,PQ32".
+
+    Indexes that need training are trained on a random sample of at most
+    `train_sample` vectors. A PQ index needs at least 2**nbits training
+    points; with fewer, a flat index is built instead. Returns the index
+    and its factory string.
+    """
+    dimension = vectors.shape[1]
+    factory = resolve_factory_string(spec, dimension, len(vectors))
+    n_train = min(train_sample or len(vectors), len(vectors))
+    if n_train < min_training_points(factory):
+        logging.warning(
+            f"{factory} needs at least {min_training_points(factory)} "
+            f"training vectors but only {n_train} are available; building "
+            f"a flat index instead."
+        )
+        factory = INDEX_PRESETS["flat"]
+    index = faiss.index_factory(dimension, factory)
+    if not index.is_trained:
+        sample = vectors
+        if train_sample and train_sample < len(vectors):
+            rng = np.random.default_rng(seed)
+            sample = vectors[
+                rng.choice(len(vectors), size=train_sample, replace=False)
+            ]
+        logging.info(f"Training {factory} index on {len(sample)} vectors.")
+        index.train(sample)
+    index.add_with_ids(vectors, ids)
+    return index, factory
+
+
+def supports_removal(index) -> bool:
+    """Whether vectors can be removed by ID, as incremental updates need."""
+    if isinstance(index, faiss.IndexIDMap2):
+        # Flat and scalar-quantized flat storage
+        return isinstance(faiss.downcast_index(index.index), faiss.IndexFlatCodes)
+    return isinstance(index, faiss.IndexIVF)
+
+
+def apply_search_params(index, params: Dict[str, float]) -> Dict[str, float]:
+    """
+    Set search-time parameters such as nprobe or efSearch on an index.
+    Parameters that do not apply to the index type are skipped; the ones
+    that were applied are returned.
+    """
+    parameter_space = faiss.ParameterSpace()
+    applied = {}
+    for name, value in params.items():
+        try:
+            parameter_space.set_index_parameter(index, name, value)
+        except RuntimeError:
+            continue
+        applied[name] = value
+    return applied
+
+
+def index_size_bytes(index) -> int:
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def evaluate_index(index, exact_index, queries: np.ndarray, k: int,
+                   index_queries: np.ndarray = None) -> dict:
+    """
+    Measure recall@k of `index` against exact search on `exact_index`,
+    single-query latency percentiles and serialized index size.
+    `index_queries` are the same queries as searched in `index`, when its
+    vectors are truncated versions of those in `exact_index`.
+    """
+    if index_queries is None:
+        index_queries = queries
+    _, expected = exact_index.search(queries, k)
+    found = np.empty_like(expected)
+    latencies = []
+    for i, query in enumerate(index_queries):
+        start = time.perf_counter()
+        _, ids = index.search(query[np.newaxis, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found[i] = ids[0]
+    hits = sum(
+        len(set(expected_row) & set(found_row))
+        for expected_row, found_row in zip(expected, found)
+    )
+    return {
+        f"recall@{k}": hits / expected.size if expected.size else 0.0,
+        "latency_ms": {
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+            "p99": float(np.percentile(latencies, 99)),
+        },
+        "size_bytes": index_size_bytes(index),
+        "ntotal": int(index.ntotal),
+        "dimension": int(index.d),
+    }
+
+
+def write_index_meta(meta: dict, filename: str):
+    with open(filename, "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def read_index_meta(filename: str) -> dict:
+    with open(filename, "r") as f:
+        return json.load(f)
@@ -0,0 +1,101 @@
+import json
+import logging
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pyarrow as pa
+from langchain_core.documents import Document
+
+SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("source", pa.string()),
+    ("start_index", pa.int64()),
+    ("page_content", pa.string()),
+    ("metadata", pa.string()),
+])
+
+
+def write_chunk_store(chunks: Union[Dict[int, Document], List[Document]],
+                      filename: str):
+    """
+    Write chunks as an uncompressed Arrow IPC file, sorted by chunk ID.
+
+    `chunks` maps chunk IDs to documents; a plain list is stored with its
+    positions as IDs, matching a FAISS index without an ID map.
+    """
+    if not isinstance(chunks, dict):
+        chunks = dict(enumerate(chunks))
+    ids = sorted(chunks)
+    docs = [chunks[cid] for cid in ids]
+    table = pa.Table.from_arrays(
+        [
+            pa.array(ids, type=pa.int64()),
+            pa.array([doc.metadata.get("source") for doc in docs]),
+            pa.array(
+                [doc.metadata.get("start_index") for doc in docs],
+                type=pa.int64(),
+            ),
+            pa.array([doc.page_content for doc in docs]),
+            # Metadata holds scrape timestamps and nested specs, so fall back
+            # to str() for anything JSON can't represent natively.
+            pa.array(
+                [json.dumps(doc.metadata, default=str) for doc in docs]
+            ),
+        ],
+        schema=SCHEMA,
+    )
+    with pa.OSFile(filename, "wb") as sink:
+        with pa.ipc.new_file(sink, SCHEMA) as writer:
+            writer.write_table(table, max_chunksize=max(len(ids), 1))
+
+
+class ChunkStore:
+    """
+    Read-only, memory-mapped view of a chunk store file.
+
+    The file is mapped rather than read, so processes share its pages and
+    only the rows returned by a search are turned into `Document` objects.
+    Chunks are looked up by ID with `store[chunk_id]`.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._source = pa.memory_map(filename, "r")
+        self.table = pa.ipc.open_file(self._source).read_all()
+        self._ids = self.table.column("id").to_numpy()
+        logging.info(f"Mapped {len(self)} chunks from {filename}")
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def _row(self, chunk_id) -> int:
+        row = int(np.searchsorted(self._ids, chunk_id))
+        if row < len(self._ids) and self._ids[row] == chunk_id:
+            return row
+        return -1
+
+    def __contains__(self, chunk_id):
+        return self._row(chunk_id) >= 0
+
+    def _document(self, row: int) -> Document:
+        return Document(
+            page_content=self.table.column("page_content")[row].as_py(),
+            metadata=json.loads(self.table.column("metadata")[row].as_py()),
+        )
+
+    def __getitem__(self, chunk_id) -> Document:
+        row = self._row(chunk_id)
+        if row < 0:
+            raise KeyError(chunk_id)
+        return self._document(row)
+
+    def get_many(self, chunk_ids: Sequence[int]) -> List[Optional[Document]]:
+        """Materialize the given chunks, with None for unknown IDs."""
+        rows = [self._row(cid) for cid in chunk_ids]
+        return [self._document(row) if row >= 0 else None for row in rows]
+
+    def to_dict(self) -> Dict[int, Document]:
+        """Materialize every chunk, keyed by chunk ID."""
+        return {
+            int(cid): self._document(row) for row, cid in enumerate(self._ids)
+        }
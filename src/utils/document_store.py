@@ -0,0 +1,48 @@
+from typing import List, Union
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from langchain_core.documents import Document
+
+from src.config import config
+
+SCHEMA = pa.schema([
+    ("source", pa.string()),
+    ("breed_name", pa.string()),
+    ("content", pa.string()),
+    ("specs", pa.map_(pa.string(), pa.string())),
+    ("documents", pa.list_(pa.string())),
+    ("content_type", pa.string()),
+    ("scrape_timestamp", pa.timestamp("us")),
+])
+
+
+def write_document_store(table: pa.Table, filename: str,
+                         row_group_size: int = config.DOCUMENT_BATCH_SIZE):
+    """Write formatted documents as a Parquet file in SCHEMA."""
+    pq.write_table(table.cast(SCHEMA), filename, row_group_size=row_group_size)
+
+
+def to_documents(table: Union[pa.Table, pa.RecordBatch]) -> List[Document]:
+    """Turn rows of a document table into `Document` objects."""
+    columns = table.to_pydict()
+    return [
+        Document(
+            page_content=content,
+            metadata={
+                "source": source,
+                "specs": dict(specs or []),
+                "documents": documents or [],
+                "breed_name": breed_name,
+                "scrape_timestamp": scrape_timestamp,
+                "content_type": content_type,
+            },
+        )
+        for source, breed_name, content, specs, documents, content_type,
+            scrape_timestamp in zip(*(columns[name] for name in SCHEMA.names))
+    ]
+
+
+def read_documents(filename: str) -> List[Document]:
+    """Read a document file as `Document` objects."""
+    return to_documents(pq.read_table(filename, columns=SCHEMA.names))
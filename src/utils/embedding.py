@@ -0,0 +1,88 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Sequence
+
+from src.config import config
+from src.utils.embedding_cache import make_key
+
+
+def make_batches(texts: Sequence[str], batch_size: int) -> List[List[str]]:
+    """Split texts into consecutive batches of at most batch_size items."""
+    return [
+        list(texts[start:start + batch_size])
+        for start in range(0, len(texts), batch_size)
+    ]
+
+
+def embed_texts(
+    embedder,
+    texts: Sequence[str],
+    batch_size: int = config.EMBED_BATCH_SIZE,
+    concurrency: int = config.EMBED_CONCURRENCY,
+) -> List[List[float]]:
+    """
+    Embed texts in batches, keeping up to `concurrency` batches in flight.
+
+    `embedder` is any LangChain-style embeddings object exposing
+    `embed_documents`. The returned vectors are in the same order as `texts`.
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be positive, got {batch_size}")
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be positive, got {concurrency}")
+
+    batches = make_batches(texts, batch_size)
+    if not batches:
+        return []
+
+    vectors = []
+    # executor.map yields results in submission order, so the output lines
+    # up with the input even though batches complete out of order.
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for i, batch_vectors in enumerate(
+            executor.map(embedder.embed_documents, batches), start=1
+        ):
+            if len(batch_vectors) != len(batches[i - 1]):
+                raise RuntimeError(
+                    f"Embedding batch {i} returned {len(batch_vectors)} "
+                    f"vectors for {len(batches[i - 1])} texts."
+                )
+            vectors.extend(batch_vectors)
+            logging.info(f"Embedded batch {i}/{len(batches)}.")
+    return vectors
+
+
+def embed_texts_cached(
+    embedder,
+    texts: Sequence[str],
+    model_name: str,
+    cache=None,
+    batch_size: int = config.EMBED_BATCH_SIZE,
+    concurrency: int = config.EMBED_CONCURRENCY,
+) -> List[List[float]]:
+    """
+    Embed texts like `embed_texts`, serving repeated texts from `cache`.
+
+    Only texts missing from the cache are sent to the embedder; their
+    vectors are added to the cache. The cache is saved before returning,
+    also when every text was a hit, so the recency of hits is kept.
+    """
+    if cache is None:
+        return embed_texts(embedder, texts, batch_size, concurrency)
+
+    keys = [make_key(model_name, text) for text in texts]
+    vectors = cache.get_many(keys)
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    logging.info(
+        f"{len(texts) - len(missing)} of {len(texts)} embeddings found in "
+        f"cache; embedding {len(missing)}."
+    )
+    if missing:
+        new_vectors = embed_texts(
+            embedder, [texts[i] for i in missing], batch_size, concurrency
+        )
+        cache.put_many([keys[i] for i in missing], new_vectors)
+        for i, vector in zip(missing, new_vectors):
+            vectors[i] = vector
+    cache.save()
+    return vectors
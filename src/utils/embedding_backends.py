@@ -0,0 +1,165 @@
+import re
+import hashlib
+import threading
+import unicodedata
+from typing import List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+from src.config import config
+
+BACKENDS = ("openai", "local", "hashing")
+
+# Output dimension of the OpenAI embedding models
+OPENAI_DIMENSIONS = {
+    "text-embedding-3-large": 3072,
+    "text-embedding-3-small": 1536,
+    "text-embedding-ada-002": 1536,
+}
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic embeddings without a model: each word is hashed to a
+    signed bucket and the counts are L2-normalized. Texts sharing words get
+    similar vectors, which is enough for tests and offline development.
+    """
+
+    def __init__(self, dimension: int = 256):
+        self.dimension = dimension
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype="float32")
+        text = unicodedata.normalize("NFKC", text).casefold()
+        for word in re.findall(r"\w+", text):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimension
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    SentenceTransformer model run on the CPU, loaded from a local path (or
+    the local model cache). Vectors are L2-normalized like OpenAI's, so the
+    same distance thresholds apply.
+    """
+
+    def __init__(self, model_path: str, batch_size: int = 64,
+                 device: str = "cpu"):
+        # Imported here so the other backends do not load torch
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_path, device=device)
+        self.batch_size = batch_size
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        # The model already uses all cores; run one batch at a time
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            vectors = self.model.encode(
+                list(texts),
+                batch_size=self.batch_size,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+            )
+        return vectors.astype("float32").tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def truncate_vectors(vectors, dimension: int) -> np.ndarray:
+    """
+    Keep the first `dimension` components of each vector and L2-normalize
+    again. text-embedding-3 models are trained so shortened embeddings keep
+    most of their quality; this is what the API's `dimensions` option does.
+    """
+    vectors = np.asarray(vectors, dtype="float32")
+    if dimension > vectors.shape[-1]:
+        raise ValueError(
+            f"Cannot truncate {vectors.shape[-1]}-dimensional embeddings "
+            f"to {dimension} dimensions"
+        )
+    truncated = np.ascontiguousarray(vectors[..., :dimension])
+    norms = np.linalg.norm(truncated, axis=-1, keepdims=True)
+    return truncated / np.where(norms > 0, norms, 1.0)
+
+
+class TruncatedEmbeddings(Embeddings):
+    """Embeddings of another backend truncated to `dimension`."""
+
+    def __init__(self, embeddings: Embeddings, dimension: int):
+        self.embeddings = embeddings
+        self.dimension = dimension
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.embeddings.embed_documents(texts)
+        return truncate_vectors(vectors, self.dimension).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.embeddings.embed_query(text)
+        return truncate_vectors(vector, self.dimension).tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = await self.embeddings.aembed_documents(texts)
+        return truncate_vectors(vectors, self.dimension).tolist()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = await self.embeddings.aembed_query(text)
+        return truncate_vectors(vector, self.dimension).tolist()
+
+
+def hashing_dimension(model_name: str) -> int:
+    """Dimension of a hashing model named like "hashing-256"."""
+    return int(model_name.rsplit("-", 1)[-1])
+
+
+def make_embeddings(backend: str, model_name: str, openai_api_key: str = None,
+                    batch_size: int = 64, dimension: int = None) -> Embeddings:
+    """
+    Create the embeddings client of a backend: openai, local or hashing.
+    With `dimension`, embeddings are truncated to that many dimensions.
+    """
+    if backend == "openai":
+        # Without an explicit key the client reads OPENAI_API_KEY
+        kwargs = {"openai_api_key": openai_api_key} if openai_api_key else {}
+        embeddings = OpenAIEmbeddings(model=model_name, **kwargs)
+    elif backend == "local":
+        embeddings = LocalEmbeddings(model_path=model_name, batch_size=batch_size)
+    elif backend == "hashing":
+        embeddings = HashingEmbeddings(hashing_dimension(model_name))
+    else:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    if dimension is not None \
+            and dimension != known_dimension(backend, model_name):
+        embeddings = TruncatedEmbeddings(embeddings, dimension)
+    return embeddings
+
+
+def known_dimension(backend: str, model_name: str) -> Optional[int]:
+    """Embedding dimension of a model, if it is known without loading it."""
+    if backend == "openai":
+        return OPENAI_DIMENSIONS.get(model_name)
+    if backend == "hashing":
+        return hashing_dimension(model_name)
+    return None
+
+
+def embedding_identity(meta: dict) -> tuple:
+    """(backend, model) that built an index, from its metadata. Indexes
+    built before backends were recorded used OpenAI."""
+    return (
+        meta.get("embedding_backend", "openai"),
+        meta.get("embedding_model", config.EMBEDDING_MODEL),
+    )
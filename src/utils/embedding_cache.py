@@ -0,0 +1,188 @@
+import os
+import json
+import hashlib
+import logging
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from src.config import config
+
+VECTORS_FILE = "vectors.f32"
+INDEX_FILE = "index.json"
+
+
+def make_key(model_name: str, text: str) -> str:
+    """Content address of a chunk embedding: hash of model name and text."""
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed cache of embedding vectors.
+
+    Vectors are stored as rows of a flat float32 file that is memory-mapped
+    for reads; a small JSON index maps each key to its row and to the build
+    generation that last used it. When the cache grows beyond `max_size_mb`
+    the least recently used entries are evicted and the file is compacted.
+    """
+
+    def __init__(self, cache_dir: str,
+                 max_size_mb: float = config.EMBED_CACHE_MAX_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.vectors_path = os.path.join(cache_dir, VECTORS_FILE)
+        self.index_path = os.path.join(cache_dir, INDEX_FILE)
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._pending = {}
+        self._load()
+
+    def _load(self):
+        self.dimension = None
+        self.rows = 0
+        self.entries = {}
+        self.generation = 0
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r") as f:
+                    meta = json.load(f)
+                self.dimension = meta["dimension"]
+                self.rows = meta["rows"]
+                self.entries = meta["entries"]
+                self.generation = meta["generation"]
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(
+                    f"Ignoring unreadable embedding cache index "
+                    f"{self.index_path}: {e}"
+                )
+                self.dimension, self.rows, self.entries = None, 0, {}
+        # Every build run is a new generation; entries touched by the run
+        # are stamped with it and survive eviction longest.
+        self.generation += 1
+        self._vectors = self._open_vectors()
+
+    def _open_vectors(self):
+        if not self.rows or not os.path.exists(self.vectors_path):
+            return None
+        return np.memmap(
+            self.vectors_path, dtype="float32", mode="r",
+            shape=(self.rows, self.dimension),
+        )
+
+    def __len__(self):
+        return len(self.entries) + len(self._pending)
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Look up keys, returning a vector or None for each of them."""
+        results = []
+        for key in keys:
+            vector = None
+            if key in self._pending:
+                vector = self._pending[key]
+            elif key in self.entries and self._vectors is not None:
+                row = self.entries[key][0]
+                vector = np.array(self._vectors[row])
+                self.entries[key][1] = self.generation
+            if vector is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            results.append(vector)
+        return results
+
+    def put_many(self, keys: Sequence[str], vectors):
+        """Stage vectors for the given keys; they are written by save()."""
+        vectors = np.asarray(vectors, dtype="float32")
+        if vectors.ndim != 2 or len(vectors) != len(keys):
+            raise ValueError("Expected one vector per key.")
+        if len(keys) == 0:
+            return
+        if self.dimension is None:
+            self.dimension = int(vectors.shape[1])
+        elif vectors.shape[1] != self.dimension:
+            logging.warning(
+                f"Embedding dimension changed from {self.dimension} to "
+                f"{vectors.shape[1]}; clearing the embedding cache."
+            )
+            self._vectors = None
+            self.entries, self.rows, self._pending = {}, 0, {}
+            self.dimension = int(vectors.shape[1])
+        for key, vector in zip(keys, vectors):
+            if key not in self.entries:
+                self._pending[key] = vector
+
+    def save(self):
+        """Append staged vectors to disk, evicting old entries if needed."""
+        if self.dimension is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if self._pending:
+            self._vectors = None
+            with open(self.vectors_path, "ab") as f:
+                # Drop rows left behind by an interrupted save.
+                f.truncate(self.rows * self.dimension * 4)
+                for key, vector in self._pending.items():
+                    f.write(vector.tobytes())
+                    self.entries[key] = [self.rows, self.generation]
+                    self.rows += 1
+            self._pending = {}
+
+        capacity = self.max_bytes // (self.dimension * 4)
+        if len(self.entries) > capacity:
+            self._evict(capacity)
+        else:
+            self._vectors = self._open_vectors()
+        self._write_index()
+
+    def _evict(self, capacity: int):
+        vectors = self._open_vectors()
+        # Most recently used first; within a generation, newest rows first,
+        # so vectors added by this run are never the ones evicted.
+        keep = sorted(
+            self.entries.items(),
+            key=lambda item: (item[1][1], item[1][0]),
+            reverse=True,
+        )[:capacity]
+        self.evicted += len(self.entries) - len(keep)
+        # Preserve on-disk row order while compacting.
+        keep.sort(key=lambda item: item[1][0])
+        tmp_path = self.vectors_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            for key, (row, _) in keep:
+                f.write(np.asarray(vectors[row]).tobytes())
+        del vectors
+        os.replace(tmp_path, self.vectors_path)
+        self.entries = {
+            key: [new_row, last_used]
+            for new_row, (key, (_, last_used)) in enumerate(keep)
+        }
+        self.rows = len(self.entries)
+        self._vectors = self._open_vectors()
+
+    def _write_index(self):
+        meta = {
+            "dimension": self.dimension,
+            "rows": self.rows,
+            "generation": self.generation,
+            "entries": self.entries,
+        }
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.index_path)
+
+    def log_report(self):
+        """Log the hit/miss statistics collected during this run."""
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        logging.info(
+            f"Embedding cache: {self.hits} hits, {self.misses} misses "
+            f"({hit_rate:.1%} hit rate), {self.evicted} evicted, "
+            f"{len(self)} entries in {self.cache_dir}."
+        )
@@ -0,0 +1,74 @@
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict
+
+import requests
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+class FetchCache:
+    """
+    Persistent per-URL record of the last fetch of a page: its ETag,
+    Last-Modified header, content hash and when it was last scraped.
+
+    The validators are sent back as If-None-Match / If-Modified-Since so
+    the server can answer 304 Not Modified without a body. Servers that
+    ignore conditional requests are caught by comparing content hashes.
+    """
+
+    def __init__(self, cache_path: str):
+        self.cache_path = cache_path
+        self.entries = {}
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(
+                    f"Ignoring unreadable fetch cache {cache_path}: {e}"
+                )
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.entries
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Request headers that let the server answer 304 for `url`."""
+        entry = self.entries.get(url, {})
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def update(self, url: str, response: requests.Response) -> bool:
+        """Record a fetch of `url`; return whether the page has changed."""
+        entry = self.entries.get(url)
+        now = datetime.now().isoformat(timespec="seconds")
+        if response.status_code == 304 and entry is not None:
+            entry["last_scraped"] = now
+            return False
+        digest = content_hash(response.content)
+        changed = entry is None or entry.get("content_hash") != digest
+        self.entries[url] = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_hash": digest,
+            "last_scraped": now,
+        }
+        return changed
+
+    def save(self):
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f, indent=1)
+        os.replace(tmp_path, self.cache_path)
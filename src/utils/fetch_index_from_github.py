@@ -1,6 +1,8 @@
 import os
+import shutil
 import requests
 import zipfile
+import tempfile
 import subprocess
 from dotenv import load_dotenv 
 load_dotenv()
@@ -53,21 +55,34 @@ def download_latest_release(owner, repo, dest_dir, github_token=None):
     print(f"Downloading asset '{asset_name}' from {download_url} ...")
     asset_response = requests.get(download_url, headers=headers)
     asset_response.raise_for_status()
-    
-    asset_path = os.path.join(dest_dir, asset_name)
-    with open(asset_path, "wb") as f:
-        f.write(asset_response.content)
-    print("Asset downloaded to:", asset_path)
-    
-    # If the asset is a zip file, extract its contents to dest_dir.
-    if asset_name.lower().endswith(".zip"):
-        print("Extracting zip file...")
-        with zipfile.ZipFile(asset_path, "r") as zip_ref:
-            zip_ref.extractall(dest_dir)
-        print("Extraction complete.")
-        os.remove(asset_path)
-    else:
-        print("Asset is not a zip file; skipping extraction.")
+
+    # Download and extract into a staging directory next to the served
+    # files, then move each file into place with an atomic rename. A running
+    # server may have the old files memory-mapped; renaming keeps their data
+    # intact, where writing into them would corrupt in-flight queries.
+    staging_dir = tempfile.mkdtemp(prefix=".staging-", dir=dest_dir)
+    try:
+        asset_path = os.path.join(staging_dir, asset_name)
+        with open(asset_path, "wb") as f:
+            f.write(asset_response.content)
+        print("Asset downloaded to:", asset_path)
+
+        # If the asset is a zip file, extract its contents for staging.
+        if asset_name.lower().endswith(".zip"):
+            print("Extracting zip file...")
+            with zipfile.ZipFile(asset_path, "r") as zip_ref:
+                zip_ref.extractall(staging_dir)
+            print("Extraction complete.")
+            os.remove(asset_path)
+        else:
+            print("Asset is not a zip file; skipping extraction.")
+
+        for name in sorted(os.listdir(staging_dir)):
+            os.replace(os.path.join(staging_dir, name),
+                       os.path.join(dest_dir, name))
+        print("Files moved into:", dest_dir)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,134 @@
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def make_session(user_agent: str, pool_size: int) -> requests.Session:
+    """Session whose connection pool can serve `pool_size` threads."""
+    session = requests.Session()
+    session.headers.update({"User-Agent": user_agent})
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class HostRateLimiter:
+    """Spaces out the requests to each host by at least 1 / rate seconds."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Fetcher:
+    """
+    Fetch pages concurrently from a pooled session.
+
+    At most `max_workers` requests are in flight, requests to one host are
+    rate limited to `rate_limit` per second, and timeouts, connection errors
+    and 429/5xx responses are retried up to `max_retries` times with
+    exponential backoff and full jitter.
+    """
+
+    def __init__(self, session: requests.Session, max_workers: int,
+                 rate_limit: float, max_retries: int, backoff: float,
+                 timeout: float):
+        self.session = session
+        self.max_workers = max_workers
+        self.rate_limiter = HostRateLimiter(rate_limit)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+    def _retry_delay(self, attempt: int, response=None) -> float:
+        # A Response is falsy for error statuses, so compare with None
+        retry_after = (response.headers.get("Retry-After")
+                       if response is not None else None)
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    def fetch(self, url: str,
+              headers: Optional[Dict[str, str]] = None) -> Optional[requests.Response]:
+        """
+        Fetch a URL, returning None if it failed after all retries. Extra
+        `headers` such as conditional request validators are sent along;
+        a 304 Not Modified response is returned like any other success.
+        """
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait(url)
+            response = None
+            try:
+                response = self.session.get(url, headers=headers,
+                                            timeout=self.timeout)
+                if response.status_code not in RETRY_STATUS:
+                    response.raise_for_status()
+                    logging.info(
+                        f"Fetched {url} in {time.perf_counter() - start:.2f}s "
+                        f"(status {response.status_code}, "
+                        f"attempt {attempt + 1})"
+                    )
+                    return response
+                error = f"status {response.status_code}"
+            except (requests.Timeout, requests.ConnectionError) as e:
+                error = str(e)
+            except requests.RequestException as e:
+                # Client errors such as 404 will not succeed on a retry
+                logging.error(f"Request failed for {url}: {e}")
+                return None
+            if attempt < self.max_retries:
+                delay = self._retry_delay(attempt, response)
+                logging.warning(
+                    f"Attempt {attempt + 1} for {url} failed ({error}); "
+                    f"retrying in {delay:.2f}s"
+                )
+                time.sleep(delay)
+        logging.error(
+            f"Request failed for {url} after {self.max_retries + 1} attempts "
+            f"in {time.perf_counter() - start:.2f}s: {error}"
+        )
+        return None
+
+    def fetch_all(self, urls: Sequence[str],
+                  headers: Optional[Sequence[Optional[Dict[str, str]]]] = None
+                  ) -> List[Optional[requests.Response]]:
+        """
+        Fetch URLs concurrently; results are in the order of `urls`.
+        `headers`, if given, holds the extra headers of each URL.
+        """
+        if headers is None:
+            headers = [None] * len(urls)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            responses = list(executor.map(self.fetch, urls, headers))
+        elapsed = time.perf_counter() - start
+        fetched = sum(response is not None for response in responses)
+        logging.info(
+            f"Fetched {fetched}/{len(urls)} pages in {elapsed:.1f}s "
+            f"with {self.max_workers} workers."
+        )
+        return responses
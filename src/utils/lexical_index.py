@@ -0,0 +1,196 @@
+import re
+import math
+import bisect
+import unicodedata
+from collections import Counter
+from typing import Iterable, List
+import numpy as np
+
+# Common Danish function words, which carry no lexical signal
+DANISH_STOPWORDS = frozenset("""
+ad af alle alt anden at blev blive bliver da de dem den denne der deres det
+dette dig din disse dog du efter eller en end er et for fra ham han hans har
+havde have hende hendes her hos hun hvad hvis hvor i ikke ind jeg jer jo
+kunne man mange med meget men mig min mine mit mod ned noget nogle nu når og
+også om op os over på selv sig sin sine sit skal skulle som sådan thi til ud
+under var vi vil ville vor være været
+""".split())
+
+DANISH_VOWELS = "aeiouyæøå"
+# Inflectional suffixes removed by the Danish Snowball stemmer (step 1),
+# longest first
+DANISH_SUFFIXES = sorted(
+    """hedernes hedens hederne heden heder hedes erendes erende ernes erens
+    erets ered ende erne eren erer heds enes eres eret hed ene ens ers ets
+    en er es et e s""".split(),
+    key=len,
+    reverse=True,
+)
+# Letters after which a final "s" is a genitive/plural ending
+S_ENDING = set("abcdfghjklmnoprtvyzå")
+
+# Query terms of at least this length also match longer index terms that
+# start with them, so "schæfer" finds the compound "schæferhund"
+PREFIX_MIN_LENGTH = 4
+PREFIX_WEIGHT = 0.5
+MAX_PREFIX_EXPANSIONS = 20
+
+
+def _r1(word: str) -> int:
+    """Start of the region after the first non-vowel following a vowel."""
+    for i in range(1, len(word)):
+        if word[i] not in DANISH_VOWELS and word[i - 1] in DANISH_VOWELS:
+            return max(i + 1, 3)
+    return len(word)
+
+
+def stem(word: str) -> str:
+    """
+    Strip a Danish inflectional suffix, as in the Snowball stemmer: the
+    longest suffix that lies entirely within R1 is removed, so a longer
+    suffix reaching in front of R1 gives way to a shorter one inside it.
+    """
+    region = word[_r1(word):]
+    for suffix in DANISH_SUFFIXES:
+        if region.endswith(suffix):
+            if suffix == "s" and word[-2] not in S_ENDING:
+                return word
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Split Danish text into stemmed, lower-cased terms without stopwords."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return [
+        stem(token)
+        for token in re.findall(r"\w+", text)
+        if token not in DANISH_STOPWORDS
+    ]
+
+
+class BM25Index:
+    """
+    BM25 inverted index stored as flat arrays.
+
+    The sorted vocabulary is kept as one UTF-8 buffer with offsets, and the
+    postings of term i are the slice offsets[i]:offsets[i + 1] of the
+    doc_indices and term_freqs arrays. Doc indices are positions in doc_ids,
+    which hold the chunk ids used by the vector index.
+    """
+
+    def __init__(self, vocab: List[str], offsets, doc_indices, term_freqs,
+                 doc_ids, doc_lengths, k1: float = 1.2, b: float = 0.75):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.doc_indices = doc_indices
+        self.term_freqs = term_freqs
+        self.doc_ids = doc_ids
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    @classmethod
+    def build(cls, ids: Iterable[int], texts: Iterable[str],
+              k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        postings = {}
+        doc_ids = []
+        doc_lengths = []
+        for doc_index, (doc_id, text) in enumerate(zip(ids, texts)):
+            terms = tokenize(text)
+            doc_ids.append(doc_id)
+            doc_lengths.append(len(terms))
+            for term, count in Counter(terms).items():
+                postings.setdefault(term, []).append((doc_index, count))
+
+        vocab = sorted(postings)
+        offsets = np.zeros(len(vocab) + 1, dtype="int64")
+        offsets[1:] = np.cumsum([len(postings[term]) for term in vocab])
+        doc_indices = np.empty(offsets[-1], dtype="int32")
+        term_freqs = np.empty(offsets[-1], dtype="uint16")
+        for i, term in enumerate(vocab):
+            entries = np.array(postings[term], dtype="int64")
+            doc_indices[offsets[i]:offsets[i + 1]] = entries[:, 0]
+            term_freqs[offsets[i]:offsets[i + 1]] = np.minimum(entries[:, 1], 65535)
+        return cls(vocab, offsets, doc_indices, term_freqs,
+                   np.array(doc_ids, dtype="int64"),
+                   np.array(doc_lengths, dtype="int32"), k1=k1, b=b)
+
+    def save(self, filename: str):
+        encoded = [term.encode("utf-8") for term in self.vocab]
+        vocab_offsets = np.zeros(len(encoded) + 1, dtype="int64")
+        vocab_offsets[1:] = np.cumsum([len(term) for term in encoded])
+        with open(filename, "wb") as f:
+            np.savez(
+                f,
+                vocab=np.frombuffer(b"".join(encoded), dtype="uint8"),
+                vocab_offsets=vocab_offsets,
+                offsets=self.offsets,
+                doc_indices=self.doc_indices,
+                term_freqs=self.term_freqs,
+                doc_ids=self.doc_ids,
+                doc_lengths=self.doc_lengths,
+                params=np.array([self.k1, self.b]),
+            )
+
+    @classmethod
+    def load(cls, filename: str) -> "BM25Index":
+        with np.load(filename) as data:
+            buffer = data["vocab"].tobytes()
+            vocab_offsets = data["vocab_offsets"]
+            vocab = [
+                buffer[start:end].decode("utf-8")
+                for start, end in zip(vocab_offsets[:-1], vocab_offsets[1:])
+            ]
+            k1, b = data["params"]
+            return cls(vocab, data["offsets"], data["doc_indices"],
+                       data["term_freqs"], data["doc_ids"],
+                       data["doc_lengths"], k1=float(k1), b=float(b))
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def _matching_terms(self, term: str):
+        """Yield (term row, weight) for the term and its prefix matches."""
+        i = bisect.bisect_left(self.vocab, term)
+        if i < len(self.vocab) and self.vocab[i] == term:
+            yield i, 1.0
+            i += 1
+        if len(term) < PREFIX_MIN_LENGTH:
+            return
+        end = min(i + MAX_PREFIX_EXPANSIONS, len(self.vocab))
+        while i < end and self.vocab[i].startswith(term):
+            yield i, PREFIX_WEIGHT
+            i += 1
+
+    def search(self, query: str, k: int):
+        """Return the ids and scores of the k best matching chunks."""
+        scores = np.zeros(len(self.doc_ids), dtype="float32")
+        n_docs = len(self.doc_ids)
+        for term in set(tokenize(query)):
+            for row, weight in self._matching_terms(term):
+                start, end = self.offsets[row], self.offsets[row + 1]
+                docs = self.doc_indices[start:end]
+                tf = self.term_freqs[start:end].astype("float32")
+                idf = math.log(1 + (n_docs - (end - start) + 0.5)
+                               / ((end - start) + 0.5))
+                norm = self.k1 * (
+                    1 - self.b + self.b * self.doc_lengths[docs] / self.avg_length
+                )
+                # Each document appears once per term, so this is a scatter
+                scores[docs] += weight * idf * tf * (self.k1 + 1) / (tf + norm)
+        matches = np.flatnonzero(scores)
+        if len(matches) > k:
+            matches = matches[np.argpartition(-scores[matches], k - 1)[:k]]
+        matches = matches[np.argsort(-scores[matches], kind="stable")]
+        return self.doc_ids[matches], scores[matches]
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[int]:
+    """Merge ranked id lists by summing 1 / (k + rank) per id."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
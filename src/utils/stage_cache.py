@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import inspect
+import hashlib
+import logging
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+def stage_key(*parts) -> str:
+    """Cache key of a stage: a hash of its input hashes and parameters."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(json.dumps(
+            part, sort_keys=True, default=_json_default
+        ).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def hash_dataframe(df: pd.DataFrame, exclude: Iterable[str] = ()) -> str:
+    """Content hash of a DataFrame's rows, which may hold dicts and lists."""
+    columns = sorted(set(df.columns) - set(exclude))
+    digest = hashlib.sha256()
+    for record in df[columns].to_dict("records"):
+        digest.update(json.dumps(
+            record, sort_keys=True, default=_json_default
+        ).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def hash_documents(documents) -> str:
+    """Content hash of documents' text and metadata."""
+    digest = hashlib.sha256()
+    for document in documents:
+        digest.update(json.dumps(
+            [document.page_content, document.metadata],
+            sort_keys=True, default=_json_default,
+        ).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def code_version(*modules) -> str:
+    """Hash of the source files of the modules a stage runs."""
+    digest = hashlib.sha256()
+    for module in modules:
+        with open(inspect.getsourcefile(module), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _artifact_signature(path: str) -> Optional[list]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class StageCache:
+    """
+    Manifest of the input key each pipeline stage last ran with, and the
+    artifacts it wrote.
+
+    A stage can be skipped when its key is unchanged, the entry is younger
+    than `max_age_hours`, and its artifacts still exist with the size and
+    modification time they had when the stage finished.
+    """
+
+    def __init__(self, manifest_path: str, max_age_hours: Optional[float] = None):
+        self.manifest_path = manifest_path
+        self.max_age = max_age_hours * 3600 if max_age_hours else None
+        self.entries = {}
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, "r") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(
+                    f"Ignoring unreadable stage cache {manifest_path}: {e}"
+                )
+
+    def lookup(self, stage: str, key: str) -> bool:
+        """Whether the artifacts of `stage` were built from `key` and are
+        still valid."""
+        entry = self.entries.get(stage)
+        if entry is None or entry["key"] != key:
+            return False
+        if self.max_age is not None \
+                and time.time() - entry["created_at"] > self.max_age:
+            logging.info(f"Cached {stage} artifacts have expired.")
+            return False
+        for path, signature in entry["artifacts"].items():
+            if _artifact_signature(path) != signature:
+                logging.info(f"Cached {stage} artifact {path} has changed.")
+                return False
+        return True
+
+    def store(self, stage: str, key: str, artifacts: Sequence[str]):
+        """Record that `stage` wrote `artifacts` from `key`, and save."""
+        self.entries[stage] = {
+            "key": key,
+            "created_at": time.time(),
+            "artifacts": {
+                path: _artifact_signature(path) for path in artifacts
+            },
+        }
+        self.save()
+
+    def save(self):
+        directory = os.path.dirname(self.manifest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f, indent=1)
+        os.replace(tmp_path, self.manifest_path)
@@ -1,5 +1,7 @@
+from unittest.mock import patch
 from fastapi.testclient import TestClient
 from app.main import app
+from app.core.vector_index import VectorIndex
 
 client = TestClient(app)
 
@@ -9,3 +11,63 @@ def test_ask_question():
                            json={"question": "Hvor mange ben har en hund?"})
     assert response.status_code == 200
     assert "answer" in response.json()
+
+
+def test_readiness_before_index_is_loaded():
+    not_loaded = VectorIndex("missing.index", "missing.arrow")
+    with patch("app.api.endpoints.rag.get_vector_index",
+               return_value=not_loaded):
+        response = client.get("/rag/ready")
+    assert response.status_code == 503
+    assert response.json() == {"status": "not_loaded"}
+
+
+def test_ask_question_stream():
+    async def mock_stream(question, thread_id):
+        yield "token", "Fire "
+        yield "token", "ben."
+        yield "sources", {"answer": "Fire ben.",
+                          "sources": ["http://example.com"]}
+
+    with patch("app.api.endpoints.rag.stream_rag_answer", mock_stream):
+        response = client.post("/rag/ask/stream",
+                               json={"question": "Hvor mange ben har en hund?",
+                                     "session_id": "session-1"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text == (
+        'event: token\ndata: {"token": "Fire "}\n\n'
+        'event: token\ndata: {"token": "ben."}\n\n'
+        'event: sources\ndata: {"answer": "Fire ben.", '
+        '"sources": ["http://example.com"], "session_id": "session-1"}\n\n'
+    )
+
+
+def test_ask_question_batch():
+    async def mock_answers(questions):
+        return [{"answer": f"Svar på {question}", "sources": []}
+                for question in questions]
+
+    with patch("app.api.endpoints.rag.get_rag_answers", mock_answers):
+        response = client.post("/rag/ask_batch",
+                               json={"questions": ["Spørgsmål 1", "Spørgsmål 2"]})
+    assert response.status_code == 200
+    assert [result["answer"] for result in response.json()["results"]] == [
+        "Svar på Spørgsmål 1", "Svar på Spørgsmål 2"
+    ]
+
+    response = client.post("/rag/ask_batch", json={"questions": []})
+    assert response.status_code == 422
+
+
+def test_reload_index_requires_admin_token():
+    vector_index = VectorIndex("missing.index", "missing.arrow")
+    with patch("app.api.endpoints.rag.admin_token", "secret"), \
+            patch("app.api.endpoints.rag.get_vector_index",
+                  return_value=vector_index):
+        response = client.post("/rag/admin/reload")
+        assert response.status_code == 403
+        response = client.post("/rag/admin/reload",
+                               headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 409
+    assert vector_index.state == "failed"
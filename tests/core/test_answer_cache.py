@@ -0,0 +1,42 @@
+from unittest.mock import patch
+from app.core.answer_cache import SemanticAnswerCache
+
+RESULT = {"answer": "Tre gange om dagen.", "sources": ["http://example.com"]}
+
+
+def test_lookup_returns_answer_for_similar_question():
+    cache = SemanticAnswerCache(threshold=0.9, max_entries=10, ttl=60)
+    cache.store([1.0, 0.0, 0.0], RESULT)
+
+    assert cache.lookup([0.99, 0.05, 0.0]) == RESULT
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_expire():
+    cache = SemanticAnswerCache(threshold=0.9, max_entries=10, ttl=10)
+    with patch("app.core.answer_cache.time.time", return_value=0):
+        cache.store([1.0, 0.0], RESULT)
+    with patch("app.core.answer_cache.time.time", return_value=11):
+        assert cache.lookup([1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticAnswerCache(threshold=0.9, max_entries=2, ttl=60)
+    cache.store([1.0, 0.0, 0.0], {"answer": "a", "sources": []})
+    cache.store([0.0, 1.0, 0.0], {"answer": "b", "sources": []})
+    cache.lookup([1.0, 0.0, 0.0])
+    cache.store([0.0, 0.0, 1.0], {"answer": "c", "sources": []})
+
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+    assert cache.lookup([1.0, 0.0, 0.0])["answer"] == "a"
+
+
+def test_new_index_version_invalidates_cache():
+    cache = SemanticAnswerCache(threshold=0.9, max_entries=10, ttl=60)
+    cache.store([1.0, 0.0], RESULT, version="v1")
+
+    assert cache.lookup([1.0, 0.0], version="v1") == RESULT
+    assert cache.lookup([1.0, 0.0], version="v2") is None
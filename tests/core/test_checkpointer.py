@@ -0,0 +1,86 @@
+from unittest.mock import patch
+from langgraph.graph import MessagesState, StateGraph, END
+from langchain_core.messages import AIMessage
+from app.core.checkpointer import BoundedMemorySaver
+from app.core.config import get_memory_config
+
+
+def build_echo_graph(checkpointer):
+    def respond(state: MessagesState):
+        return {"messages": [AIMessage(content="Vov!")]}
+
+    graph_builder = StateGraph(MessagesState)
+    graph_builder.add_node(respond)
+    graph_builder.set_entry_point("respond")
+    graph_builder.add_edge("respond", END)
+    return graph_builder.compile(checkpointer=checkpointer)
+
+
+def ask(graph, thread_id):
+    return graph.invoke(
+        {"messages": [{"role": "user", "content": "Hej"}]},
+        config=get_memory_config(thread_id),
+    )
+
+
+def test_threads_are_separate_and_bounded():
+    memory = BoundedMemorySaver(max_threads=2, thread_ttl=3600,
+                                max_checkpoints=10)
+    graph = build_echo_graph(memory)
+
+    ask(graph, "a")
+    result = ask(graph, "a")
+    assert len(result["messages"]) == 4
+    assert len(ask(graph, "b")["messages"]) == 2
+
+    ask(graph, "c")
+    assert memory.thread_count() == 2
+    assert "a" not in memory.storage
+    # The evicted thread starts a fresh conversation
+    assert len(ask(graph, "a")["messages"]) == 2
+
+
+def test_idle_threads_expire():
+    memory = BoundedMemorySaver(max_threads=10, thread_ttl=60,
+                                max_checkpoints=10)
+    graph = build_echo_graph(memory)
+    with patch("app.core.checkpointer.time.time", return_value=0):
+        ask(graph, "a")
+    with patch("app.core.checkpointer.time.time", return_value=61):
+        ask(graph, "b")
+    assert "a" not in memory.storage
+    assert memory.thread_count() == 1
+
+
+def test_checkpoints_per_thread_are_capped():
+    memory = BoundedMemorySaver(max_threads=10, thread_ttl=3600,
+                                max_checkpoints=2)
+    graph = build_echo_graph(memory)
+    for _ in range(5):
+        result = ask(graph, "a")
+
+    assert len(result["messages"]) == 10
+    assert len(memory.storage["a"][""]) == 2
+    # Exactly the blobs referenced by the kept checkpoints remain
+    referenced = set()
+    for saved_checkpoint, _, _ in memory.storage["a"][""].values():
+        checkpoint = memory.serde.loads_typed(saved_checkpoint)
+        referenced.update(
+            ("a", "", channel, version)
+            for channel, version in checkpoint["channel_versions"].items()
+        )
+    assert {key for key in memory.blobs if key[0] == "a"} == referenced
+
+
+def test_pruning_keeps_other_threads_and_shared_blobs():
+    memory = BoundedMemorySaver(max_threads=10, thread_ttl=3600,
+                                max_checkpoints=1)
+    graph = build_echo_graph(memory)
+    ask(graph, "a")
+    blobs_of_a = {key for key in memory.blobs if key[0] == "a"}
+    for _ in range(3):
+        ask(graph, "b")
+
+    assert {key for key in memory.blobs if key[0] == "a"} == blobs_of_a
+    # The newest checkpoint still restores the whole conversation
+    assert len(ask(graph, "b")["messages"]) == 8
@@ -0,0 +1,228 @@
+from datetime import datetime
+from unittest.mock import MagicMock, Mock, patch
+import pandas as pd
+import requests
+from bs4 import BeautifulSoup
+from src.pipeline.website_scrapers import dkk_scraper
+from src.pipeline.website_scrapers.dkk_scraper import (
+    BASE_URL,
+    SITEMAP_URL,
+    discover_race_links,
+    extract_script_race_links,
+    get_sitemap_race_links,
+    parse_documents,
+    parse_dog_info,
+    parse_lexicon,
+    parse_pages,
+    parse_race_spec,
+    save_as_parquet,
+    scrape_breeds,
+)
+from src.utils.fetch_cache import FetchCache
+
+RACE_LINKS = [f"https://www.dkk.dk/race/{breed}"
+              for breed in ("labrador-retriever", "puddel", "schaeferhund")]
+
+BREED_SELECT_PAGE = f"""
+<html><body>
+<select class="lex-custom-select font-semibold pl-2 md: p-1">
+  <option value="">Vælg race</option>
+  <option value="{RACE_LINKS[0]}">Labrador retriever</option>
+</select>
+</body></html>
+"""
+
+SITEMAP_INDEX = """<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://www.dkk.dk/race-sitemap.xml</loc></sitemap>
+</sitemapindex>
+"""
+
+RACE_SITEMAP = f"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>https://www.dkk.dk/nyheder/udstilling</loc></url>
+  {"".join(f"<url><loc>{link}/</loc></url>" for link in RACE_LINKS)}
+</urlset>
+"""
+
+BREED_PAGE = """
+<html><head><script>var nav = "race-spec";</script></head><body>
+<nav><div class="race-spec"><p>Menu</p><span>Skjult</span></div></nav>
+<div class="race-spec extra"><p>Størrelse</p><span>{size}</span></div>
+<div class="bg-white race-spec"><p>Pels</p><span>Kort</span></div>
+<div class="md:grid grid-cols-2 gap-x-5">
+  <div class="lex-text"><strong>Historie</strong> Stammer fra {origin}.</div>
+  <div class="lex-text"><strong>Temperament</strong> Venlig og glad.</div>
+</div>
+<div class="mx-auto lg:max-w-screen-lg px-10 py-10 lg:py-20">
+  <a href="https://www.dkk.dk/standard.pdf">Standard</a>
+</div>
+<footer><a href="https://www.dkk.dk/kontakt">Kontakt</a></footer>
+</body></html>
+"""
+
+
+def breed_page(size="Stor", origin="Canada"):
+    return BREED_PAGE.format(size=size, origin=origin)
+
+
+def parse_with_html_parser(url, html):
+    # How pages were parsed before the strainer: the full tree
+    soup = BeautifulSoup(html, "html.parser")
+    return {
+        "url": url,
+        "specs": parse_race_spec(soup),
+        "lexicon": parse_lexicon(soup),
+        "documents": parse_documents(soup),
+    }
+
+
+def make_response(text):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = text.encode("utf-8")
+    response.encoding = "utf-8"
+    return response
+
+
+def make_fetcher(pages):
+    # A fetcher serving the given pages; other URLs fail
+    fetcher = Mock()
+    fetcher.fetch.side_effect = lambda url, headers=None: (
+        make_response(pages[url]) if url in pages else None
+    )
+    fetcher.fetch_all.side_effect = lambda urls, headers=None: [
+        fetcher.fetch(url) for url in urls
+    ]
+    return fetcher
+
+
+def save_previous_scrape(filename, links):
+    save_as_parquet(pd.DataFrame([
+        {"url": link, "specs": {"Størrelse": "Stor"}, "lexicon": "Tekst",
+         "documents": [], "scrape_timestamp": datetime(2026, 1, 1)}
+        for link in links
+    ]), filename)
+
+
+def test_script_race_links_unescape_json_and_deduplicate():
+    html = (
+        "<html><body><script>window.__DATA__ = {\"races\": ["
+        "\"https:\\/\\/www.dkk.dk\\/race\\/labrador-retriever\","
+        "\"https:\\/\\/www.dkk.dk\\/race\\/puddel\","
+        "\"https:\\/\\/www.dkk.dk\\/race\\/labrador-retriever\"]};</script>"
+        "<p>https://www.dkk.dk/race/schaeferhund</p></body></html>"
+    )
+    # Only links inside scripts are taken
+    assert extract_script_race_links(html) == RACE_LINKS[:2]
+
+
+def test_sitemap_race_links_follow_nested_sitemaps():
+    fetcher = make_fetcher({
+        SITEMAP_URL: SITEMAP_INDEX,
+        "https://www.dkk.dk/race-sitemap.xml": RACE_SITEMAP,
+    })
+    assert get_sitemap_race_links(fetcher) == RACE_LINKS
+
+
+def test_discovery_skips_sources_with_too_few_links():
+    fetcher = make_fetcher({
+        BASE_URL: BREED_SELECT_PAGE,
+        SITEMAP_URL: SITEMAP_INDEX,
+        "https://www.dkk.dk/race-sitemap.xml": RACE_SITEMAP,
+    })
+    assert discover_race_links(fetcher) == RACE_LINKS[:1]
+    assert discover_race_links(fetcher, min_links=3) == RACE_LINKS
+
+
+def test_all_discovery_sources_give_identical_links():
+    # The sitemap lists breeds with a trailing slash, the select without
+    slash_select = BREED_SELECT_PAGE.replace(RACE_LINKS[0], RACE_LINKS[0] + "/")
+    from_select = discover_race_links(make_fetcher({BASE_URL: BREED_SELECT_PAGE}))
+    from_slash_select = discover_race_links(make_fetcher({BASE_URL: slash_select}))
+    from_sitemap = discover_race_links(make_fetcher({
+        SITEMAP_URL: SITEMAP_INDEX,
+        "https://www.dkk.dk/race-sitemap.xml": RACE_SITEMAP,
+    }))
+    assert from_select == from_slash_select == [RACE_LINKS[0]]
+    assert from_sitemap[0] == from_select[0]
+
+
+def scrape_with(pages, previous_filepath, fetch_cache, link_discovery):
+    fetcher = make_fetcher(pages)
+    with patch.object(dkk_scraper, "Fetcher", return_value=fetcher), \
+            patch.object(dkk_scraper, "BrowserPool", MagicMock()), \
+            patch.object(dkk_scraper, "get_race_links_with_browser",
+                         return_value=RACE_LINKS) as browser:
+        df = scrape_breeds(
+            previous_filepath,
+            fetch_cache,
+            link_discovery=link_discovery,
+            parse_workers=1,
+        )
+    return df, fetcher, browser
+
+
+def test_short_http_link_list_falls_back_to_browser(tmp_path):
+    previous_filepath = str(tmp_path / "scraped_breeds.parquet")
+    save_previous_scrape(previous_filepath, RACE_LINKS)
+    pages = {BASE_URL: BREED_SELECT_PAGE}
+    pages.update({link: "<html></html>" for link in RACE_LINKS})
+
+    df, fetcher, browser = scrape_with(pages, previous_filepath,
+                                       FetchCache(str(tmp_path / "fetch.json")),
+                                       link_discovery="auto")
+
+    browser.assert_called_once()
+    assert df["url"].tolist() == RACE_LINKS
+
+
+def test_short_link_list_aborts_without_browser(tmp_path):
+    previous_filepath = str(tmp_path / "scraped_breeds.parquet")
+    save_previous_scrape(previous_filepath, RACE_LINKS)
+
+    df, fetcher, browser = scrape_with({BASE_URL: BREED_SELECT_PAGE},
+                                       previous_filepath,
+                                       FetchCache(str(tmp_path / "fetch.json")),
+                                       link_discovery="http")
+
+    assert df.empty
+    browser.assert_not_called()
+    fetcher.fetch_all.assert_not_called()
+
+
+def test_parse_dog_info_matches_full_html_parse():
+    url = RACE_LINKS[0]
+    parsed = parse_dog_info(url, breed_page())
+    assert parsed == parse_with_html_parser(url, breed_page())
+    # Containers with extra classes are kept by the strainer
+    assert parsed["specs"]["Størrelse"] == "Stor"
+    assert parsed["documents"] == ["https://www.dkk.dk/standard.pdf"]
+
+
+def test_parse_pages_in_processes_keeps_order():
+    pages = [(link, breed_page(size=str(i))) for i, link in enumerate(RACE_LINKS)]
+    results = parse_pages(pages, workers=2)
+    assert results == [parse_with_html_parser(url, html) for url, html in pages]
+
+
+def test_scrape_parses_changed_pages_and_reuses_unchanged(tmp_path):
+    previous_filepath = str(tmp_path / "scraped_breeds.parquet")
+    fetch_cache = FetchCache(str(tmp_path / "fetch.json"))
+    pages = {link: breed_page(size=str(i)) for i, link in enumerate(RACE_LINKS)}
+    first, _, _ = scrape_with(pages, previous_filepath, fetch_cache,
+                              link_discovery="browser")
+    save_as_parquet(first, previous_filepath)
+
+    pages[RACE_LINKS[1]] = breed_page(size="Lille")
+    df, _, _ = scrape_with(pages, previous_filepath, fetch_cache,
+                           link_discovery="browser")
+
+    # Unchanged rows are reused with the time they were scraped
+    reused = df["scrape_timestamp"] == first["scrape_timestamp"]
+    assert reused.tolist() == [True, False, True]
+    for row in df.to_dict("records"):
+        expected = parse_with_html_parser(row["url"], pages[row["url"]])
+        assert dict(row["specs"]) == expected["specs"]
+        assert row["lexicon"] == expected["lexicon"]
+        assert list(row["documents"]) == expected["documents"]
@@ -0,0 +1,35 @@
+from datetime import datetime
+import pyarrow as pa
+from src.utils.document_store import (
+    SCHEMA,
+    read_documents,
+    write_document_store,
+)
+
+
+def test_document_store_round_trip(tmp_path):
+    n_documents = 5
+    table = pa.Table.from_pylist(
+        [
+            {
+                "source": f"https://www.dkk.dk/race/breed-{i}",
+                "breed_name": f"breed-{i}",
+                "content": f"Breed Profile: Breed-{i}",
+                "specs": [("Højde", f"{i}0 cm")] if i % 2 else [],
+                "documents": [f"https://www.dkk.dk/doc-{i}.pdf"],
+                "content_type": "dog_breed_profile",
+                "scrape_timestamp": datetime(2026, 10, 18, 12, 0),
+            }
+            for i in range(n_documents)
+        ],
+        schema=SCHEMA,
+    )
+    filename = str(tmp_path / "breed_documents.parquet")
+    write_document_store(table, filename, row_group_size=2)
+
+    documents = read_documents(filename)
+    assert len(documents) == n_documents
+    assert documents[1].page_content == "Breed Profile: Breed-1"
+    assert documents[1].metadata["specs"] == {"Højde": "10 cm"}
+    assert documents[0].metadata["specs"] == {}
+    assert documents[4].metadata["scrape_timestamp"] == datetime(2026, 10, 18, 12, 0)
@@ -0,0 +1,26 @@
+import time
+import pytest
+from src.utils.embedding import embed_texts
+
+
+class SlowEmbedder:
+    """Embeds each text as [its number]; earlier batches finish last."""
+
+    def embed_documents(self, texts):
+        time.sleep(0.01 * (10 - int(texts[0])) / 10)
+        return [[float(text)] for text in texts]
+
+
+def test_embed_texts_keeps_order_across_batches():
+    texts = [str(i) for i in range(10)]
+    vectors = embed_texts(SlowEmbedder(), texts, batch_size=3, concurrency=4)
+    assert vectors == [[float(i)] for i in range(10)]
+
+
+def test_embed_texts_rejects_batch_with_wrong_vector_count():
+    class ShortEmbedder:
+        def embed_documents(self, texts):
+            return [[0.0]] * (len(texts) - 1)
+
+    with pytest.raises(RuntimeError, match="returned 2 vectors for 3 texts"):
+        embed_texts(ShortEmbedder(), ["a", "b", "c", "d"], batch_size=3)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from src.utils.embedding_backends import (
+    HashingEmbeddings,
+    embedding_identity,
+    known_dimension,
+    make_embeddings,
+    truncate_vectors,
+)
+
+
+def test_hashing_embeddings_are_deterministic_and_normalized():
+    embeddings = make_embeddings("hashing", "hashing-64")
+    first = embeddings.embed_query("Hvor stor bliver en labrador?")
+    second = HashingEmbeddings(64).embed_documents(
+        ["hvor stor bliver en Labrador"]
+    )[0]
+    assert first == second
+    assert len(first) == 64
+    assert np.linalg.norm(first) == pytest.approx(1.0)
+
+
+def test_hashing_embeddings_rank_shared_words_closer():
+    embeddings = HashingEmbeddings(256)
+    query, related, unrelated = np.array(embeddings.embed_documents([
+        "pelspleje for puddel",
+        "puddel kræver pelspleje",
+        "agility og træning af hyrdehunde",
+    ]))
+    assert query @ related > query @ unrelated
+
+
+def test_known_dimension_and_identity():
+    assert known_dimension("openai", "text-embedding-3-large") == 3072
+    assert known_dimension("hashing", "hashing-128") == 128
+    assert known_dimension("local", "models/minilm") is None
+    # Indexes built before the backend was recorded used OpenAI
+    assert embedding_identity({}) == ("openai", "text-embedding-3-large")
+    with pytest.raises(ValueError):
+        make_embeddings("word2vec", "model")
+
+
+def test_truncated_embeddings_are_renormalized_prefixes():
+    full = HashingEmbeddings(64).embed_query("Hvor stor bliver en labrador?")
+    embeddings = make_embeddings("hashing", "hashing-64", dimension=16)
+    truncated = embeddings.embed_query("Hvor stor bliver en labrador?")
+    assert len(truncated) == 16
+    assert np.linalg.norm(truncated) == pytest.approx(1.0)
+    np.testing.assert_allclose(
+        truncated, truncate_vectors([full], 16)[0], rtol=1e-6
+    )
+    # The model's own dimension needs no truncation
+    assert isinstance(make_embeddings("hashing", "hashing-64", dimension=64),
+                      HashingEmbeddings)
+    with pytest.raises(ValueError):
+        truncate_vectors([full], 128)
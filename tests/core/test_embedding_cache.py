@@ -0,0 +1,70 @@
+import numpy as np
+from unittest.mock import Mock
+from src.utils.embedding import embed_texts_cached
+from src.utils.embedding_cache import EmbeddingCache, make_key
+
+# One float32 row of dimension 4 is 16 bytes
+ROW_MB = 16 / (1024 * 1024)
+
+
+def make_embedder():
+    embedder = Mock()
+    embedder.embed_documents.side_effect = lambda texts: [
+        [float(len(text)), 0.0, 0.0, 1.0] for text in texts
+    ]
+    return embedder
+
+
+def test_cache_serves_hits_and_embeds_only_misses(tmp_path):
+    embedder = make_embedder()
+    cache = EmbeddingCache(str(tmp_path))
+    embed_texts_cached(embedder, ["a", "bb"], "model", cache=cache)
+
+    cache = EmbeddingCache(str(tmp_path))
+    vectors = embed_texts_cached(embedder, ["bb", "ccc", "a"], "model", cache=cache)
+    assert [vector[0] for vector in vectors] == [2.0, 3.0, 1.0]
+    assert embedder.embed_documents.call_args_list[-1].args[0] == ["ccc"]
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_cache_keys_are_isolated_per_model(tmp_path):
+    embedder = make_embedder()
+    cache = EmbeddingCache(str(tmp_path))
+    embed_texts_cached(embedder, ["a"], "model-a", cache=cache)
+    embed_texts_cached(embedder, ["a"], "model-b", cache=cache)
+    assert embedder.embed_documents.call_count == 2
+    assert make_key("model-a", "a") != make_key("model-b", "a")
+
+
+def test_hits_refresh_recency_for_eviction(tmp_path):
+    embedder = make_embedder()
+    cache = EmbeddingCache(str(tmp_path), max_size_mb=2 * ROW_MB)
+    embed_texts_cached(embedder, ["old", "used"], "model", cache=cache)
+    # A run with only hits still records their recency
+    cache = EmbeddingCache(str(tmp_path), max_size_mb=2 * ROW_MB)
+    embed_texts_cached(embedder, ["used"], "model", cache=cache)
+
+    cache = EmbeddingCache(str(tmp_path), max_size_mb=2 * ROW_MB)
+    embed_texts_cached(embedder, ["new"], "model", cache=cache)
+    assert cache.evicted == 1
+    old, used, new = cache.get_many(
+        [make_key("model", text) for text in ["old", "used", "new"]]
+    )
+    assert old is None and used is not None and new is not None
+
+
+def test_eviction_keeps_entries_added_by_this_run(tmp_path):
+    embedder = make_embedder()
+    cache = EmbeddingCache(str(tmp_path), max_size_mb=2 * ROW_MB)
+    embed_texts_cached(embedder, ["a"], "model", cache=cache)
+
+    # "a" is used again, so all three entries tie on generation
+    cache = EmbeddingCache(str(tmp_path), max_size_mb=2 * ROW_MB)
+    embed_texts_cached(embedder, ["a", "bb", "ccc"], "model", cache=cache)
+    cache = EmbeddingCache(str(tmp_path), max_size_mb=2 * ROW_MB)
+    a, bb, ccc = cache.get_many(
+        [make_key("model", text) for text in ["a", "bb", "ccc"]]
+    )
+    assert a is None
+    np.testing.assert_array_equal(bb, [2.0, 0.0, 0.0, 1.0])
+    np.testing.assert_array_equal(ccc, [3.0, 0.0, 0.0, 1.0])
@@ -0,0 +1,40 @@
+import requests
+from src.utils.fetch_cache import FetchCache
+
+URL = "https://www.dkk.dk/race/labrador"
+
+
+def make_response(status_code, content=b"", headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    response.headers.update(headers or {})
+    return response
+
+
+def test_fetch_cache_sends_validators_and_detects_changes(tmp_path):
+    cache_path = str(tmp_path / "fetch_cache.json")
+    cache = FetchCache(cache_path)
+    assert cache.conditional_headers(URL) == {}
+    assert cache.update(URL, make_response(200, b"<html>v1</html>", {
+        "ETag": '"v1"', "Last-Modified": "Mon, 12 Oct 2026 08:00:00 GMT",
+    }))
+    cache.save()
+
+    cache = FetchCache(cache_path)
+    assert cache.conditional_headers(URL) == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Mon, 12 Oct 2026 08:00:00 GMT",
+    }
+    # 304 Not Modified, and a full response with the same content
+    assert not cache.update(URL, make_response(304))
+    assert not cache.update(URL, make_response(200, b"<html>v1</html>"))
+    assert cache.update(URL, make_response(200, b"<html>v2</html>"))
+    assert cache.conditional_headers(URL) == {}
+
+
+def test_unreadable_fetch_cache_is_ignored(tmp_path):
+    cache_path = tmp_path / "fetch_cache.json"
+    cache_path.write_text("{not json")
+    cache = FetchCache(str(cache_path))
+    assert URL not in cache
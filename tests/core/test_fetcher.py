@@ -0,0 +1,65 @@
+import time
+from unittest.mock import Mock, patch
+import requests
+from src.utils.fetcher import Fetcher, HostRateLimiter
+
+
+def make_response(status_code, text=""):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = text.encode("utf-8")
+    return response
+
+
+def make_fetcher(session, max_retries=2):
+    return Fetcher(session, max_workers=4, rate_limit=0, max_retries=max_retries,
+                   backoff=0.01, timeout=1)
+
+
+def test_fetch_retries_server_errors_and_timeouts():
+    session = Mock()
+    session.get.side_effect = [
+        make_response(503),
+        requests.Timeout("read timed out"),
+        make_response(200, "ok"),
+    ]
+    with patch("src.utils.fetcher.time.sleep"):
+        response = make_fetcher(session).fetch("http://example.com/a")
+    assert response.text == "ok"
+    assert session.get.call_count == 3
+
+
+def test_fetch_gives_up_on_client_errors_and_exhausted_retries():
+    session = Mock()
+    session.get.return_value = make_response(404)
+    assert make_fetcher(session).fetch("http://example.com/missing") is None
+    assert session.get.call_count == 1
+
+    session.get.reset_mock()
+    session.get.return_value = make_response(500)
+    with patch("src.utils.fetcher.time.sleep"):
+        assert make_fetcher(session).fetch("http://example.com/down") is None
+    assert session.get.call_count == 3
+
+
+def test_fetch_all_keeps_input_order():
+    def get(url, headers, timeout):
+        # Earlier URLs finish last
+        time.sleep(0.01 * (5 - int(url.rsplit("/", 1)[-1])))
+        return make_response(200, url)
+
+    session = Mock()
+    session.get.side_effect = get
+    urls = [f"http://example.com/{i}" for i in range(5)]
+    responses = make_fetcher(session).fetch_all(urls)
+    assert [response.text for response in responses] == urls
+
+
+def test_rate_limiter_spaces_requests_per_host():
+    limiter = HostRateLimiter(rate=50)
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.wait("http://a.example.com/page")
+    limiter.wait("http://b.example.com/page")
+    # Two waits of 1/50 s on host a; host b is not delayed by host a
+    assert 0.035 <= time.monotonic() - start < 0.5
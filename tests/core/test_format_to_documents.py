@@ -0,0 +1,94 @@
+from datetime import datetime
+from typing import Dict
+import pandas as pd
+from src.pipeline.format_to_documents import (
+    create_documents,
+    format_documents,
+    load_scraped_data,
+)
+from src.pipeline.website_scrapers.dkk_scraper import save_as_parquet
+
+SCRAPE_TIMESTAMP = datetime(2026, 10, 18, 12, 0)
+
+# Every breed has the same spec keys
+COMPLETE_ROWS = [
+    {"url": "https://www.dkk.dk/race/labrador-retriever/",
+     "specs": {"Størrelse": "Stor", "Pels": "Kort"},
+     "lexicon": "Historie\nStammer fra Canada.",
+     "documents": ["https://www.dkk.dk/labrador.pdf"]},
+    {"url": "https://www.dkk.dk/race/puddel",
+     "specs": {"Størrelse": "Mellem", "Pels": "Krøllet"},
+     "lexicon": "Temperament\nKlog.",
+     "documents": []},
+]
+
+# Breeds lacking keys that others have, and a key without a value
+PARTIAL_ROWS = COMPLETE_ROWS + [
+    {"url": "https://www.dkk.dk/race/mops",
+     "specs": {"Farve": "Sort", "Pels": None},
+     "lexicon": "",
+     "documents": []},
+]
+
+
+# The row-wise formatter the column-wise one replaced, unchanged
+def format_specs(specs: Dict) -> str:
+    return "\n".join([f"- {k}: {v}" for k, v in specs.items()])
+
+def format_content(row: pd.Series) -> str:
+    breed_name = row["url"].rstrip("/").split("/")[-1].capitalize()
+    content = [
+        f"Breed Profile: {breed_name}",
+        "## Key Characteristics:",
+        format_specs(row["specs"]),
+        "## Detailed Description:",
+        row["lexicon"]
+    ]
+    return "\n".join(content)
+
+
+def read_back(rows, tmp_path):
+    # Specs read back from Parquet hold every breed's keys, None if missing
+    filename = str(tmp_path / "scraped_breeds.parquet")
+    save_as_parquet(pd.DataFrame([
+        dict(row, scrape_timestamp=SCRAPE_TIMESTAMP) for row in rows
+    ]), filename)
+    return load_scraped_data(filename)
+
+
+def test_format_documents_matches_row_wise_formatter(tmp_path):
+    df = read_back(COMPLETE_ROWS, tmp_path)
+
+    table = format_documents(df)
+    assert table.column("content").to_pylist() == [
+        format_content(row) for _, row in df.iterrows()
+    ]
+
+    documents = create_documents(df)
+    for document, row in zip(documents, COMPLETE_ROWS):
+        assert document.metadata["source"] == row["url"]
+        assert document.metadata["specs"] == row["specs"]
+        assert document.metadata["documents"] == row["documents"]
+        assert document.metadata["scrape_timestamp"] == SCRAPE_TIMESTAMP
+    assert documents[0].metadata["breed_name"] == "labrador-retriever"
+
+
+def test_missing_spec_keys_are_left_out(tmp_path):
+    # The row-wise formatter wrote "- key: None" for keys a breed lacks.
+    # They are left out now, so the content of such breeds, and the chunks
+    # embedded from it, differ from documents built before.
+    df = read_back(PARTIAL_ROWS, tmp_path)
+    row_wise = [format_content(row) for _, row in df.iterrows()]
+    assert "- Størrelse: None\n- Pels: None\n- Farve: Sort" in row_wise[2]
+    assert "- Farve: None" in row_wise[0]
+
+    content = format_documents(df).column("content").to_pylist()
+    assert content == [
+        "\n".join(line for line in text.split("\n")
+                  if not line.endswith(": None"))
+        for text in row_wise
+    ]
+    assert content[:2] == [format_content(row) for row in COMPLETE_ROWS]
+
+    documents = create_documents(df)
+    assert documents[2].metadata["specs"] == {"Farve": "Sort"}
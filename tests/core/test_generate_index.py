@@ -0,0 +1,123 @@
+import faiss
+import numpy as np
+from unittest.mock import Mock
+from langchain_core.documents import Document
+from src.pipeline.generate_index import (
+    assign_chunk_ids,
+    chunk_documents,
+    create_index,
+    source_fingerprints,
+    update_index,
+)
+
+
+def make_embedder():
+    embedder = Mock()
+    embedder.embed_documents.side_effect = lambda texts: [
+        [float(len(text)), float(sum(map(ord, text)) % 97), 1.0, 0.0]
+        for text in texts
+    ]
+    return embedder
+
+
+def make_store(pages):
+    documents = [
+        Document(page_content=content, metadata={"source": source})
+        for source, content in pages.items()
+    ]
+    return assign_chunk_ids(
+        chunk_documents(documents, chunk_size=40, chunk_overlap=0)
+    )
+
+
+def embedded_texts(embedder):
+    return [
+        text
+        for call in embedder.embed_documents.call_args_list
+        for text in call.args[0]
+    ]
+
+
+def index_ids(index):
+    return set(faiss.vector_to_array(index.id_map).tolist())
+
+
+def assert_consistent(index, chunk_store):
+    assert isinstance(index, faiss.IndexIDMap2)
+    assert index.ntotal == len(chunk_store)
+    assert index_ids(index) == set(chunk_store)
+    for cid, chunk in chunk_store.items():
+        vector = index.reconstruct(cid)
+        assert vector[0] == len(chunk.page_content)
+
+
+PAGES = {
+    "https://example.com/a": "Labrador retriever. " * 5,
+    "https://example.com/b": "Schæferhund er en hyrdehund. " * 4,
+}
+
+
+def build(pages):
+    chunk_store = make_store(pages)
+    index = create_index(list(chunk_store.values()), make_embedder(),
+                         index_spec="flat")
+    return index, chunk_store
+
+
+def test_update_index_adds_new_source():
+    index, stored = build(PAGES)
+    pages = dict(PAGES, **{"https://example.com/c": "Puddel. " * 8})
+    new_store = make_store(pages)
+    embedder = make_embedder()
+
+    index, updated = update_index(index, stored, new_store, embedder)
+
+    assert_consistent(index, updated)
+    assert set(updated) == set(new_store)
+    added = [chunk.page_content for cid, chunk in new_store.items()
+             if cid not in stored]
+    assert embedded_texts(embedder) == added
+
+
+def test_update_index_reembeds_only_changed_source():
+    index, stored = build(PAGES)
+    pages = dict(PAGES, **{"https://example.com/b": "Schæferhund. " * 3})
+    new_store = make_store(pages)
+    embedder = make_embedder()
+
+    index, updated = update_index(index, stored, new_store, embedder)
+
+    assert_consistent(index, updated)
+    assert set(updated) == set(new_store)
+    assert [updated[cid].page_content for cid in new_store] == \
+        [chunk.page_content for chunk in new_store.values()]
+    assert embedded_texts(embedder) == [
+        chunk.page_content for chunk in new_store.values()
+        if chunk.metadata["source"] == "https://example.com/b"
+    ]
+
+
+def test_update_index_removes_deleted_source():
+    index, stored = build(PAGES)
+    new_store = make_store({"https://example.com/a": PAGES["https://example.com/a"]})
+    embedder = make_embedder()
+
+    index, updated = update_index(index, stored, new_store, embedder)
+
+    assert_consistent(index, updated)
+    assert set(updated) == set(new_store)
+    embedder.embed_documents.assert_not_called()
+
+
+def test_chunk_ids_and_fingerprints_are_stable():
+    first, second = make_store(PAGES), make_store(PAGES)
+    assert list(first) == list(second)
+    assert source_fingerprints(first) == source_fingerprints(second)
+
+    changed = make_store(dict(PAGES, **{"https://example.com/b": "Mops. " * 9}))
+    first_prints, changed_prints = (source_fingerprints(first),
+                                    source_fingerprints(changed))
+    assert first_prints["https://example.com/a"] == \
+        changed_prints["https://example.com/a"]
+    assert first_prints["https://example.com/b"] != \
+        changed_prints["https://example.com/b"]
@@ -0,0 +1,72 @@
+import asyncio
+from unittest.mock import patch, AsyncMock
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from app.core.history import (
+    TOKENS_PER_MESSAGE,
+    TOKENS_PER_REPLY,
+    count_tokens,
+    conversation_messages,
+    split_history,
+    update_summary,
+)
+
+
+def word_encoder(model_name):
+    return str.split
+
+
+def make_conversation(turns):
+    messages = []
+    for i in range(turns):
+        messages.append(HumanMessage(f"spørgsmål nummer {i}"))
+        messages.append(AIMessage(f"svar nummer {i}"))
+    return messages
+
+
+@patch("app.core.history.get_encoder", word_encoder)
+def test_count_tokens():
+    messages = [HumanMessage("hvor stor er en puddel"), AIMessage("ret stor")]
+    assert count_tokens(messages, "gpt-4o-mini") == (
+        TOKENS_PER_REPLY + 2 * TOKENS_PER_MESSAGE + 5 + 2
+    )
+
+
+def test_conversation_messages_skip_tool_exchanges():
+    messages = [
+        HumanMessage("hej"),
+        AIMessage("", tool_calls=[{"name": "retrieve", "args": {}, "id": "1"}]),
+        ToolMessage("kontekst", tool_call_id="1"),
+        AIMessage("svar"),
+    ]
+    assert [m.content for m in conversation_messages(messages)] == ["hej", "svar"]
+
+
+@patch("app.core.history.get_encoder", word_encoder)
+def test_split_history_keeps_newest_turns_within_budget():
+    messages = make_conversation(5) + [HumanMessage("sidste spørgsmål")]
+    # Each turn costs 2 * (4 + 3) tokens; the last question costs 4 + 2
+    budget = TOKENS_PER_REPLY + 6 + 2 * 14 + 5
+    dropped, kept = split_history(messages, budget, "gpt-4o-mini")
+    assert dropped + kept == messages
+    assert kept[0].content == "spørgsmål nummer 3"
+    assert len(kept) == 5
+    assert count_tokens(kept, "gpt-4o-mini") <= budget
+
+
+@patch("app.core.history.get_encoder", word_encoder)
+def test_split_history_always_keeps_last_message():
+    messages = make_conversation(2) + [HumanMessage("et meget langt spørgsmål")]
+    dropped, kept = split_history(messages, 1, "gpt-4o-mini")
+    assert kept == messages[-1:]
+    assert dropped == messages[:-1]
+
+
+def test_update_summary():
+    llm = AsyncMock()
+    llm.ainvoke.return_value = AIMessage("Brugeren har en puddel.")
+    summary = asyncio.run(
+        update_summary(llm, "", [HumanMessage("jeg har en puddel")], "Opsummer")
+    )
+    assert summary == "Brugeren har en puddel."
+    request = llm.ainvoke.call_args[0][0]
+    assert "jeg har en puddel" in request[1].content
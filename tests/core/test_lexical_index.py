@@ -0,0 +1,96 @@
+import numpy as np
+import faiss
+from unittest.mock import patch
+from langchain_core.documents import Document
+from app.core.vector_index import VectorIndex
+from app.core.rag_graph import search_documents, search_lexical
+from src.utils.lexical_index import (
+    BM25Index,
+    reciprocal_rank_fusion,
+    stem,
+    tokenize,
+)
+
+DOCUMENTS = {
+    5: "Schæferhunden har en skulderhøjde på 60 til 65 cm.",
+    9: "Labrador retrieveren er en venlig familiehund.",
+    12: "Puddelens pels kræver jævnlig trimning.",
+}
+
+
+def build_lexical_index():
+    return BM25Index.build(DOCUMENTS.keys(), DOCUMENTS.values())
+
+
+def test_tokenize_stems_danish_and_drops_stopwords():
+    assert tokenize("Hvad er skulderhøjden på Hundene?") == ["skulderhøjd", "hund"]
+
+
+def test_stem_removes_longest_suffix_within_r1():
+    # R1 of these words starts after "hed"; the longest matching suffixes
+    # ("heden", "hedens", "hederne") reach in front of it
+    assert {stem(word) for word in ["hed", "heden", "hedens", "hederne"]} \
+        == {"hed"}
+    assert stem("hundenes") == "hund"
+    assert stem("terrierens") == "terri"
+    # Without a suffix inside R1 the word is kept
+    assert stem("hund") == "hund"
+    # A final "s" after a letter that cannot take it stays
+    assert stem("hundeløs") == "hundeløs"
+
+
+def test_bm25_search_matches_inflections_and_compounds(tmp_path):
+    lexical_index = build_lexical_index()
+    lexical_index.save(str(tmp_path / "bm25_index.npz"))
+    lexical_index = BM25Index.load(str(tmp_path / "bm25_index.npz"))
+
+    ids, scores = lexical_index.search("Hvor høj er en schæfer?", k=3)
+    assert ids.tolist() == [5]
+    ids, _ = lexical_index.search("puddel pels", k=3)
+    assert ids.tolist() == [12]
+    ids, _ = lexical_index.search("hvad er det", k=3)
+    assert len(ids) == 0
+
+
+def test_reciprocal_rank_fusion():
+    assert reciprocal_rank_fusion([[1, 2, 3], [3, 1]]) == [1, 3, 2]
+
+
+def build_vector_index():
+    documents = {
+        doc_id: Document(page_content=text,
+                         metadata={"source": f"http://example.com/{doc_id}"})
+        for doc_id, text in DOCUMENTS.items()
+    }
+    index = faiss.IndexIDMap2(faiss.IndexFlatL2(3))
+    index.add_with_ids(np.eye(3, dtype="float32"),
+                       np.array(list(documents), dtype="int64"))
+    return VectorIndex.from_objects(index, documents, build_lexical_index())
+
+
+def test_hybrid_search_fuses_vector_and_lexical_results():
+    vector_index = build_vector_index()
+
+    with patch("app.core.rag_graph.get_vector_index",
+               return_value=vector_index):
+        # The vector hit (Labrador) and the lexical hit (schæfer) are merged
+        docs = search_documents([0.0, 1.0, 0.0], "Hvor høj er en schæfer?")
+        assert {doc["metadata"]["source"] for doc in docs} == {
+            "http://example.com/9", "http://example.com/5"
+        }
+        # Without an embedding only the lexical index is searched
+        docs = search_lexical("Hvor høj er en schæfer?")
+        assert [doc["metadata"]["source"] for doc in docs] == [
+            "http://example.com/5"
+        ]
+
+
+def test_off_topic_query_finds_nothing_despite_lexical_match():
+    vector_index = build_vector_index()
+
+    with patch("app.core.rag_graph.get_vector_index",
+               return_value=vector_index):
+        # "pels" matches a chunk lexically, but no chunk is near the query
+        docs = search_documents([-1.0, -1.0, -1.0],
+                                "Hvordan vasker jeg en pels frakke?")
+    assert docs == []
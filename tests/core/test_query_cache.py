@@ -0,0 +1,81 @@
+import asyncio
+import numpy as np
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.core.query_cache import (
+    MemoryBackend,
+    QueryEmbeddingCache,
+    SQLiteBackend,
+    normalize_query,
+)
+
+
+def build_mock_embeddings():
+    embeddings = MagicMock()
+    embeddings.embed_query.side_effect = lambda query: [float(len(query)), 1.0]
+    return embeddings
+
+
+def test_normalize_query():
+    assert normalize_query("  Hvor meget skal en  hvalp spise? ") == \
+        normalize_query("hvor meget skal en hvalp spise")
+
+
+def test_cache_hit_skips_embedding_call():
+    embeddings = build_mock_embeddings()
+    cache = QueryEmbeddingCache(embeddings, MemoryBackend(10), ttl=60)
+
+    first = cache.embed_query("Hvor meget skal en hvalp spise?")
+    second = cache.embed_query("hvor meget skal en hvalp spise")
+
+    assert embeddings.embed_query.call_count == 1
+    np.testing.assert_array_equal(first, second)
+    assert cache.stats() == {
+        "hits": 1, "misses": 1, "hit_rate": 0.5, "entries": 1
+    }
+
+
+def test_batch_embeds_only_uncached_queries_once():
+    embeddings = build_mock_embeddings()
+    embeddings.aembed_documents = AsyncMock(
+        side_effect=lambda texts: [[float(len(text)), 1.0] for text in texts]
+    )
+    cache = QueryEmbeddingCache(embeddings, MemoryBackend(10), ttl=60)
+    cache.embed_query("Hvad er en puddel?")
+
+    vectors = asyncio.run(cache.aembed_queries(
+        ["Hvad er en puddel", "Hvad er en mops?", "hvad er en mops"]
+    ))
+
+    embeddings.aembed_documents.assert_awaited_once_with(["Hvad er en mops?"])
+    assert [vector[0] for vector in vectors] == [18.0, 16.0, 16.0]
+    assert cache.stats()["hits"] == 2
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(2)
+    backend.set("a", b"1", ttl=60)
+    backend.set("b", b"2", ttl=60)
+    backend.get("a")
+    backend.set("c", b"3", ttl=60)
+    assert backend.get("b") is None
+    assert backend.get("a") == b"1"
+    assert backend.get("c") == b"3"
+
+
+def test_memory_backend_expires_entries():
+    backend = MemoryBackend(2)
+    with patch("app.core.query_cache.time.time", return_value=0):
+        backend.set("a", b"1", ttl=10)
+    with patch("app.core.query_cache.time.time", return_value=11):
+        assert backend.get("a") is None
+
+
+def test_sqlite_backend_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    SQLiteBackend(path, 2).set("a", b"1", ttl=60)
+
+    backend = SQLiteBackend(path, 2)
+    assert backend.get("a") == b"1"
+    backend.set("b", b"2", ttl=60)
+    backend.set("c", b"3", ttl=60)
+    assert len(backend) == 2
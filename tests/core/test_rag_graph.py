@@ -1,10 +1,17 @@
+import asyncio
 import numpy as np
 import faiss
-from unittest.mock import patch
-from app.core.rag_graph import retrieve
+from unittest.mock import AsyncMock, patch
+from app.core.rag_graph import retrieve, route
+from app.core.vector_index import VectorIndex
+from app.core.query_cache import QueryEmbeddingCache, MemoryBackend
 from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
+from src.utils.embedding_backends import HashingEmbeddings
+
+# Deterministic embeddings, so the test needs no embedding API
+embeddings = HashingEmbeddings(256)
 
 
 def build_mock_vector_store():
@@ -30,9 +37,6 @@ def build_mock_vector_store():
         splits = text_splitter.split_documents([doc])
         all_splits.extend(splits)  # Add the splits to the all_splits list
 
-    # Initialize embeddings
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
-
     # Create embeddings for each chunk
     embeddings_list = [embeddings.embed_query(doc.page_content)
                        for doc in all_splits]
@@ -47,17 +51,17 @@ def build_mock_vector_store():
 
 
 @patch(
-        "app.core.rag_graph.index",
-        new_callable=lambda: build_mock_vector_store()[0]
+        "app.core.rag_graph.get_vector_index",
+        new=lambda: VectorIndex.from_objects(*build_mock_vector_store())
         )
 @patch(
-        "app.core.rag_graph.documents",
-        new_callable=lambda: build_mock_vector_store()[1]
+        "app.core.rag_graph.query_embeddings",
+        new=QueryEmbeddingCache(embeddings, MemoryBackend(10), ttl=60)
         )
-def test_retrieve(mock_documents, mock_index):
+def test_retrieve():
     # Call the retrieve function
     query = "retrieve Content of document"
-    result = retrieve(query)
+    result = asyncio.run(retrieve.ainvoke(query))
 
     # Check that the result is a string
     assert isinstance(result, str)
@@ -73,5 +77,27 @@ def test_retrieve(mock_documents, mock_index):
     assert expected_serialized_part2 in result
 
 
+@patch("app.core.rag_graph.local_router_enabled", True)
+@patch("app.core.rag_graph.local_router")
+def test_route_short_circuits_first_turn_only(mock_router):
+    mock_router.needs_retrieval = AsyncMock(return_value=True)
+
+    first = asyncio.run(route({"messages": [
+        HumanMessage("Hvor gammel bliver en labrador?"),
+    ]}))
+    tool_call = first["messages"][0].tool_calls[0]
+    assert tool_call["name"] == "retrieve"
+    assert tool_call["args"] == {"query": "Hvor gammel bliver en labrador?"}
+
+    # A follow-up is left to the LLM, which can resolve "den" from history
+    follow_up = asyncio.run(route({"messages": [
+        HumanMessage("Hvor gammel bliver en labrador?"),
+        AIMessage("Omkring 12 år."),
+        HumanMessage("Hvad med den sorte udgave af den?"),
+    ]}))
+    assert follow_up == {}
+    mock_router.needs_retrieval.assert_awaited_once()
+
+
 # Run the test
 test_retrieve()
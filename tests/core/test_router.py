@@ -0,0 +1,39 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock
+from app.core.router import LocalRouter
+
+
+def make_router(distance):
+    return LocalRouter(
+        AsyncMock(return_value=[0.1, 0.2]),
+        Mock(return_value=distance),
+        distance_threshold=0.9,
+    )
+
+
+def test_keyword_routes_without_embedding():
+    router = make_router(distance=2.0)
+    assert asyncio.run(router.needs_retrieval("Hvor tit skal min gravhund luftes?"))
+    router.embed_query.assert_not_called()
+    assert router.stats()["keyword_routes"] == 1
+
+
+def test_hundred_is_not_a_dog():
+    router = make_router(distance=2.0)
+    assert not asyncio.run(router.needs_retrieval("Hvad er hundrede gange to?"))
+
+
+def test_similar_question_routes_to_retrieval():
+    router = make_router(distance=0.5)
+    assert asyncio.run(router.needs_retrieval("Er borderen god til agility?"))
+    assert router.stats()["similarity_routes"] == 1
+
+
+def test_ambiguous_question_falls_back_to_llm():
+    router = make_router(distance=1.5)
+    assert not asyncio.run(router.needs_retrieval("Hej, hvem er du?"))
+    router.nearest_distance.side_effect = RuntimeError("index not loaded")
+    assert not asyncio.run(router.needs_retrieval("Hvad er klokken?"))
+    stats = router.stats()
+    assert stats["llm_fallbacks"] == 2
+    assert stats["local_rate"] == 0.0
@@ -0,0 +1,36 @@
+import pandas as pd
+from unittest.mock import patch
+from src.utils.stage_cache import StageCache, hash_dataframe, stage_key
+
+
+def test_hash_dataframe_ignores_excluded_columns_and_key_order():
+    df = pd.DataFrame([
+        {"url": "a", "specs": {"Højde": "60 cm", "Vægt": "30 kg"}, "changed": True},
+    ])
+    same = pd.DataFrame([
+        {"url": "a", "specs": {"Vægt": "30 kg", "Højde": "60 cm"}, "changed": False},
+    ])
+    assert hash_dataframe(df, exclude=["changed"]) == \
+        hash_dataframe(same, exclude=["changed"])
+    same.loc[0, "url"] = "b"
+    assert hash_dataframe(df, exclude=["changed"]) != \
+        hash_dataframe(same, exclude=["changed"])
+
+
+def test_stage_cache_hits_until_inputs_artifacts_or_age_change(tmp_path):
+    manifest = str(tmp_path / "stage_cache.json")
+    artifact = tmp_path / "documents.pickle"
+    artifact.write_bytes(b"documents")
+    key = stage_key("scraped-hash", 1000, 200)
+
+    StageCache(manifest).store("documents", key, [str(artifact)])
+    cache = StageCache(manifest, max_age_hours=1)
+    assert cache.lookup("documents", key)
+    assert not cache.lookup("documents", stage_key("scraped-hash", 500, 200))
+    assert not cache.lookup("index", key)
+
+    with patch("src.utils.stage_cache.time.time", return_value=2e10):
+        assert not cache.lookup("documents", key)
+
+    artifact.write_bytes(b"other documents")
+    assert not cache.lookup("documents", key)
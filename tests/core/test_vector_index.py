@@ -0,0 +1,164 @@
+import os
+import numpy as np
+import faiss
+import pytest
+from langchain_core.documents import Document
+from app.core.vector_index import (
+    VectorIndex,
+    VectorIndexError,
+    NOT_LOADED,
+    READY,
+    FAILED,
+)
+from src.utils.chunk_store import write_chunk_store
+from src.utils.ann_index import build_index, index_size_bytes, write_index_meta
+
+
+def build_vector_storage(tmp_path, n_documents=2, dimension=4):
+    documents = {
+        i: Document(metadata={"source": f"http://example.com/doc{i}"},
+                    page_content=f"Content of document {i}")
+        for i in (11, 42, 7)[:n_documents]
+    }
+    index = faiss.IndexIDMap2(faiss.IndexFlatL2(dimension))
+    index.add_with_ids(
+        np.eye(dimension, dtype="float32")[:len(documents)],
+        np.array(list(documents), dtype="int64"),
+    )
+    index_path = str(tmp_path / "faiss_index.index")
+    chunks_path = str(tmp_path / "chunked_documents.arrow")
+    # Deploy like fetch_index_from_github: write aside, then rename
+    faiss.write_index(index, index_path + ".tmp")
+    write_chunk_store(documents, chunks_path + ".tmp")
+    os.replace(index_path + ".tmp", index_path)
+    os.replace(chunks_path + ".tmp", chunks_path)
+    return index_path, chunks_path
+
+
+def test_vector_index_loads_lazily(tmp_path):
+    vector_index = VectorIndex(*build_vector_storage(tmp_path))
+    assert vector_index.state == NOT_LOADED
+
+    index, documents = vector_index.get()
+    assert vector_index.state == READY
+    assert vector_index.status()["vectors"] == 2
+
+    _, ids = index.search(np.eye(4, dtype="float32")[1:2], k=1)
+    assert documents[ids[0][0]].page_content == "Content of document 42"
+
+
+def test_vector_index_reports_missing_files(tmp_path):
+    vector_index = VectorIndex(
+        str(tmp_path / "missing.index"), str(tmp_path / "missing.arrow")
+    )
+    with pytest.raises(Exception):
+        vector_index.get()
+    assert vector_index.state == FAILED
+    assert "error" in vector_index.status()
+
+
+def test_vector_index_applies_search_params(tmp_path):
+    vectors = np.random.default_rng(0).random((200, 4)).astype("float32")
+    index, _ = build_index("ivf-flat", vectors, np.arange(200))
+    index_path = str(tmp_path / "faiss_index.index")
+    meta_path = str(tmp_path / "faiss_index.json")
+    chunks_path = str(tmp_path / "chunked_documents.arrow")
+    faiss.write_index(index, index_path)
+    write_index_meta({"search_params": {"nprobe": 2, "efSearch": 32}},
+                     meta_path)
+    write_chunk_store([Document(page_content=str(i)) for i in range(200)],
+                      chunks_path)
+
+    vector_index = VectorIndex(index_path, chunks_path, meta_path=meta_path,
+                               search_params={"nprobe": 3})
+    index, _ = vector_index.get()
+    assert faiss.extract_index_ivf(index).nprobe == 3
+    assert vector_index.status()["search_params"] == {"nprobe": 3}
+
+
+def test_reload_swaps_in_new_version(tmp_path):
+    vector_index = VectorIndex(*build_vector_storage(tmp_path))
+    old_index, old_documents = vector_index.get()
+    old_version = vector_index.version
+
+    build_vector_storage(tmp_path, n_documents=3)
+    vector_index.reload()
+
+    index, documents = vector_index.get()
+    assert index.ntotal == 3 and len(documents) == 3
+    assert vector_index.version != old_version
+    assert vector_index.status()["reloads"] == 1
+    # A query holding the old version can still use it
+    _, ids = old_index.search(np.eye(4, dtype="float32")[1:2], k=1)
+    assert old_documents[ids[0][0]].page_content == "Content of document 42"
+
+
+def test_reload_rejects_invalid_index(tmp_path):
+    vector_index = VectorIndex(*build_vector_storage(tmp_path), dimension=4)
+    vector_index.get()
+    version = vector_index.version
+
+    build_vector_storage(tmp_path, dimension=8)
+    with pytest.raises(VectorIndexError):
+        vector_index.reload()
+    assert vector_index.state == READY
+    assert vector_index.version == version
+    assert "dimension" in vector_index.status()["error"]
+
+
+def test_reload_if_changed_waits_for_stable_files(tmp_path):
+    vector_index = VectorIndex(*build_vector_storage(tmp_path))
+    vector_index.get()
+    assert not vector_index.reload_if_changed()
+
+    build_vector_storage(tmp_path, n_documents=3)
+    # The first check sees new files, the next one loads them
+    assert not vector_index.reload_if_changed()
+    assert vector_index.reload_if_changed()
+    assert vector_index.status()["vectors"] == 3
+
+
+def test_load_refuses_index_from_other_embedding_model(tmp_path):
+    index_path, chunks_path = build_vector_storage(tmp_path)
+    meta_path = str(tmp_path / "faiss_index.json")
+    write_index_meta({"embedding_backend": "local",
+                      "embedding_model": "models/minilm"}, meta_path)
+
+    vector_index = VectorIndex(index_path, chunks_path, meta_path=meta_path,
+                               embedding=("openai", "text-embedding-3-large"))
+    with pytest.raises(VectorIndexError, match="local/models/minilm"):
+        vector_index.get()
+
+    vector_index = VectorIndex(index_path, chunks_path, meta_path=meta_path,
+                               embedding=("local", "models/minilm"))
+    assert vector_index.get()[0].ntotal == 2
+
+
+def test_vector_index_serves_quantized_index(tmp_path):
+    vectors = np.random.default_rng(0).random((200, 8)).astype("float32")
+    index, _ = build_index("flat-int8", vectors, np.arange(200))
+    index_path = str(tmp_path / "faiss_index.index")
+    chunks_path = str(tmp_path / "chunked_documents.arrow")
+    faiss.write_index(index, index_path)
+    write_chunk_store([Document(page_content=str(i)) for i in range(200)],
+                      chunks_path)
+
+    index, documents = VectorIndex(index_path, chunks_path, mmap=True).get()
+    _, ids = index.search(vectors[17:18], k=1)
+    assert documents[ids[0][0]].page_content == "17"
+    # int8 codes take a quarter of the space of float32 vectors
+    flat, _ = build_index("flat", vectors, np.arange(200))
+    assert index_size_bytes(index) < index_size_bytes(flat) * 0.6
+
+
+def test_ivf_pq_skips_polysemous_training_and_needs_enough_points():
+    vectors = np.random.default_rng(0).random((300, 16)).astype("float32")
+    index, factory = build_index("ivf-pq", vectors, np.arange(300))
+    assert factory.endswith("np")
+    ivf = faiss.downcast_index(faiss.extract_index_ivf(index))
+    assert not ivf.do_polysemous_training
+
+    # Fewer points than PQ centroids: a flat index rather than a FAISS error
+    index, factory = build_index("ivf-pq", vectors[:100], np.arange(100))
+    assert factory == "IDMap2,Flat"
+    assert index.ntotal == 100
@@ -1,11 +1,48 @@
-from unittest.mock import patch
-from app.services.rag_service import get_rag_answer
-from langchain_core.messages import AIMessage, ToolMessage
-from app.core.config import memory_config
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from app.services.rag_service import (
+    get_rag_answer,
+    get_rag_answers,
+    stream_rag_answer,
+)
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    HumanMessage,
+    ToolMessage,
+)
+from app.core.config import get_memory_config
+from app.core.rag_graph import graph
+from app.core.answer_cache import SemanticAnswerCache
+
+
+@pytest.fixture(autouse=True)
+def mock_answer_cache():
+    # Use a fresh answer cache and a local question embedding per test
+    cache = SemanticAnswerCache(threshold=0.95, max_entries=10, ttl=60)
+    with patch("app.services.rag_service.answer_cache", cache), \
+            patch("app.services.rag_service.query_embeddings") as embeddings:
+        embeddings.aembed_query = AsyncMock(return_value=[1.0, 0.0])
+        yield cache
+
+
+def new_thread(mock_graph):
+    # The mocked graph has no earlier messages in the conversation thread
+    mock_graph.aget_state = AsyncMock(return_value=Mock(values={}))
+
+
+def mock_astream(steps):
+    # Build a replacement for graph.astream that yields the given steps
+    async def astream(*args, **kwargs):
+        for step in steps:
+            yield step
+    return astream
 
 
 @patch("app.services.rag_service.graph")
 def test_get_rag_answer(mock_graph):
+    new_thread(mock_graph)
     # Create a mock AIMessage and ToolMessage
     mock_ai_message = AIMessage(content="This is a sample answer.")
     mock_tool_message = ToolMessage(
@@ -24,17 +61,17 @@ def test_get_rag_answer(mock_graph):
 
     # Define the mock response from the graph
     mock_response = [{"messages": [mock_tool_message, mock_ai_message]}]
-    mock_graph.stream.return_value = mock_response
+    mock_graph.astream.side_effect = mock_astream(mock_response)
 
     # Call the get_rag_answer function
     question = "What is the best dog food?"
-    result = get_rag_answer(question)
+    result = asyncio.run(get_rag_answer(question, "session-1"))
 
-    # Verify that the graph.stream method was called with the correct params
-    mock_graph.stream.assert_called_once_with(
+    # Verify that the graph.astream method was called with the correct params
+    mock_graph.astream.assert_called_once_with(
         {"messages": [{"role": "user", "content": question}]},
         stream_mode="values",
-        config=memory_config,
+        config=get_memory_config("session-1"),
     )
 
     # Verify the result
@@ -49,11 +86,11 @@ def test_get_rag_answer_no_sources():
     # Define the mock response from the graph
     mock_response = [{"messages": [mock_ai_message]}]
 
-    with patch("app.services.rag_service.graph.stream",
-               return_value=mock_response):
+    with patch("app.services.rag_service.graph.astream",
+               side_effect=mock_astream(mock_response)):
         # Call the get_rag_answer function
         question = "What is the best dog food?"
-        result = get_rag_answer(question)
+        result = asyncio.run(get_rag_answer(question))
 
         # Verify the result
         assert result["answer"] == ("Jeg kender desværre ikke svaret "
@@ -64,6 +101,7 @@ def test_get_rag_answer_no_sources():
 
 @patch("app.services.rag_service.graph")
 def test_get_rag_answer_error_handling(mock_graph):
+    new_thread(mock_graph)
 
     # Create a mock AIMessage and an invalid ToolMessage to force an error
     mock_ai_message = AIMessage(content="This is a sample answer.")
@@ -78,12 +116,138 @@ def test_get_rag_answer_error_handling(mock_graph):
 
     # Define the mock response from the graph
     mock_response = [{"messages": [mock_tool_message, mock_ai_message]}]
-    mock_graph.stream.return_value = mock_response
+    mock_graph.astream.side_effect = mock_astream(mock_response)
 
     # Call the get_rag_answer function
     question = "What is the best dog food?"
-    result = get_rag_answer(question)
+    result = asyncio.run(get_rag_answer(question))
 
     # Verify the result
     assert result["answer"] == "Noget gik galt, prøv venligst igen."
     assert result["sources"] == []
+
+
+SOURCED_ANSWER = [{"messages": [
+    ToolMessage(
+        content="Source: http://example.com\nContent: Sample content",
+        artifact=[
+            {
+                "metadata": {"source": "http://example.com"},
+                "page_content": "Sample content",
+            }
+        ],
+        tool_call_id="sample_tool_call_id"
+    ),
+    AIMessage(content="This is a sample answer."),
+]}]
+
+
+def test_get_rag_answer_served_from_cache():
+    with patch("app.services.rag_service.graph.astream",
+               side_effect=mock_astream(SOURCED_ANSWER)) as astream:
+        first = asyncio.run(get_rag_answer("What is the best dog food?",
+                                           "cache-session-1"))
+        second = asyncio.run(get_rag_answer("What is the best dog food",
+                                            "cache-session-2"))
+
+    # The second, equivalent question is answered without running the graph
+    astream.assert_called_once()
+    assert second == first
+    # and the served turn is part of the second conversation's history
+    state = asyncio.run(graph.aget_state(get_memory_config("cache-session-2")))
+    assert [(message.type, message.content)
+            for message in state.values["messages"]] == [
+        ("human", "What is the best dog food"),
+        ("ai", "This is a sample answer."),
+    ]
+
+
+def test_follow_up_question_is_not_served_from_cache():
+    # The second session already talks about another breed, so the same
+    # words ask a different question there
+    asyncio.run(graph.aupdate_state(
+        get_memory_config("follow-up-session-2"),
+        {"messages": [HumanMessage("Fortæl om puddelen"),
+                      AIMessage("Puddelen er en klog hund.")]},
+        as_node="generate",
+    ))
+    with patch("app.services.rag_service.graph.astream",
+               side_effect=mock_astream(SOURCED_ANSWER)) as astream:
+        asyncio.run(get_rag_answer("Hvor længe lever den?",
+                                   "follow-up-session-1"))
+        asyncio.run(get_rag_answer("Hvor længe lever den?",
+                                   "follow-up-session-2"))
+
+    assert astream.call_count == 2
+
+
+async def collect_events(question):
+    return [event async for event in stream_rag_answer(question)]
+
+
+@patch("app.services.rag_service.graph")
+def test_stream_rag_answer(mock_graph):
+    new_thread(mock_graph)
+    mock_ai_message = AIMessage(content="Sample answer.")
+    mock_tool_message = ToolMessage(
+        content="Source: http://example.com\nContent: Sample content",
+        artifact=[
+            {"metadata": {"source": "http://example.com"},
+             "page_content": "Sample content"},
+            {"metadata": {"source": "http://example.com"},
+             "page_content": "More sample content"},
+        ],
+        tool_call_id="sample_tool_call_id"
+    )
+    mock_graph.astream.side_effect = mock_astream([
+        ("messages", (AIMessageChunk(content=""),
+                      {"langgraph_node": "query_or_respond"})),
+        ("messages", (AIMessageChunk(content="Sample "),
+                      {"langgraph_node": "generate"})),
+        ("messages", (AIMessageChunk(content="answer."),
+                      {"langgraph_node": "generate"})),
+        ("values", {"messages": [mock_tool_message, mock_ai_message]}),
+    ])
+
+    events = asyncio.run(collect_events("What is the best dog food?"))
+
+    assert events == [
+        ("token", "Sample "),
+        ("token", "answer."),
+        ("sources", {"answer": "Sample answer.",
+                     "sources": ["http://example.com"]}),
+    ]
+
+
+@patch("app.services.rag_service.answer_from_documents")
+@patch("app.services.rag_service.search_documents_batch")
+def test_get_rag_answers(mock_search, mock_answer):
+    questions = ["What is the best dog food?", "Who won the match?",
+                 "How long do poodles live?"]
+    with patch("app.services.rag_service.query_embeddings") as embeddings:
+        embeddings.aembed_queries = AsyncMock(
+            return_value=[[1.0, 0.0], [0.0, 1.0], [0.6, 0.8]]
+        )
+        mock_search.return_value = [
+            [{"metadata": {"source": "http://example.com/food"},
+              "page_content": "Sample content"}],
+            [],
+            [{"metadata": {"source": "http://example.com/poodle"},
+              "page_content": "More sample content"}],
+        ]
+        mock_answer.side_effect = lambda question, docs: AIMessage(
+            content=f"Answer to {question}"
+        )
+        results = asyncio.run(get_rag_answers(questions))
+
+    # One batched embedding call and one multi-query search
+    embeddings.aembed_queries.assert_awaited_once_with(questions)
+    mock_search.assert_called_once()
+    assert len(mock_search.call_args[0][0]) == 3
+    # The question without sources does not reach the LLM
+    assert mock_answer.call_count == 2
+    assert results[0] == {"answer": "Answer to What is the best dog food?",
+                          "sources": ["http://example.com/food"]}
+    assert results[1]["sources"] == []
+    assert results[1]["answer"].startswith("Jeg kender desværre ikke svaret")
+    assert results[2]["sources"] == ["http://example.com/poodle"]